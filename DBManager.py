@@ -1,35 +1,6 @@
-import time
-
-import psycopg2
 from datetime import datetime
-from dotenv import load_dotenv
-from logScript import logger
-import os
-from psycopg2 import OperationalError
-
-load_dotenv(dotenv_path='.env')
 
-db_name = os.getenv("DB_NAME")
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-db_host = os.getenv("DB_HOST")
-db_port = os.getenv("DB_PORT")
-
-# Функция для подключения к базе данных
-def get_db_connection():
-    try:
-        connection = psycopg2.connect(
-            host=db_host,
-            port=db_port,
-            database=db_name,
-            user=db_user,
-            password=db_password
-        )
-        return connection
-    except OperationalError as e:
-        logger.error(f"Ошибка при подключении: {e}")
-        time.sleep(5)
-        return get_db_connection()
+from records import MESSAGE_COLUMNS, Message
 
 # Функция для очистки текста
 def clean_text(text):
@@ -40,9 +11,31 @@ def clean_text(text):
 
     return text
 
+# Текстовые поля лота, которые очищаются так же, как колонки сообщения (clean_text)
+LOT_TEXT_FIELDS = ("description", "classification", "buyer", "contract_info", "contract_number", "valuation_date")
+
+
+def prepare_lots(lot_table):
+    """
+    Очищает текстовые поля каждого лота. Поля без значения (None) остаются None.
+    """
+    lots = []
+    for lot in lot_table.lots:
+        changes = {field: clean_text(getattr(lot, field)) for field in LOT_TEXT_FIELDS if getattr(lot, field) is not None}
+        lots.append(lot._replace(**changes))
+    return lots
+
 # Функция для подготовки данных для вставки в базу данных
-def prepare_data_for_db(raw_data):
-    """Приводит данные к нужному формату для вставки в базу данных"""
+def prepare_data_for_db(raw_data, message_content):
+    """
+    Приводит данные к нужному формату для вставки в базу данных.
+    :param raw_data: строка списка сообщений (records.ListingRow или словарь с теми же ключами).
+    :param message_content: результат разбора страницы сообщения (parse_message_html).
+    :return: records.Message.
+    :raises ValueError: страница не разобрана (message_content is None) - сообщение нужно обработать повторно.
+    """
+    if message_content is None:
+        raise ValueError(f"Не удалось разобрать сообщение {raw_data.get('сообщение_ссылка')}")
 
     # Общие данные для всех сообщений
     data = raw_data.get('дата', '')
@@ -55,7 +48,10 @@ def prepare_data_for_db(raw_data):
     message_link = raw_data.get('сообщение_ссылка', '')
 
     # Данные из содержимого сообщения
-    message_content = raw_data.get('message_content', {})
+    # Колонки лотов в таблице messages хранятся в прежнем виде - значения через "&&& "
+    lot_table = message_content.get('лоты')
+    if lot_table is not None:
+        message_content = {**message_content, **lot_table.legacy_columns()}
     message_number = clean_text(message_content.get('№ сообщения', ''))
     publication_date = message_content.get('Дата публикации', '')
     publication_date = datetime.strptime(publication_date, "%d.%m.%Y") if publication_date else None
@@ -109,148 +105,69 @@ def prepare_data_for_db(raw_data):
     balance_value = message_content.get('Балансовая стоимость', None)
 
     # Подготовленные данные для вставки
-    prepared_data = {
-        'дата': date,
-        'тип_сообщения': message_type,
-        'должник': debtor,
-        'должник_ссылка': debtor_link,
-        'арбитр': arbiter,
-        'арбитр_ссылка': arbiter_link,
-        'сообщение_ссылка': message_link,
-
-        'номер_сообщения': message_number,
-        'дата_публикации': publication_date,
-        'наименоinnвание_должника': debtor_name,
-        'адрес ': address,
-        'ОГРН': ogrn,
-        'ИНН': inn,
-        'номер_дела': case_number,
-        'дата_рождения': birth_date,
-        'место_рождения': birth_place,
-        'место_жительства': residence,
-        'СНИЛС': snils,
-
-        'ФИО_АУ': arbiter_name,
-        'адрес_корреспонденции': correspondence_address,
-        'почта': email,
-        'СРО_АУ': sro_au,
-        'адрес_СРО_АУ': sro_address,
-        'объявление_о_проведении_торгов': auction_announcement,
-
-        'торгова_площадка': trading_platform,
-        'номер_торгов': trading_number,
-
-        'номер_лота': lot_number,
-        'описание': description,
-        'сведения_о_заключении_договора': contract_info,
-        'номер_договора': contract_number,
-        'дата_заключения_договора': contract_date,
-        'цена': purchase_price,
-        'наименование_покупателя': buyer_name,
-        'текст': text,
-
-        'классификация': classification,
-
-        'ДКП': dkp,
-        'вид_торгов': auction_type,
-        'дата_начала_подачи_заявок': application_start_date,
-        'дата_окончания_подачи_заявок': application_end_date,
-        'правила_подачи_заявок': application_rules,
-        'дата_время_торгов': auction_date,
-        'форма_подачи_предложения_о_цене': price_submission_form,
-        'место_проведения': auction_location,
-        'результат': auction_result,
-
-        'дата_определения_стоимости': evaluation_date,
-        'балансовая_стоимость': balance_value
-    }
-
-    return prepared_data
-
-# Функция для вставки данных в базу данных
-def insert_message_to_db(data):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    insert_query = '''
-    INSERT INTO messages (
-        дата, тип_сообщения, должник, должник_ссылка, арбитр, арбитр_ссылка, сообщение_ссылка,
-        номер_сообщения, дата_публикации,
-        наименование_должника, адрес, ОГРН, ИНН, номер_дела, дата_рождения, место_рождения,
-        место_жительства, СНИЛС,
-        ФИО_АУ, адрес_корреспонденции, почта, СРО_АУ, адрес_СРО_АУ, объявление_о_проведении_торгов,
-        торговая_площадка, номер_торгов,
-        номер_лота, описание, сведения_о_заключении_договора, номер_договора,
-        дата_заключения_договора, цена, наименование_покупателя, текст,
-        классификация,
-        ДКП, вид_торгов, дата_начала_подачи_заявок, дата_окончания_подачи_заявок, правила_подачи_заявок,
-        дата_время_торгов, форма_подачи_предложения_о_цене, место_проведения,
-        дата_определения_стоимости, балансовая_стоимость
-    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-              %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-              %s, %s, %s, %s, %s, %s, %s, %s)
+    return Message(
+        дата=date,
+        тип_сообщения=message_type,
+        должник=debtor,
+        должник_ссылка=debtor_link,
+        арбитр=arbiter,
+        арбитр_ссылка=arbiter_link,
+        сообщение_ссылка=message_link,
+
+        номер_сообщения=message_number,
+        дата_публикации=publication_date,
+        наименование_должника=debtor_name,
+        адрес=address,
+        ОГРН=ogrn,
+        ИНН=inn,
+        номер_дела=case_number,
+        дата_рождения=birth_date,
+        место_рождения=birth_place,
+        место_жительства=residence,
+        СНИЛС=snils,
+
+        ФИО_АУ=arbiter_name,
+        адрес_корреспонденции=correspondence_address,
+        почта=email,
+        СРО_АУ=sro_au,
+        адрес_СРО_АУ=sro_address,
+        объявление_о_проведении_торгов=auction_announcement,
+
+        торговая_площадка=trading_platform,
+        номер_торгов=trading_number,
+
+        номер_лота=lot_number,
+        описание=description,
+        сведения_о_заключении_договора=contract_info,
+        номер_договора=contract_number,
+        дата_заключения_договора=contract_date,
+        цена=purchase_price,
+        наименование_покупателя=buyer_name,
+        текст=text,
+
+        классификация=classification,
+
+        ДКП=dkp,
+        вид_торгов=auction_type,
+        дата_начала_подачи_заявок=application_start_date,
+        дата_окончания_подачи_заявок=application_end_date,
+        правила_подачи_заявок=application_rules,
+        дата_время_торгов=auction_date,
+        форма_подачи_предложения_о_цене=price_submission_form,
+        место_проведения=auction_location,
+        дата_определения_стоимости=evaluation_date,
+        балансовая_стоимость=balance_value,
+
+        результат=auction_result,
+        лоты=prepare_lots(lot_table) if lot_table is not None else [],
+    )
+
+# Запрос вставки сообщения: колонки в порядке полей records.Message
+# Единственный путь записи в messages - пачками через message_buffer: VALUES %s раскрывает execute_values,
+# повторы номера сообщения пропускаются самим запросом
+INSERT_MESSAGES_BATCH_QUERY = f"""
+    INSERT INTO messages ({", ".join(MESSAGE_COLUMNS)})
+    VALUES %s
+    ON CONFLICT (номер_сообщения) DO NOTHING
     RETURNING id;
-    '''
-    try:
-        params = (
-            data.get('дата'),
-            data.get('тип_сообщения'),
-            data.get('должник'),
-            data.get('должник_ссылка'),
-            data.get('арбитр'),
-            data.get('арбитр_ссылка'),
-            data.get('сообщение_ссылка'),
-            data.get('номер_сообщения'),
-            data.get('дата_публикации'),
-            data.get('наименование_должника'),
-            data.get('адрес'),
-            data.get('ОГРН'),
-            data.get('ИНН'),
-            data.get('номер_дела'),
-            data.get('дата_рождения'),
-            data.get('место_рождения'),
-            data.get('место_жительства'),
-            data.get('СНИЛС'),
-            data.get('ФИО_АУ'),
-            data.get('адрес_корреспонденции'),
-            data.get('почта'),
-            data.get('СРО_АУ'),
-            data.get('адрес_СРО_АУ'),
-            data.get('объявление_о_проведении_торгов'),
-            data.get('торгова_площадка'),
-            data.get('номер_торгов'),
-            data.get('номер_лота'),
-            data.get('описание'),
-            data.get('сведения_о_заключении_договора'),
-            data.get('номер_договора'),
-            data.get('дата_заключения_договора'),
-            data.get('цена'),
-            data.get('наименование_покупателя'),
-            data.get('текст'),
-            data.get('классификация'),
-            data.get('ДКП'),
-            data.get('вид_торгов'),
-            data.get('дата_начала_подачи_заявок'),
-            data.get('дата_окончания_подачи_заявок'),
-            data.get('правила_подачи_заявок'),
-            data.get('дата_время_торгов'),
-            data.get('форма_подачи_предложения_о_цене'),
-            data.get('место_проведения'),
-            data.get('дата_определения_стоимости'),
-            data.get('балансовая_стоимость')
-        )
-
-        cursor.execute(insert_query, params)
-        conn.commit()
-        new_id = cursor.fetchone()[0]
-        logger.info(f"Данные успешно вставлены с ID: {new_id}")
-    except Exception as e:
-        if 'duplicate key value violates unique constraint' in str(e) and 'номер_сообщения' in str(e):
-            logger.warning(f"Строка с номером сообщения уже существует. Пропуск.")
-            cursor.close()
-            conn.close()
-            return None
-        else:
-            logger.error("Ошибка при выполнении запроса:", e)
-            conn.rollback()
-    finally:
-        cursor.close()
+"""
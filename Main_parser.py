@@ -1,15 +1,17 @@
 import time
 from threading import Thread
-from DBManager import prepare_data_for_db, insert_message_to_db
-from detecting import fetch_and_parse_first_page, clear_form_periodically, parse_all_pages_reverse, pop_last_elem
+from backfill import run_backfill
+from detecting import fetch_new_messages_batch, clear_form_periodically, pop_last_elem
 
-from fioDETECTING import au_debtorsDetecting
-from lots_integrator import lots_analyze
-from parsing import parse_message_page
-from split import split_columns
 from logScript import logger
+from db_pool import require_unique_indexes
+from fioDETECTING import UPSERT_TARGETS as ENTITY_UPSERT_TARGETS
+from message_buffer import UPSERT_TARGETS as MESSAGE_UPSERT_TARGETS, install_shutdown_handlers
+from parse_pool import get_parse_pool
+from pipeline import MessagePipeline
+from poll_scheduler import PollScheduler
 from queue import Queue
-from webdriver import create_webdriver_with_display, cleanup_virtual_display, is_browser_alive, restart_driver
+from webdriver import acquire_driver, get_driver_pool, is_browser_alive, restart_driver
 
 # from selenium.webdriver.common.proxy import *
 
@@ -45,19 +47,30 @@ def monitor_threads(threads, restart_queue):
 
 # Основной цикл программы
 def main():
+    # Остановка сервиса (SIGTERM, Ctrl+C) дописывает буфер сообщений в БД
+    install_shutdown_handlers()
+
+    # Запросы INSERT ... ON CONFLICT требуют уникальных индексов: без них не запускаемся
+    require_unique_indexes(ENTITY_UPSERT_TARGETS + MESSAGE_UPSERT_TARGETS)
+
+    # Процессы разбора HTML запускаются и прогреваются до того, как появятся остальные потоки
+    get_parse_pool()
+
+    # Конвейер обработки сообщений: загрузка, разбор и запись идут в своих потоках
+    pipeline = MessagePipeline().start()
+
     while True:
-        driver = create_webdriver_with_display()  # Инициализация WebDriver
+        driver = acquire_driver()  # WebDriver из пула: запасной браузер уже запущен
 
         # Очередь для перезапуска драйвера
         restart_queue = Queue()
 
         # Обход всех страниц при старте
         logger.info("Запускаем полный парсинг всех страниц.")
-        pars_sagnal = parse_all_pages_reverse(driver)
+        pars_sagnal = run_backfill(driver)
         if pars_sagnal is False:
             pop_last_elem()
-            # cleanup_virtual_display(driver)
-            driver.quit()
+            get_driver_pool().release(driver)
             continue
 
         # Список потоков
@@ -74,6 +87,9 @@ def main():
         monitor_thread = Thread(target=monitor_threads, args=(threads, restart_queue), daemon=True, name="MonitorThread")
         monitor_thread.start()
 
+        # Планировщик интервала опроса
+        scheduler = PollScheduler()
+
         while True:
             try:
                 # Проверка, нужно ли перезапустить драйвер
@@ -82,6 +98,11 @@ def main():
                     driver = restart_driver(driver)
                     continue
 
+                # Долго работающая сессия браузера заменяется свежей
+                if get_driver_pool().should_recycle(driver):
+                    logger.info("Сессия WebDriver устарела, заменяем запасной.")
+                    driver = restart_driver(driver)
+
                 # Проверка, нужно ли перезапустить драйвер
                 if not restart_queue.empty():
                     restart_signal = restart_queue.get()
@@ -90,50 +111,34 @@ def main():
                         driver = restart_driver(driver)
                         continue
 
-                # Получаем новые сообщения
-                new_messages = fetch_and_parse_first_page(driver)
-                if "not yet" in new_messages:
-                    logger.warning("Новых сообщений нет, продолжаем проверку...\n\n")
-                    time.sleep(0.5)
-                    continue
-
+                # Получаем все новые сообщения первой страницы
+                poll_started = time.monotonic()
+                new_messages = fetch_new_messages_batch(driver)
                 if new_messages is None:
-                    logger.error(f"поизошла ошибка в fetch_and_parse_first_page: {e}")
+                    logger.error("поизошла ошибка в fetch_new_messages_batch")
+                    scheduler.record_poll(error=True)
                     driver = restart_driver(driver)
+                    scheduler.wait()
                     continue
 
-                link = new_messages["сообщение_ссылка"]
-                try:
-                    # Парсим содержимое сообщения
-                    message_content = parse_message_page(link, driver)
-                    new_messages['message_content'] = message_content
-
-                    # Подготовка данных перед вставкой в БД
-                    prepared_data = prepare_data_for_db(new_messages)
-                    logger.info(f'Сырые сообщения: %s' , str(prepared_data))
-
-                    # добавление новых АУ и должников
-                    au_debtorsDetecting(prepared_data)
-
-                    # Вставляем данные в БД и получаем ID
-                    insert_message_to_db(prepared_data)
+                scheduler.record_poll([message.дата for message in new_messages],
+                                      duration=time.monotonic() - poll_started)
 
-                    # Форматируем данные
-                    formatted_data = split_columns(prepared_data)
-
-                    # Проверяем отформатированные данные
-                    lots_analyze(formatted_data)
-
-                except Exception as e:
-                    logger.error(f"Ошибка при обработке сообщения: {e}")
+                if not new_messages:
+                    logger.warning("Новых сообщений нет, продолжаем проверку...\n\n")
+                    scheduler.wait()
                     continue
 
+                # Передаём всю пачку в конвейер от старых к новым
+                for new_message in new_messages:
+                    pipeline.submit(new_message)
+
             except Exception as e:
                 logger.error(f"Ошибка в основном цикле: {e}")
+                scheduler.record_poll(error=True)
                 driver = restart_driver(driver)
 
-            time.sleep(0.5)
-            logger.info("Ожидание 0.5 секунды для следующего обновления...")
+            scheduler.wait()
 
 if __name__ == "__main__":
     main()
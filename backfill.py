@@ -0,0 +1,270 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from detecting import is_new_message, mark_checked, save_checked_messages, get_checked_messages, \
+    commit_message, parse_all_pages_reverse
+from http_fetcher import fetch_listing_html, post_back, fetch_message_html, reset_session
+from logScript import logger
+from parse_pool import get_parse_pool
+from parsing import parse_message_page
+from records import ListingRow
+
+# Сколько страниц списка сообщений обходить при старте
+BACKFILL_PAGES = int(os.getenv("BACKFILL_PAGES", "20"))
+# Количество потоков для обхода страниц списка и для загрузки страниц сообщений
+BACKFILL_LISTING_WORKERS = int(os.getenv("BACKFILL_LISTING_WORKERS", "4"))
+BACKFILL_MESSAGE_WORKERS = int(os.getenv("BACKFILL_MESSAGE_WORKERS", "8"))
+# Файл с позицией обхода и очередью сообщений на повтор
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", "last_processed_ids.json")
+# Сколько страниц добавить к сохранённой позиции: за время простоя строки сдвигаются вниз
+BACKFILL_RESUME_MARGIN = int(os.getenv("BACKFILL_RESUME_MARGIN", "1"))
+# Сколько раз пробовать обработать сообщение, прежде чем отказаться от него
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", "3"))
+
+_page_link_re = re.compile(r"__doPostBack\((?:'|&#39;)([^'&]+)(?:'|&#39;),(?:'|&#39;)Page\$(\d+)(?:'|&#39;)\)")
+_current_page_re = re.compile(r"<span>(\d+)</span>")
+
+
+def parse_pager(html):
+    """
+    Разбирает строку пагинации таблицы сообщений.
+    :return: (номер текущей страницы, {номер страницы: event target для postback}).
+    Ссылка "..." попадает в словарь под номером страницы, на которую ведёт.
+    """
+    pager_start = html.find('class="pager"')
+    if pager_start == -1:
+        return 1, {}
+    fragment = html[pager_start:]
+    links = {int(page): target for target, page in _page_link_re.findall(fragment)}
+    current = _current_page_re.search(fragment)
+    return (int(current.group(1)) if current else 1), links
+
+
+def _go_to(page, links):
+    return post_back(links[page], f"Page${page}")
+
+
+def open_listing_page(page, html=None):
+    """
+    Переходит на страницу page в HTTP-сессии текущего потока, двигаясь по ссылкам пагинации.
+    :param html: HTML текущей страницы сессии; если не передан, начинаем с первой страницы.
+    """
+    if html is None:
+        html = fetch_listing_html()
+    current, links = parse_pager(html)
+    while current != page:
+        if page > current:
+            candidates = [p for p in links if current < p <= page]
+            step = max(candidates) if candidates else None
+        else:
+            candidates = [p for p in links if page <= p < current]
+            step = min(candidates) if candidates else None
+        if step is None:
+            raise ValueError(f"Страница {page} недоступна из пагинации страницы {current}")
+        html = _go_to(step, links)
+        current, links = parse_pager(html)
+    return html
+
+
+def discover_page_count(limit=BACKFILL_PAGES):
+    """
+    Определяет реальное количество страниц списка сообщений (не больше limit).
+    """
+    html = fetch_listing_html()
+    current, links = parse_pager(html)
+    last = max([current, *links])
+    while last < limit and links and max(links) > current:
+        current, links = parse_pager(_go_to(max(links), links))
+        new_last = max([current, *links])
+        if new_last <= last:
+            break
+        last = new_last
+    return min(last, limit)
+
+
+def crawl_pages(pages):
+    """
+    Обходит непрерывный диапазон страниц в собственной HTTP-сессии потока.
+    :return: {номер страницы: строки списка сообщений}
+    """
+    reset_session()
+    results = {}
+    futures = {}
+    html = None
+    for page in pages:
+        try:
+            html = open_listing_page(page, html)
+            # Страница разбирается в пуле процессов, а поток сразу переходит к следующей
+            futures[page] = get_parse_pool().parse_listing(html)
+        except Exception as e:
+            logger.error(f"Ошибка при переходе на страницу {page}: {e}")
+            html = None
+            reset_session()
+    for page, future in futures.items():
+        try:
+            results[page] = future.result()
+            logger.info(f"Страница {page} загружена, релевантных строк: {len(results[page])}")
+        except Exception as e:
+            logger.error(f"Ошибка при разборе страницы {page}: {e}")
+    return results
+
+
+def fetch_message_content(link):
+    return get_parse_pool().parse_message(fetch_message_html(link), link).result()
+
+
+def load_checkpoint():
+    """
+    Загружает позицию обхода: страница и id последнего сохранённого сообщения и очередь повторов.
+    """
+    try:
+        with open(BACKFILL_CHECKPOINT_FILE, "r", encoding="utf-8") as file:
+            checkpoint = json.load(file)
+    except FileNotFoundError:
+        checkpoint = {}
+    except (json.JSONDecodeError, IOError) as e:
+        logger.error(f"Ошибка при чтении {BACKFILL_CHECKPOINT_FILE}: {e}. Обход начнётся сначала.")
+        checkpoint = {}
+
+    # Прежний формат файла (список id) не содержит позиции
+    if not isinstance(checkpoint, dict):
+        checkpoint = {}
+    # Номер строки прежних версий не используется: строки сдвигаются, позицию задаёт id сообщения
+    checkpoint.pop("row", None)
+    checkpoint.setdefault("page", None)
+    checkpoint.setdefault("msg_id", None)
+    checkpoint.setdefault("retry", [])
+    return checkpoint
+
+
+def save_checkpoint(checkpoint):
+    """
+    Атомарно записывает позицию обхода на диск.
+    """
+    tmp_path = f"{BACKFILL_CHECKPOINT_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, BACKFILL_CHECKPOINT_FILE)
+
+
+def load_message_content(link, driver, future=None):
+    """
+    Возвращает разобранное сообщение: из результата HTTP-загрузки, а при неудаче - через браузер.
+    """
+    try:
+        message_content = future.result() if future else fetch_message_content(link)
+    except Exception as e:
+        logger.warning(f"HTTP-загрузка сообщения не удалась, используем браузер: {e}")
+        message_content = None
+    if message_content is None:
+        message_content = parse_message_page(link, driver)
+    return message_content
+
+
+def retry_failed(checkpoint, driver):
+    """
+    Повторяет обработку сообщений из очереди повторов.
+    """
+    remaining = []
+    for entry in checkpoint["retry"]:
+        new_message = ListingRow(**entry["message"])
+        try:
+            message_content = load_message_content(new_message.сообщение_ссылка, driver)
+            commit_message(new_message, message_content)
+            logger.info(f"Сообщение {entry['msg_id']} обработано с попытки {entry['attempts'] + 1}.")
+        except Exception as e:
+            entry["attempts"] += 1
+            if entry["attempts"] >= BACKFILL_MAX_ATTEMPTS:
+                logger.error(f"Сообщение {entry['msg_id']} не обработано за {entry['attempts']} попыток: {e}")
+            else:
+                logger.warning(f"Повторная обработка сообщения {entry['msg_id']} не удалась: {e}")
+                remaining.append(entry)
+    checkpoint["retry"] = remaining
+    save_checkpoint(checkpoint)
+
+
+def run_backfill(driver):
+    """
+    Обход последних страниц списка сообщений при старте.
+    Страницы делятся на диапазоны между потоками, страницы сообщений загружаются пулом потоков,
+    а сохранение идёт строго от старых сообщений к новым.
+    После каждого сообщения позиция (страница и id сообщения) записывается в BACKFILL_CHECKPOINT_FILE.
+    После сбоя обходятся страницы до сохранённой (с запасом BACKFILL_RESUME_MARGIN), а строки до сохранённого
+    сообщения включительно пропускаются. Сообщения с ошибкой попадают в очередь повторов.
+    :return: False, если не удалось обработать сообщение при обходе браузером (parse_all_pages_reverse).
+    """
+    started = time.monotonic()
+    checkpoint = load_checkpoint()
+    if checkpoint["retry"]:
+        logger.info(f"В очереди повторов {len(checkpoint['retry'])} сообщений.")
+        retry_failed(checkpoint, driver)
+
+    try:
+        page_count = discover_page_count()
+    except Exception as e:
+        logger.warning(f"Не удалось определить количество страниц по HTTP, обход браузером: {e}")
+        reset_session()
+        return parse_all_pages_reverse(driver)
+
+    if checkpoint["page"]:
+        page_count = min(page_count, checkpoint["page"] + BACKFILL_RESUME_MARGIN)
+        logger.info(f"Продолжаем обход со страницы {checkpoint['page']} после сообщения {checkpoint['msg_id']}.")
+
+    pages = list(range(1, page_count + 1))
+    shard_size = -(-len(pages) // BACKFILL_LISTING_WORKERS)
+    shards = [pages[i:i + shard_size] for i in range(0, len(pages), shard_size)]
+    logger.info(f"Начало обхода {page_count} страниц в {len(shards)} потоках.")
+
+    listings = {}
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        for result in pool.map(crawl_pages, shards):
+            listings.update(result)
+
+    # От старых к новым: с последней страницы, строки снизу вверх
+    rows = [(page, msg_id, new_message) for page in sorted(listings, reverse=True)
+            for msg_id, new_message in reversed(listings[page])]
+    # Строки до сохранённого сообщения включительно уже обработаны прошлым запуском. Если сообщения
+    # в списке больше нет (ушло дальше запаса страниц), обработанные строки отсеет is_new_message
+    resume_at = next((i + 1 for i, (_, msg_id, _) in enumerate(rows) if msg_id == checkpoint["msg_id"]), 0)
+    if checkpoint["msg_id"] and not resume_at:
+        logger.warning(f"Сообщение {checkpoint['msg_id']} не найдено в списке, проверяем все строки.")
+
+    pending = []
+    seen = set()
+    for page, msg_id, new_message in rows[resume_at:]:
+        # Пока идёт обход, новые публикации сдвигают строки между страницами
+        if msg_id in seen or not is_new_message(msg_id, new_message):
+            continue
+        seen.add(msg_id)
+        pending.append((page, msg_id, new_message))
+    logger.info(f"Новых сообщений для обработки: {len(pending)}, пропущено до сохранённой позиции: {resume_at}")
+
+    with ThreadPoolExecutor(max_workers=BACKFILL_MESSAGE_WORKERS) as pool:
+        futures = [pool.submit(fetch_message_content, new_message.сообщение_ссылка)
+                   for _, _, new_message in pending]
+        for (page, msg_id, new_message), future in zip(pending, futures):
+            mark_checked(msg_id, new_message)
+            save_checked_messages(get_checked_messages())
+            try:
+                message_content = load_message_content(new_message.сообщение_ссылка, driver, future)
+                commit_message(new_message, message_content)
+
+            except Exception as e:
+                logger.error(f"Ошибка при обработке сообщения, добавлено в очередь повторов: {e}")
+                checkpoint["retry"].append({"msg_id": msg_id, "message": new_message._asdict(), "attempts": 1})
+
+            checkpoint.update(page=page, msg_id=msg_id)
+            save_checkpoint(checkpoint)
+
+    if checkpoint["retry"]:
+        retry_failed(checkpoint, driver)
+
+    # Обход завершён: следующий запуск начнёт с полного набора страниц
+    checkpoint.update(page=None, msg_id=None)
+    save_checkpoint(checkpoint)
+    logger.info(f"Обход страниц завершен за {time.monotonic() - started:.1f} с.")
@@ -2,30 +2,18 @@ import os
 import logging
 import subprocess
 
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from dotenv import load_dotenv
 import xml.etree.ElementTree as ET
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from db_pool import db_connection
+from webdriver import acquire_driver, get_driver_pool
 import re
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-# Загрузка переменных окружения
-load_dotenv()
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-
 XML_FILE_PATH = "banks.xml"
 BIC_PATTERN = r"БИК.*?(04\d{7})"
 
@@ -77,26 +65,19 @@ def setup_virtual_display():
         logging.error(f"Ошибка при настройке виртуального дисплея: {e}")
         return None
 
+_xvfb_process = None
+
 def create_webdriver():
     """
-    Создает WebDriver с виртуальным дисплеем.
+    Берёт браузер из общего пула webdriver.py. Виртуальный дисплей запускается один раз на процесс,
+    чтобы запасные браузеры пула работали на том же дисплее.
     """
-    # Настройка виртуального дисплея
-    xvfb_process = setup_virtual_display()
-    if not xvfb_process:
-        raise RuntimeError("Не удалось настроить виртуальный дисплей.")
-
-    # Настройка WebDriver
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_service = Service(ChromeDriverManager().install())
-
-    driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
-    driver.xvfb_process = xvfb_process  # Сохраняем процесс для последующего завершения
-    return driver
+    global _xvfb_process
+    if _xvfb_process is None:
+        _xvfb_process = setup_virtual_display()
+        if not _xvfb_process:
+            raise RuntimeError("Не удалось настроить виртуальный дисплей.")
+    return acquire_driver()
 
 def cleanup_virtual_display(driver):
     """
@@ -106,23 +87,95 @@ def cleanup_virtual_display(driver):
         driver.xvfb_process.terminate()
         logging.info("Процесс Xvfb завершен.")
 
-def check_connection(connection):
-    try:
-        if connection.closed:
-            logging.info("Переподключение к базе данных...")
-            connection = psycopg2.connect(
-                dbname=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                host=DB_HOST,
-                port=DB_PORT
-            )
-            connection.autocommit = True
-        return connection
-    except psycopg2.Error as e:
-        logging.error(f"Ошибка переподключения к базе данных: {e}")
-        raise
-
+# Строки таблицы сообщений, в колонке типа которых есть arguments[0]: [текст ячейки, href, onclick]
+ANNOUNCEMENT_ROWS_SCRIPT = """
+var table = document.getElementById('ctl00_cphBody_gvMessages'), result = [];
+if (!table) return result;
+var rows = table.getElementsByTagName('tr');
+for (var i = 0; i < rows.length; i++) {
+    var cells = rows[i].getElementsByTagName('td');
+    if (cells.length > 1 && cells[1].innerText.indexOf(arguments[0]) !== -1) {
+        var link = cells[1].getElementsByTagName('a')[0];
+        result.push([cells[1].innerText, link ? link.href : null, link ? link.getAttribute('onclick') : null]);
+    }
+}
+return result;
+"""
+
+# Тексты, в которых ищется БИК: блоки div.msg и ячейки строк с arguments[0] ("Правила подачи заявок")
+BIC_SOURCES_SCRIPT = """
+var messages = [], rules = [];
+var blocks = document.querySelectorAll('div.msg');
+for (var i = 0; i < blocks.length; i++) messages.push(blocks[i].innerText);
+var rows = document.getElementsByTagName('tr');
+for (var r = 0; r < rows.length; r++) {
+    if (rows[r].innerText.indexOf(arguments[0]) === -1) continue;
+    var cells = rows[r].getElementsByTagName('td'), texts = [];
+    for (var c = 0; c < cells.length; c++) texts.push(cells[c].innerText);
+    rules.push(texts);
+}
+return [messages, rules];
+"""
+
+# Кнопка перехода на следующую страницу: [есть ли пагинация, кнопка или null].
+# arguments[0] - номер следующей страницы, arguments[1] - искать кнопку "..." (переход на следующий десяток)
+NEXT_PAGE_SCRIPT = """
+var pager = document.getElementsByClassName('pager')[0];
+if (!pager) return [false, null];
+var links = pager.getElementsByTagName('a'), dots = [];
+for (var i = 0; i < links.length; i++) {
+    var text = links[i].innerText.trim();
+    if (arguments[1] && text === '...') dots.push(links[i]);
+    if (!arguments[1] && text === arguments[0]) return [true, links[i]];
+}
+if (arguments[1] && (dots.length === 1 || dots.length === 2)) return [true, dots[dots.length - 1]];
+return [true, null];
+"""
+
+
+def find_announcement_rows(driver):
+    """
+    Строки с объявлениями о торгах на текущей странице таблицы сообщений: [(текст, ссылка)].
+    Один вызов execute_script вместо команды WebDriver на каждую строку и ячейку.
+    """
+    rows = []
+    for text, href, onclick in driver.execute_script(ANNOUNCEMENT_ROWS_SCRIPT, "Объявление о проведении торгов"):
+        if not href and onclick:
+            match = re.search(r"openNewWin\('([^']+)", onclick)
+            if match:
+                relative_url = match.group(1)
+                base_url = "https://old.bankrot.fedresurs.ru"
+                href = f"{base_url}{relative_url}"
+                logging.info(f"Сформированная ссылка из onclick: {href}")
+        rows.append((text, href))
+    return rows
+
+
+def find_bic_on_message_page(driver):
+    """
+    Ищет БИК на открытой странице объявления: сначала в div.msg, затем в строках "Правила подачи заявок".
+    :return: (банк, причина, БИК) или None.
+    """
+    messages, rules_rows = driver.execute_script(BIC_SOURCES_SCRIPT, "Правила подачи заявок")
+    for text in messages:
+        logging.info(f"Проверка сообщения: {text[:100]}...")
+        matches = re.findall(BIC_PATTERN, text, re.IGNORECASE)
+        if matches:
+            bic = matches[-1]
+            bank_name, reason = get_bank_name_from_xml(bic)
+            logging.info(f"Найден БИК: {bic}, Банк: {bank_name}")
+            return bank_name, reason, bic
+
+    logging.info("БИК не найден в div.msg, ищем в строках с 'Правила подачи заявок'")
+    for cells in rules_rows:
+        for cell in cells:
+            matches = re.findall(BIC_PATTERN, cell, re.IGNORECASE)
+            if matches:
+                bic = matches[-1]
+                bank_name, reason = get_bank_name_from_xml(bic)
+                logging.info(f"Найден БИК в 'Правила подачи заявок': {bic}, Банк: {bank_name}")
+                return bank_name, reason, bic
+    return None
 
 
 def process_link(link, driver):
@@ -143,84 +196,34 @@ def process_link(link, driver):
                 logging.error(f"Ошибка загрузки таблицы на странице {page_number}: {e}")
                 return "не найден", "Не найдена таблица сообщений", None
 
-            rows = table.find_elements(By.TAG_NAME, "tr")
-
-            for row in rows:
-                columns = row.find_elements(By.TAG_NAME, "td")
-                if len(columns) > 1 and "Объявление о проведении торгов" in columns[1].text:
-                    logging.info(f"Найдена строка с объявлением на странице {page_number}: {columns[1].text}")
-
-                    link_element = columns[1].find_element(By.TAG_NAME, "a")
-                    href = link_element.get_attribute("href")
-
-                    if not href:
-                        onclick_value = link_element.get_attribute("onclick")
-                        if onclick_value:
-                            match = re.search(r"openNewWin\('([^']+)", onclick_value)
-                            if match:
-                                relative_url = match.group(1)
-                                base_url = "https://old.bankrot.fedresurs.ru"
-                                href = f"{base_url}{relative_url}"
-                                logging.info(f"Сформированная ссылка из onclick: {href}")
-
-                    if href:
-                        driver.execute_script("window.open(arguments[0]);", href)
-                        driver.switch_to.window(driver.window_handles[-1])
-
-                        try:
-                            messages = WebDriverWait(driver, 10).until(
-                                EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.msg"))
-                            )
-                            for msg in messages:
-                                text = msg.text
-                                logging.info(f"Проверка сообщения: {text[:100]}...")
-                                matches = re.findall(BIC_PATTERN, text, re.IGNORECASE)
-                                if matches:
-                                    bic = matches[-1]
-                                    bank_name, reason = get_bank_name_from_xml(bic)
-                                    logging.info(f"Найден БИК: {bic}, Банк: {bank_name}")
-                                    return bank_name, reason, bic
-
-                            logging.info("БИК не найден в div.msg, ищем в строках с 'Правила подачи заявок'")
-                            rules_rows = driver.find_elements(By.TAG_NAME, "tr")
-                            for rules_row in rules_rows:
-                                if "Правила подачи заявок" in rules_row.text:
-                                    cells = rules_row.find_elements(By.TAG_NAME, "td")
-                                    for cell in cells:
-                                        matches = re.findall(BIC_PATTERN, cell.text, re.IGNORECASE)
-                                        if matches:
-                                            bic = matches[-1]
-                                            bank_name, reason = get_bank_name_from_xml(bic)
-                                            logging.info(f"Найден БИК в 'Правила подачи заявок': {bic}, Банк: {bank_name}")
-                                            return bank_name, reason, bic
-
-                        finally:
-                            cleanup_virtual_display(driver)
-                            driver.close()
-                            driver.switch_to.window(driver.window_handles[0])
+            for text, href in find_announcement_rows(driver):
+                logging.info(f"Найдена строка с объявлением на странице {page_number}: {text}")
+
+                if href:
+                    driver.execute_script("window.open(arguments[0]);", href)
+                    driver.switch_to.window(driver.window_handles[-1])
+
+                    try:
+                        WebDriverWait(driver, 10).until(
+                            EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.msg"))
+                        )
+                        found = find_bic_on_message_page(driver)
+                        if found:
+                            return found
+
+                    finally:
+                        cleanup_virtual_display(driver)
+                        driver.close()
+                        driver.switch_to.window(driver.window_handles[0])
             if page_number > 30:
                 logging.info("Количество страниц превысило 30, БИК не найден. Переход к следующей ссылке.")
                 return "не найден", "Пройдено более 30 страниц и не найден БИК", None
 
             try:
-                pagination = driver.find_elements(By.CLASS_NAME, "pager")
-                if pagination:
-                    next_buttons = pagination[0].find_elements(By.TAG_NAME, "a")
-                    next_button = None
-
-                    if page_number % 10 == 0:
-                        ellipsis_buttons = [button for button in next_buttons if button.text == "..."]
-                        if len(ellipsis_buttons) == 2:
-                            next_button = ellipsis_buttons[1]
-                        elif len(ellipsis_buttons) == 1:
-                            next_button = ellipsis_buttons[0]
-
-                    else:
-                        for button in next_buttons:
-                            if button.text == str(page_number + 1):
-                                next_button = button
-                                break
-
+                has_pager, next_button = driver.execute_script(
+                    NEXT_PAGE_SCRIPT, str(page_number + 1), page_number % 10 == 0
+                )
+                if has_pager:
                     if next_button:
                         logging.info(f"Переход на страницу {page_number + 1} через кнопку: {next_button.text}")
                         next_button.click()
@@ -241,132 +244,119 @@ def process_link(link, driver):
         logging.error(f"Ошибка при обработке ссылки {link}: {e}")
         return "не найден", "Ошибка обработки ссылки", None
 
-# Основная функция
+def process_pass(connection, cursor):
+    """
+    Один проход по записям без Статус_банка. False - новых записей нет.
+    """
+    logging.info("Выполняем запрос к таблице dolzhnik на пустые записи Статус_банка...")
+    cursor.execute("SELECT * FROM dolzhnik WHERE Статус_банка IS NULL OR Статус_банка = ''")
+    rows_dolzhnik = cursor.fetchall()
+
+    logging.info("Выполняем запрос к таблице messages для записей с типом сообщения 'объявлен' и пустым Статус_банка...")
+    cursor.execute("SELECT * FROM messages WHERE Статус_банка IS NULL AND LOWER(тип_сообщения) LIKE '%объявлен%' LIMIT 1000")
+    rows_messages = cursor.fetchall()
+
+    logging.info(f"Найдено записей в dolzhnik: {len(rows_dolzhnik)}")
+    logging.info(f"Найдено записей в messages: {len(rows_messages)}")
+
+    if not rows_dolzhnik and not rows_messages:
+        return False
+
+    driver = create_webdriver()
 
-def main():
-    import time  # Импорт для работы с задержками в цикле
     try:
-        # Подключение к базе данных
-        connection = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        connection.autocommit = True
-        connection = check_connection(connection)
-
-        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
-            logging.info("Начинаем обработку таблицы dolzhnik. Подключение к базе данных успешно.")
-
-            while True:
-                logging.info("Выполняем запрос к таблице dolzhnik на пустые записи Статус_банка...")
-                connection = check_connection(connection)
-                cursor.execute("SELECT * FROM dolzhnik WHERE Статус_банка IS NULL OR Статус_банка = ''")
-                rows_dolzhnik = cursor.fetchall()
-
-                logging.info("Выполняем запрос к таблице messages для записей с типом сообщения 'объявлен' и пустым Статус_банка...")
-                cursor.execute("SELECT * FROM messages WHERE Статус_банка IS NULL AND LOWER(тип_сообщения) LIKE '%объявлен%' LIMIT 1000")
-                rows_messages = cursor.fetchall()
-
-                logging.info(f"Найдено записей в dolzhnik: {len(rows_dolzhnik)}")
-                logging.info(f"Найдено записей в messages: {len(rows_messages)}")
-
-                if not rows_dolzhnik and not rows_messages:
-                    logging.info("Нет новых записей. Ожидание новых данных...")
-                    time.sleep(60)
-                    continue
-
-                driver = create_webdriver()
-
-                try:
-                    logging.info(f"Начинаем обработку {len(rows_dolzhnik)} записей из таблицы dolzhnik...")
-                    for row in rows_dolzhnik:
-                        connection = check_connection(connection)  # Проверяем соединение перед использованием
-                        link = row.get("Должник_ссылка_ЕФРСБ")
-                        if link:
-                            bank_name, reason, bic = process_link(link, driver)
-
-                            if bank_name == "не найден":
-                                cursor.execute(
-                                    """
-                                    UPDATE dolzhnik
-                                    SET Статус_банка = %s
-                                    WHERE Инн_Должника = %s
-                                    """,
-                                    (f"Не нашел: {reason}", row["Инн_Должника"])
-                                )
-                            else:
-                                cursor.execute(
-                                    """
-                                    UPDATE dolzhnik
-                                    SET Статус_банка = %s, Банк_в_котором_хранятся_деньги = %s
-                                    WHERE Инн_Должника = %s
-                                    """,
-                                    (bic, bank_name, row["Инн_Должника"])
-                                )
-
-                    connection.commit()
-
-                    logging.info(f"Начинаем обработку {len(rows_messages)} записей из таблицы messages...")
-                    while rows_messages:
-                        connection = check_connection(connection)  # Проверяем соединение перед каждым запросом
-                        for row in rows_messages:
-                            link = row.get("должник_ссылка")
-                            inn = row.get("ИНН")
-
-                            if link:
-                                bank_name, reason, bic = process_link(link, driver)
-
-                                if bank_name == "не найден":
-                                    cursor.execute(
-                                        """
-                                        UPDATE messages
-                                        SET Статус_банка = %s
-                                        WHERE должник_ссылка = %s
-                                        """,
-                                        (f"Не нашел: {reason}", link)
-                                    )
-                                else:
-                                    cursor.execute(
-                                        """
-                                        UPDATE messages
-                                        SET Статус_банка = %s
-                                        WHERE должник_ссылка = %s
-                                        """,
-                                        (bic, link)
-                                    )
-
-                                    if inn:
-                                        cursor.execute(
-                                            """
-                                            UPDATE dolzhnik
-                                            SET Статус_банка = %s, Банк_в_котором_хранятся_деньги = %s
-                                            WHERE Инн_Должника = %s
-                                            """,
-                                            (bic, bank_name, inn)
-                                        )
-
-                        connection.commit()
-
-                        cursor.execute("SELECT * FROM messages WHERE Статус_банка IS NULL AND LOWER(тип_сообщения) LIKE '%объявлен%' LIMIT 1000")
-                        rows_messages = cursor.fetchall()
-
-                finally:
-                    logging.info("Завершаем работу WebDriver и закрываем браузер.")
-                    driver.quit()
+        logging.info(f"Начинаем обработку {len(rows_dolzhnik)} записей из таблицы dolzhnik...")
+        for row in rows_dolzhnik:
+            link = row.get("Должник_ссылка_ЕФРСБ")
+            if link:
+                bank_name, reason, bic = process_link(link, driver)
+
+                if bank_name == "не найден":
+                    cursor.execute(
+                        """
+                        UPDATE dolzhnik
+                        SET Статус_банка = %s
+                        WHERE Инн_Должника = %s
+                        """,
+                        (f"Не нашел: {reason}", row["Инн_Должника"])
+                    )
+                else:
+                    cursor.execute(
+                        """
+                        UPDATE dolzhnik
+                        SET Статус_банка = %s, Банк_в_котором_хранятся_деньги = %s
+                        WHERE Инн_Должника = %s
+                        """,
+                        (bic, bank_name, row["Инн_Должника"])
+                    )
+
+        connection.commit()
+
+        logging.info(f"Начинаем обработку {len(rows_messages)} записей из таблицы messages...")
+        while rows_messages:
+            for row in rows_messages:
+                link = row.get("должник_ссылка")
+                inn = row.get("ИНН")
+
+                if link:
+                    bank_name, reason, bic = process_link(link, driver)
+
+                    if bank_name == "не найден":
+                        cursor.execute(
+                            """
+                            UPDATE messages
+                            SET Статус_банка = %s
+                            WHERE должник_ссылка = %s
+                            """,
+                            (f"Не нашел: {reason}", link)
+                        )
+                    else:
+                        cursor.execute(
+                            """
+                            UPDATE messages
+                            SET Статус_банка = %s
+                            WHERE должник_ссылка = %s
+                            """,
+                            (bic, link)
+                        )
+
+                        if inn:
+                            cursor.execute(
+                                """
+                                UPDATE dolzhnik
+                                SET Статус_банка = %s, Банк_в_котором_хранятся_деньги = %s
+                                WHERE Инн_Должника = %s
+                                """,
+                                (bic, bank_name, inn)
+                            )
+
+            connection.commit()
+
+            cursor.execute("SELECT * FROM messages WHERE Статус_банка IS NULL AND LOWER(тип_сообщения) LIKE '%объявлен%' LIMIT 1000")
+            rows_messages = cursor.fetchall()
 
-    except Exception as e:
-        logging.error(f"Ошибка: {e}")
-        if connection:
-            connection = check_connection(connection)  # Проверяем соединение перед откатом
-            connection.rollback()
     finally:
-        if connection:
-            connection = check_connection(connection)  # Убедиться, что соединение открыто
-            connection.close()
-            logging.info("Соединение с базой данных закрыто.")
+        logging.info("Завершаем работу WebDriver и закрываем браузер.")
+        get_driver_pool().release(driver)
+    return True
+
+# Основная функция
+
+def main():
+    import time  # Импорт для работы с задержками в цикле
+    logging.info("Начинаем обработку таблицы dolzhnik.")
+    while True:
+        try:
+            # Соединение берётся из общего пула на один проход: пул проверяет его и переподключается сам
+            with db_connection(autocommit=True) as connection, \
+                    connection.cursor(cursor_factory=RealDictCursor) as cursor:
+                found = process_pass(connection, cursor)
+        except Exception as e:
+            logging.error(f"Ошибка: {e}")
+            found = False
+        if not found:
+            logging.info("Нет новых записей. Ожидание новых данных...")
+            time.sleep(60)
 
 if __name__ == "__main__":
     main()
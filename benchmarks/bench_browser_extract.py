@@ -0,0 +1,151 @@
+"""
+Извлечение данных в браузере: команды WebDriver и время до и после перехода на execute_script.
+
+Три места, где браузер читает страницу:
+  - parse_message_page: page_source + разбор в Python против одного вызова MESSAGE_EVENTS_SCRIPT;
+  - cityRT.extract_address_from_message: find_elements/.text по каждой строке и ячейке против ADDRESS_SCRIPT;
+  - bankRT.process_link: поиск строк с объявлением и БИК по элементам против ANNOUNCEMENT_ROWS_SCRIPT
+    и BIC_SOURCES_SCRIPT.
+Варианты "до" повторяют прежний код. Страницы отдаёт локальный сервер из bench_browser_startup.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_browser_extract.py --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BROWSER_PROFILE_DIR", tempfile.mkdtemp(prefix="bench_profiles_"))
+os.environ.setdefault("DEDUP_STORE_FILE", os.path.join(tempfile.mkdtemp(prefix="bench_extract_"), "checked.log"))
+os.environ.setdefault("ARCHIVE_ENABLED", "0")
+# cityRT и bankRT читают настройки БД при импорте
+os.environ.setdefault("DB_PASSWORD", "")
+
+from selenium.webdriver.common.by import By  # noqa: E402
+
+from bench_browser_startup import FixtureHandler, MESSAGE  # noqa: E402
+
+# Страница сообщения, где адрес для корреспонденции лежит в секции headInfo (как ищет cityRT)
+ADDRESS_MESSAGE = MESSAGE.decode("utf-8").replace(
+    "<div>Кем опубликовано</div>\n<table>", '<table class="headInfo">', 1).encode("utf-8")
+
+
+class ExtractHandler(FixtureHandler):
+    def do_GET(self):
+        if self.path.startswith("/AddressMessage.aspx"):
+            self._send("text/html; charset=utf-8", ADDRESS_MESSAGE)
+        else:
+            super().do_GET()
+
+
+def parse_message_page_before(url, driver):
+    from parsing import load_message_html, parse_message_html
+    return parse_message_html(load_message_html(url, driver), url)
+
+
+def extract_address_before(driver):
+    for div in driver.find_elements(By.CLASS_NAME, "headInfo"):
+        for row in div.find_elements(By.TAG_NAME, "tr"):
+            cells = row.find_elements(By.TAG_NAME, "td")
+            if len(cells) > 1 and "Адрес для корреспонденции" in cells[0].text.strip():
+                return cells[1].text.strip() or None
+    return None
+
+
+def announcement_rows_before(driver):
+    table = driver.find_element(By.ID, "ctl00_cphBody_gvMessages")
+    rows = []
+    for row in table.find_elements(By.TAG_NAME, "tr"):
+        columns = row.find_elements(By.TAG_NAME, "td")
+        if len(columns) > 1 and "Объявление о проведении торгов" in columns[1].text:
+            link_element = columns[1].find_element(By.TAG_NAME, "a")
+            rows.append((columns[1].text, link_element.get_attribute("href")))
+    return rows
+
+
+def bic_before(driver):
+    from bankRT import BIC_PATTERN
+    for msg in driver.find_elements(By.CSS_SELECTOR, "div.msg"):
+        matches = re.findall(BIC_PATTERN, msg.text, re.IGNORECASE)
+        if matches:
+            return matches[-1]
+    for rules_row in driver.find_elements(By.TAG_NAME, "tr"):
+        if "Правила подачи заявок" in rules_row.text:
+            for cell in rules_row.find_elements(By.TAG_NAME, "td"):
+                matches = re.findall(BIC_PATTERN, cell.text, re.IGNORECASE)
+                if matches:
+                    return matches[-1]
+    return None
+
+
+def measure(name, driver, func, repeat):
+    commands, elapsed, result = 0, 0.0, None
+    for _ in range(repeat):
+        before = driver.command_count
+        started = time.perf_counter()
+        result = func()
+        elapsed += time.perf_counter() - started
+        commands += driver.command_count - before
+    print(f"{name:<44} {commands / repeat:8.1f} команд   {elapsed / repeat * 1000:8.1f} мс")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    ExtractHandler.asset_delay = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ExtractHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    import bankRT
+    import cityRT
+    import webdriver
+    from parsing import open_message_page
+    from browser_extract import extract_message_in_browser
+
+    # Название банка берётся из справочника ЦБ по сети - в замер команд браузера оно не входит
+    bankRT.get_bank_name_from_xml = lambda bic: (None, None)
+
+    driver = webdriver.track_commands(webdriver.create_webdriver_with_display())
+    try:
+        message_url = f"{base_url}/MessageWindow.aspx?ID=6513270E269E0D37F2A74DE452E6B438"
+        before = measure("parse_message_page: page_source + разбор", driver,
+                         lambda: parse_message_page_before(message_url, driver), args.repeat)
+        after = measure("parse_message_page: execute_script", driver,
+                        lambda: extract_message_in_browser(open_message_page(message_url, driver)), args.repeat)
+        print(f"  результаты совпадают: {before == after}\n")
+
+        driver.get(f"{base_url}/AddressMessage.aspx")
+        before = measure("cityRT адрес: find_elements/.text", driver, lambda: extract_address_before(driver), args.repeat)
+        after = measure("cityRT адрес: execute_script", driver,
+                        lambda: cityRT.extract_address_from_message(driver), args.repeat)
+        print(f"  результаты совпадают: {before == after}\n")
+
+        driver.get(f"{base_url}/Messages.aspx")
+        before = measure("bankRT строки: find_elements/.text", driver, lambda: announcement_rows_before(driver), args.repeat)
+        after = measure("bankRT строки: execute_script", driver,
+                        lambda: bankRT.find_announcement_rows(driver), args.repeat)
+        print(f"  результаты совпадают: {[text for text, _ in before] == [text for text, _ in after]}\n")
+
+        driver.get(message_url)
+        before = measure("bankRT БИК: find_elements/.text", driver, lambda: bic_before(driver), args.repeat)
+        after = measure("bankRT БИК: execute_script", driver,
+                        lambda: bankRT.find_bic_on_message_page(driver), args.repeat)
+        print(f"  результаты совпадают: {before == (after[2] if after else None)}")
+    finally:
+        webdriver.quit_driver(driver)
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Сравнение прежнего и облегчённого профиля Chrome (webdriver.lean_chrome_options).
+
+Поднимает локальный сервер со страницами из fixtures/: список сообщений, страница сообщения
+и статические ресурсы (стили, картинки, шрифты), которые отдаются с задержкой --asset-delay,
+как с удалённого сайта. Измеряет:
+  - время создания драйвера (и отдельно - поиск chromedriver через ChromeDriverManager);
+  - время parse_message_page на одной странице сообщения;
+  - сколько запросов к статике сделал браузер.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_browser_startup.py --drivers 5 --pages 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+LISTING = open(os.path.join(FIXTURES, "listing.html"), "rb").read()
+MESSAGE = open(os.path.join(FIXTURES, "messages", "auction.html"), "rb").read()
+
+STYLESHEET = b"""
+@font-face { font-family: "Site"; src: url("/static/site.woff2") format("woff2"); }
+body { font-family: "Site", sans-serif; background: url("/static/background.png"); }
+.red_small { color: #c00; }
+"""
+ASSETS = {
+    ".css": ("text/css", STYLESHEET),
+    ".png": ("image/png", b"\x89PNG\r\n\x1a\n" + b"\0" * 20000),
+    ".jpg": ("image/jpeg", b"\xff\xd8\xff" + b"\0" * 60000),
+    ".ico": ("image/x-icon", b"\0" * 1000),
+    ".woff2": ("font/woff2", b"wOF2" + b"\0" * 40000),
+}
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    asset_delay = 0.15
+    asset_requests = 0
+    lock = threading.Lock()
+
+    def _send(self, content_type, body):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path.startswith("/static/"):
+            with FixtureHandler.lock:
+                FixtureHandler.asset_requests += 1
+            time.sleep(self.asset_delay)
+            content_type, body = ASSETS.get(os.path.splitext(path)[1], ("application/octet-stream", b""))
+            self._send(content_type, body)
+        elif path.startswith("/MessageWindow.aspx"):
+            self._send("text/html; charset=utf-8", MESSAGE)
+        else:
+            self._send("text/html; charset=utf-8", LISTING)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def report(name, samples):
+    print(f"{name:<34} среднее {statistics.mean(samples) * 1000:8.1f} мс   "
+          f"медиана {statistics.median(samples) * 1000:8.1f} мс   (n={len(samples)})")
+
+
+def bench_driver_path():
+    import webdriver
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    cold = [timed(lambda: ChromeDriverManager().install())[0] for _ in range(3)]
+    webdriver.chromedriver_path()
+    cached = [timed(webdriver.chromedriver_path)[0] for _ in range(3)]
+    report("ChromeDriverManager().install()", cold)
+    report("chromedriver_path() (кэш)", cached)
+
+
+def bench_profile(name, lean, base_url, drivers, pages):
+    import webdriver
+    from parsing import parse_message_page
+
+    startup = []
+    for _ in range(drivers):
+        elapsed, driver = timed(lambda: webdriver.create_webdriver_with_display(lean=lean))
+        startup.append(elapsed)
+        webdriver.quit_driver(driver)
+    report(f"{name}: создание драйвера", startup)
+
+    driver = webdriver.create_webdriver_with_display(lean=lean)
+    try:
+        url = f"{base_url}/MessageWindow.aspx?ID=6513270E269E0D37F2A74DE452E6B438"
+        FixtureHandler.asset_requests = 0
+        loads = []
+        for _ in range(pages):
+            elapsed, data = timed(lambda: parse_message_page(url, driver))
+            if not data:
+                raise RuntimeError("parse_message_page не вернул данные")
+            loads.append(elapsed)
+        report(f"{name}: parse_message_page", loads)
+        print(f"{name}: запросов к статике на страницу: {FixtureHandler.asset_requests / pages:.1f}")
+    finally:
+        webdriver.quit_driver(driver)
+    return statistics.mean(startup), statistics.mean(loads)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drivers", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--asset-delay", type=float, default=0.15)
+    args = parser.parse_args()
+
+    FixtureHandler.asset_delay = args.asset_delay
+    # Профили бенчмарка не смешиваются с рабочими
+    os.environ.setdefault("BROWSER_PROFILE_DIR", tempfile.mkdtemp(prefix="bench_profiles_"))
+    os.environ.setdefault("ARCHIVE_ENABLED", "0")
+
+    server, base_url = start_server()
+    try:
+        bench_driver_path()
+        default = bench_profile("прежний профиль", False, base_url, args.drivers, args.pages)
+        lean = bench_profile("облегчённый профиль", True, base_url, args.drivers, args.pages)
+        print(f"Выигрыш на создании драйвера: {(default[0] - lean[0]) * 1000:.1f} мс, "
+              f"на parse_message_page: {(default[1] - lean[1]) * 1000:.1f} мс")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
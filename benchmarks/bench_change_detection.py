@@ -0,0 +1,124 @@
+"""
+Проверка изменений без разбора: таблица списка сообщений и лоты сообщения об изменении.
+
+Список: повторный опрос неизменной страницы fixtures/listing.html - разбор строк (parse_listing_rows
+и проверка is_new_message, как в fetch_new_messages_batch) против хэша таблицы table.bank.
+Сообщение: fixtures/messages/change.html с таблицей лотов нужного размера готовится как в конвейере
+(parse_message_html -> prepare_data_for_db). Сравнивается отпечаток лотов с раскладкой на строки
+split_columns, которую он позволяет пропустить вместе со сверкой лотов (само сообщение записывается всегда).
+Проверяется, что отпечаток совпадает для той же таблицы и меняется при изменении цены лота, даты торгов
+или текста сообщения.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_change_detection.py --repeat 200 --lots 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DEDUP_STORE_FILE", os.path.join(tempfile.mkdtemp(prefix="bench_change_"), "checked.log"))
+os.environ.setdefault("DB_PASSWORD", "")
+
+from change_detection import LotFingerprints, ListingSnapshot, listing_digest  # noqa: E402
+from DBManager import prepare_data_for_db  # noqa: E402
+from detecting import is_new_message  # noqa: E402
+from listing import parse_listing_rows  # noqa: E402
+from parsing import parse_message_html  # noqa: E402
+from split import split_columns  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def bench(func, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def prepared_change(lots, price=None, auction_date=None):
+    with open(os.path.join(FIXTURES, "messages", "change.html"), encoding="utf-8") as file:
+        html = file.read()
+    rows = re.findall(r"<tr>\s*<td>.*?</tr>", html.split('class="lotInfo"')[1], re.S)
+    # Номер лота в строке меняется, чтобы лоты различались
+    extra = [re.sub(r"<td>\d+</td>", f"<td>{i + 1}</td>", rows[i % len(rows)], count=1) for i in range(lots)]
+    if price is not None:
+        extra[-1] = re.sub(r"<td>[\d ]+,00</td>", f"<td>{price}</td>", extra[-1])
+    start = html.index(rows[0])
+    end = html.index(rows[-1]) + len(rows[-1])
+    html = html[:start] + "\n".join(extra) + html[end:]
+    if auction_date is not None:
+        html = html.replace("05.12.2026 12:00", auction_date)
+    message = {"дата": "18.10.2026 10:00:00", "тип_сообщения": "Сообщение об изменении объявления о проведении торгов",
+               "должник": "ООО Строймонтаж", "должник_ссылка": "https://old.bankrot.fedresurs.ru/OrganizationCard.aspx",
+               "арбитр": "Петров П. П.", "арбитр_ссылка": "https://old.bankrot.fedresurs.ru/ArbitrManagerCard.aspx",
+               "сообщение_ссылка": "https://old.bankrot.fedresurs.ru/MessageWindow.aspx?ID=1"}
+    return prepare_data_for_db(message, parse_message_html(html, "change"))
+
+
+def check_fingerprints(lots):
+    fingerprints = LotFingerprints()
+    base = prepared_change(lots)
+    fingerprints.remember(base)
+    cases = [
+        ("та же таблица", prepared_change(lots), True),
+        ("другая цена лота", prepared_change(lots, price="1 000,00"), False),
+        ("другая дата торгов", prepared_change(lots, auction_date="10.12.2026 12:00"), False),
+        ("другой текст", base._replace(текст=(base.текст or "") + " Изменено описание лота."), False),
+    ]
+    ok = True
+    for name, prepared, expected in cases:
+        result = fingerprints.unchanged(prepared)
+        ok &= result == expected
+        print(f"{name:<20} без изменений: {result}" + ("" if result == expected else "  <- ошибка"))
+    return ok, base
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--lots", type=int, default=500)
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES, "listing.html"), encoding="utf-8") as file:
+        listing = file.read()
+    snapshot = ListingSnapshot()
+    snapshot.remember(listing_digest(listing))
+    if not snapshot.unchanged(listing_digest(listing)):
+        print("Хэш неизменной таблицы списка не совпал")
+        return 1
+
+    def parse_listing():
+        for msg_id, message in parse_listing_rows(listing):
+            if not is_new_message(msg_id, message):
+                break
+
+    print(f"{'список':<32}{'мс CPU':>10}")
+    print(f"{'  разбор строк':<32}{bench(parse_listing, args.repeat):>10.3f}")
+    print(f"{'  хэш table.bank':<32}{bench(lambda: listing_digest(listing), args.repeat):>10.3f}")
+
+    ok, prepared = check_fingerprints(args.lots)
+    if not ok:
+        return 1
+    fingerprints = LotFingerprints()
+    fingerprints.remember(prepared)
+
+    def split():
+        with contextlib.redirect_stdout(io.StringIO()):
+            split_columns(prepared)
+
+    print(f"\n{'сообщение об изменении, ' + str(args.lots) + ' лотов':<32}{'мс CPU':>10}")
+    print(f"{'  split_columns':<32}{bench(split, max(1, args.repeat // 20)):>10.3f}")
+    print(f"{'  отпечаток лотов':<32}{bench(lambda: fingerprints.unchanged(prepared), args.repeat):>10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
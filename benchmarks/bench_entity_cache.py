@@ -0,0 +1,116 @@
+"""
+Запросы к БД на сообщение в au_debtorsDetecting с кэшем известных АУ и должников и без него.
+
+БД не нужна: соединение подменяется счётчиком запросов, определение часового пояса (process_address:
+запрос к TimeZone и HTTP-запрос по индексу) - счётчиком вызовов. Поток из --messages сообщений
+от --managers АУ по --debtors должникам; номера выбираются с перекосом к недавним, как в ленте
+публикаций. Без кэша (размер 0) каждое сообщение - запрос и определение часового пояса.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_entity_cache.py --messages 20000 --managers 300 --debtors 5000
+"""
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["ENTITY_CACHE_LISTEN"] = "0"
+os.environ["ENTITY_CACHE_PRELOAD"] = "0"
+
+import entity_cache  # noqa: E402
+import fioDETECTING  # noqa: E402
+from logScript import logger  # noqa: E402
+
+
+class CountingCursor:
+    def __init__(self, counts):
+        self.counts = counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.counts["queries"] += 1
+
+    def fetchone(self):
+        return True, True
+
+
+class CountingConnection:
+    def __init__(self, counts):
+        self.counts = counts
+
+    def cursor(self):
+        return CountingCursor(self.counts)
+
+
+def make_messages(count, managers, debtors, seed=1):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        # Перекос к недавним должникам: по одному должнику обычно идёт серия сообщений
+        debtor = int(debtors * rng.random() ** 3)
+        manager = debtor % managers
+        messages.append({
+            "ФИО_АУ": f"Иванов Иван (ИНН {500000000000 + manager}, СНИЛС 1)",
+            "арбитр_ссылка": f"/backend/arbitrmanagers/{manager}",
+            "адрес_корреспонденции": "123456, г. Москва",
+            "СРО_АУ": "СРО",
+            "почта": "au@example.com",
+            "ИНН": str(7700000000 + debtor),
+            "наименование_должника": "ООО Должник",
+            "должник_ссылка": f"/backend/companies/{debtor}",
+            "номер_дела": "А40-1/2024",
+        })
+    return messages
+
+
+def run(messages, cache_size):
+    counts = {"queries": 0, "connections": 0, "located": 0}
+
+    @contextlib.contextmanager
+    def db_connection(autocommit=False):
+        counts["connections"] += 1
+        yield CountingConnection(counts)
+
+    def process_address(row):
+        counts["located"] += 1
+        return dict(row, часовой_пояс=0)
+
+    cache = entity_cache.KnownEntities(maxsize=cache_size)
+    fioDETECTING.db_connection = db_connection
+    fioDETECTING.process_address = process_address
+    fioDETECTING.get_entity_cache = lambda: cache
+    started = time.perf_counter()
+    for message in messages:
+        fioDETECTING.au_debtorsDetecting(dict(message))
+    return time.perf_counter() - started, counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--managers", type=int, default=300)
+    parser.add_argument("--debtors", type=int, default=5000)
+    parser.add_argument("--cache", type=int, nargs="+", default=[0, 1000, 100000])
+    args = parser.parse_args()
+
+    logger.disabled = True
+    messages = make_messages(args.messages, args.managers, args.debtors)
+    print(f"{'кэш':>7} {'запросов':>9} {'соединений':>11} {'часовых поясов':>15} {'на сообщение':>13} {'мкс/сообщ.':>11}")
+    for cache_size in args.cache:
+        elapsed, counts = run(messages, cache_size)
+        print(f"{cache_size:>7} {counts['queries']:>9} {counts['connections']:>11} {counts['located']:>15} "
+              f"{counts['queries'] / len(messages):>13.3f} {elapsed / len(messages) * 1e6:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Раскладка сообщения на строки лотов: прежнее разделение строк "&&& " против списка лотов.
+
+Страница объявления из fixtures/messages/auction.html дополняется строками таблицы лотов
+до нужного количества, затем разбирается и готовится как в рабочем конвейере (parse_message_html ->
+prepare_data_for_db). Замеряется только раскладка на строки (без правил отбора filter_rules и format.process_data):
+  - "до": прежний цикл split_columns, который заново делит каждую колонку для каждой строки;
+  - "строки": текущий split_columns для данных без списка лотов (каждая колонка делится один раз);
+  - "лоты": строки из списка records.Lot.
+Результаты трёх вариантов сравниваются по колонкам лотов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_lots.py --lots 50 200 500
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from DBManager import prepare_data_for_db  # noqa: E402
+from parsing import parse_message_html  # noqa: E402
+import split  # noqa: E402
+
+COLUMNS = ["классификация", "номер_лота", "цена", "описание", "номер_торгов", "балансовая_стоимость",
+           "сведения_о_заключении_договора", "наименование_покупателя"]
+LOT_COLUMNS = ["классификация", "номер_лота", "цена", "описание"]
+
+
+def auction_page(lots):
+    with open(os.path.join(ROOT, "benchmarks", "fixtures", "messages", "auction.html"), encoding="utf-8") as file:
+        auction = file.read()
+    rows = re.findall(r"<tr>\s*<td>.*?</tr>", auction.split('class="lotInfo"')[1], re.S)
+    extra = "\n".join(rows[i % len(rows)] for i in range(lots))
+    return auction.replace("</table>\n<div class=\"containerInfo\">", f"{extra}\n</table>\n<div class=\"containerInfo\">", 1)
+
+
+def split_before(row):
+    # Прежняя раскладка: колонка делится заново для каждой строки результата
+    separator = "&&&"
+    row = row.as_dict()
+    for col in COLUMNS:
+        if col in row and row[col]:
+            row[col] = split.normalize_separator(row[col])
+    max_len = max(len(str(row.get(col, "")).split(separator)) if row.get(col) else 1 for col in COLUMNS)
+    result = []
+    for i in range(max_len):
+        new_row = {}
+        for col in row:
+            if col in COLUMNS and row.get(col):
+                parts = str(row[col]).split(separator)
+                new_row[col] = parts[i] if i < len(parts) else None
+            else:
+                new_row[col] = row[col]
+        result.append(new_row)
+    return result
+
+
+def split_strings(row):
+    # Текущий split_columns без списка лотов, но без правил отбора и process_data
+    saved = split.apply_rules, split.process_data
+    split.apply_rules = lambda rows, stage: rows
+    split.process_data = lambda rows: rows
+    try:
+        return split.split_columns(row.as_dict())
+    finally:
+        split.apply_rules, split.process_data = saved
+
+
+def split_lots(row):
+    return split.lot_rows(row)
+
+
+def timed(func, row, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func(row)
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lots", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'лотов':>6} {'до, мс':>10} {'строки, мс':>12} {'лоты, мс':>10}")
+    for lots in args.lots:
+        content = parse_message_html(auction_page(lots))
+        prepared = prepare_data_for_db({"дата": "01.01.2024 10:00:00", "тип_сообщения": "Объявление о проведении торгов"},
+                                       content)
+        results = {}
+        for name, func in (("до", split_before), ("строки", split_strings), ("лоты", split_lots)):
+            results[name] = timed(func, prepared, args.repeat)
+        rows = {name: [[row[col] for col in LOT_COLUMNS] for row in result] for name, (_, result) in results.items()}
+        if not rows["до"] == rows["строки"] == rows["лоты"]:
+            print(f"{lots}: строки лотов различаются")
+            return 1
+        print(f"{len(rows['лоты']):>6} {results['до'][0] * 1000:>10.2f} {results['строки'][0] * 1000:>12.2f} "
+              f"{results['лоты'][0] * 1000:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
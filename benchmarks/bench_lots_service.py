@@ -0,0 +1,89 @@
+"""
+Сообщений в секунду в lots_analyze: прежний путь (на каждое сообщение asyncio.run, новый движок,
+соединение asyncpg и reflection всех таблиц) против постоянного LotsService.
+
+Нужен доступный PostgreSQL с таблицей dolzhnik (переменные DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD).
+Бенчмарк только читает: каждое сообщение - строка лота с вымышленным ИНН должника, поэтому check_debtor
+идёт в БД (кэш сущностей отключён) и дальше строка не обрабатывается. В прежнем пути движок
+закрывается после сообщения (раньше он не закрывался вовсе).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_lots_service.py --messages 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["ENTITY_CACHE_LISTEN"] = "0"
+os.environ["ENTITY_CACHE_PRELOAD"] = "0"
+
+from sqlalchemy import MetaData  # noqa: E402
+
+import entity_cache  # noqa: E402
+import lots_integrator  # noqa: E402
+from logScript import logger  # noqa: E402
+
+
+class ReflectEveryTime:
+    """
+    Прежний check_debtor: reflection всех таблиц при каждой проверке.
+    """
+
+    async def get(self, session, name):
+        metadata = MetaData()
+        conn = await session.connection()
+        await conn.run_sync(metadata.reflect)
+        return metadata.tables[name]
+
+
+async def legacy_message(rows):
+    engine = lots_integrator.get_engine()
+    try:
+        await lots_integrator.main(rows, lots_integrator.get_session_maker(engine), ReflectEveryTime())
+    finally:
+        await engine.dispose()
+
+
+def make_messages(count):
+    return [[{"ИНН_Должника": str(9900000000 + i), "вид_торгов": None}] for i in range(count)]
+
+
+def run_legacy(messages):
+    started = time.perf_counter()
+    for rows in messages:
+        asyncio.run(legacy_message(rows))
+    return time.perf_counter() - started
+
+
+def run_service(messages):
+    started = time.perf_counter()
+    service = lots_integrator.LotsService()
+    for rows in messages:
+        service.submit(rows).result()
+    service.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.disabled = True
+    cache = entity_cache.KnownEntities(maxsize=0)
+    lots_integrator.get_entity_cache = lambda: cache
+    messages = make_messages(args.messages)
+
+    print(f"{'':<22}{'сообщений/с':>12}{'мс/сообщение':>14}")
+    for name, run in (("asyncio.run на каждое", run_legacy), ("LotsService", run_service)):
+        elapsed = run(messages)
+        print(f"{name:<22}{len(messages) / elapsed:>12.1f}{elapsed / len(messages) * 1000:>14.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
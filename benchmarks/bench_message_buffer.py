@@ -0,0 +1,92 @@
+"""
+Скорость записи сообщений в messages через MessageWriteBuffer в зависимости от размера пачки.
+
+Нужен доступный PostgreSQL (переменные DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, как у парсера).
+Запись идёт во временную таблицу messages (видна только соединению бенчмарка и перекрывает настоящую):
+копию структуры public.messages, если она есть, иначе - таблицу с текстовыми колонками MESSAGE_COLUMNS
+и уникальным номером сообщения. Каждая пачка - один запрос и один коммит, batch=1 соответствует
+прежней записи по одному сообщению. После каждого прогона те же строки пишутся ещё раз: все должны
+быть пропущены как дубликаты самим запросом.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_message_buffer.py --rows 5000 --batch 1 50 500
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+from DBManager import INSERT_MESSAGES_BATCH_QUERY  # noqa: E402
+from bench_records import load_contents, make_batch  # noqa: E402
+from db_pool import connection_params  # noqa: E402
+from message_buffer import MessageWriteBuffer  # noqa: E402
+from records import MESSAGE_COLUMNS  # noqa: E402
+
+
+def create_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('public.messages')")
+        if cursor.fetchone()[0]:
+            cursor.execute("CREATE TEMP TABLE messages (LIKE public.messages INCLUDING ALL)")
+        else:
+            columns = ", ".join(f"{column} text" for column in MESSAGE_COLUMNS if column != "номер_сообщения")
+            cursor.execute(f"CREATE TEMP TABLE messages (id serial PRIMARY KEY, номер_сообщения text UNIQUE, {columns})")
+    conn.commit()
+
+
+def run(conn, batch_size, messages):
+    def insert(rows):
+        with conn.cursor() as cursor:
+            inserted = execute_values(cursor, INSERT_MESSAGES_BATCH_QUERY, rows, page_size=len(rows), fetch=True)
+        conn.commit()
+        return len(inserted)
+
+    with conn.cursor() as cursor:
+        cursor.execute("TRUNCATE messages")
+    conn.commit()
+
+    buffer = MessageWriteBuffer(batch_size=batch_size, max_age=3600, insert=insert)
+    started = time.perf_counter()
+    for message in messages:
+        buffer.add(message)
+    buffer.flush()
+    elapsed = time.perf_counter() - started
+    for message in messages:
+        buffer.add(message)
+    buffer.close()
+    return elapsed, buffer.stats.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 50, 500])
+    args = parser.parse_args()
+
+    messages = make_batch(load_contents(), args.rows)
+    conn = psycopg2.connect(**connection_params())
+    try:
+        create_table(conn)
+        print(f"{'пачка':>6} {'строк/с':>10} {'пачек':>7} {'вставлено':>10} {'дубликатов':>11}")
+        for batch_size in args.batch:
+            elapsed, stats = run(conn, batch_size, messages)
+            if stats["inserted"] != len(messages) or stats["duplicates"] != len(messages):
+                print(f"{batch_size}: вставлено {stats['inserted']}, дубликатов {stats['duplicates']} "
+                      f"из {len(messages)}")
+                return 1
+            print(f"{batch_size:>6} {len(messages) / elapsed:>10.0f} {stats['flushes'] // 2:>7} "
+                  f"{stats['inserted']:>10} {stats['duplicates']:>11}")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
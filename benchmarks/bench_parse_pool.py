@@ -0,0 +1,75 @@
+"""
+Пропускная способность разбора страниц сообщений в пуле процессов в зависимости от числа процессов.
+
+Один поток, как поток браузера, отдаёт страницы из fixtures/messages/ (и объявление с большой таблицей
+лотов) в ParsePool и сразу переходит к следующей; --fetch-ms имитирует загрузку страницы между ними.
+workers=0 - разбор в том же потоке, как было раньше. Результаты пула сравниваются с разбором в потоке.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_parse_pool.py --pages 400 --workers 0 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_parser import load_fixtures  # noqa: E402
+from parse_pool import ParsePool  # noqa: E402
+from parsing import parse_message_html  # noqa: E402
+
+
+def run(workers, pages, fetch_delay):
+    started = time.perf_counter()
+    pool = ParsePool(workers=workers, max_in_flight=2 * max(1, workers))
+    warm_up = time.perf_counter() - started
+
+    results = []
+    pending = deque()
+    blocked = 0.0
+    started = time.perf_counter()
+    for name, html in pages:
+        if fetch_delay:
+            time.sleep(fetch_delay)
+        submit_started = time.perf_counter()
+        pending.append((name, pool.parse_message(html, name)))
+        blocked += time.perf_counter() - submit_started
+        while pending and pending[0][1].done():
+            results.append(pending.popleft())
+    results.extend(pending)
+    results = [(name, future.result()) for name, future in results]
+    elapsed = time.perf_counter() - started
+    pool.close()
+    return elapsed, blocked, warm_up, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--fetch-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    fixtures = list(load_fixtures(args.lots).items())
+    pages = [fixtures[i % len(fixtures)] for i in range(args.pages)]
+    expected = {name: parse_message_html(html, name) for name, html in fixtures}
+
+    print(f"{'процессов':>9} {'страниц/с':>10} {'поток занят, с':>15} {'прогрев, с':>11}")
+    for workers in args.workers:
+        elapsed, blocked, warm_up, results = run(workers, pages, args.fetch_ms / 1000)
+        if any(result != expected[name] for name, result in results):
+            print(f"{workers}: результат разбора в пуле отличается от разбора в потоке")
+            return 1
+        # При workers=0 поток браузера занят разбором всё время
+        busy = elapsed if workers == 0 else blocked
+        print(f"{workers:>9} {len(pages) / elapsed:>10.1f} {busy:>15.2f} {warm_up:>11.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Сравнение разборщиков HTML (html_backend): BeautifulSoup (html.parser) против lxml.
+
+Сначала проверяет совпадение результатов: parse_message_html на каждой странице из
+fixtures/messages/ и parse_listing_rows на fixtures/listing.html должны давать одинаковый
+результат для всех разборщиков. При расхождении скрипт завершается с кодом 1.
+Затем измеряет время разбора, в том числе на объявлении с большой таблицей лотов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_parser.py --repeat 50 --lots 500
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Журнал проверенных сообщений бенчмарка не должен попасть в рабочий каталог
+os.environ.setdefault("DEDUP_STORE_FILE", os.path.join(tempfile.mkdtemp(prefix="bench_parser_"), "checked.log"))
+
+from listing import parse_listing_rows  # noqa: E402
+from html_backend import BACKENDS  # noqa: E402
+from parsing import parse_message_html  # noqa: E402
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
+
+
+def load_fixtures(lots):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "messages", "*.html"))):
+        with open(path, encoding="utf-8") as file:
+            pages[os.path.splitext(os.path.basename(path))[0]] = file.read()
+
+    # Объявление с большой таблицей лотов: строки таблицы повторяются до нужного количества
+    auction = pages["auction"]
+    rows = re.findall(r"<tr>\s*<td>.*?</tr>", auction.split('class="lotInfo"')[1], re.S)
+    extra = "\n".join(rows[i % len(rows)] for i in range(lots))
+    pages[f"auction_{lots}_lots"] = auction.replace("</table>\n<div class=\"containerInfo\">",
+                                                    f"{extra}\n</table>\n<div class=\"containerInfo\">", 1)
+    return pages
+
+
+def check_parity(pages, listing):
+    reference, *others = BACKENDS
+    failed = False
+    for name, html in pages.items():
+        expected = parse_message_html(html, name, backend=reference)
+        if not expected:
+            print(f"{name}: эталонный разбор ({reference}) не вернул данные")
+            failed = True
+            continue
+        for backend in others:
+            result = parse_message_html(html, name, backend=backend)
+            if result != expected:
+                failed = True
+                diff = sorted(key for key in set(expected) | set(result or {})
+                              if (result or {}).get(key) != expected.get(key))
+                print(f"{name}: {backend} расходится с {reference} в полях {diff}")
+
+    expected = parse_listing_rows(listing, backend=reference)
+    for backend in others:
+        if parse_listing_rows(listing, backend=backend) != expected:
+            failed = True
+            print(f"listing: {backend} расходится с {reference}")
+
+    print("Результаты всех разборщиков совпадают." if not failed else "Найдены расхождения.")
+    return not failed
+
+
+def bench(name, func, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--lots", type=int, default=500)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.lots)
+    with open(os.path.join(FIXTURES, "listing.html"), encoding="utf-8") as file:
+        listing = file.read()
+
+    if not check_parity(pages, listing):
+        sys.exit(1)
+
+    backends = list(BACKENDS)
+    print(f"\n{'страница':<22}" + "".join(f"{b + ', мс CPU':>16}" for b in backends))
+    cases = [(name, lambda html=html, b=None: parse_message_html(html, name, backend=b)) for name, html in pages.items()]
+    cases.append(("listing", lambda b=None: parse_listing_rows(listing, backend=b)))
+    for name, func in cases:
+        times = [bench(name, lambda: func(b=backend), args.repeat) for backend in backends]
+        print(f"{name:<22}" + "".join(f"{t:16.2f}" for t in times))
+
+
+if __name__ == "__main__":
+    main()
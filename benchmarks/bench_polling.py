@@ -0,0 +1,96 @@
+"""
+Сравнение режимов опроса первой страницы: HTTP-сессия против Selenium.
+
+Поднимает локальный сервер, отдающий fixtures/listing.html как Messages.aspx,
+и измеряет опросы в секунду и потребление CPU для обоих режимов.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_polling.py --polls 200
+"""
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Загруженные в замерах страницы не должны попасть в архив страниц
+os.environ.setdefault("ARCHIVE_ENABLED", "0")
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+FIXTURE = os.path.join(ROOT, "benchmarks", "fixtures", "listing.html")
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    body = open(FIXTURE, "rb").read()
+
+    def _reply(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.send_header("Set-Cookie", "ASP.NET_SessionId=bench; path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_GET(self):
+        self._reply()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ListingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/Messages.aspx"
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def run(name, poll, polls):
+    wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+    for _ in range(polls):
+        html = poll()
+        BeautifulSoup(html, "html.parser").find("table", class_="bank").select("tr")
+    wall, cpu = time.perf_counter() - wall_start, cpu_seconds() - cpu_start
+    print(f"{name:<10} {polls / wall:10.1f} опросов/с   CPU {cpu:7.2f} c   ({cpu / polls * 1000:.1f} мс CPU на опрос)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--polls", type=int, default=200)
+    parser.add_argument("--selenium-polls", type=int, default=20)
+    args = parser.parse_args()
+
+    server, url = start_server()
+    from http_fetcher import fetch_listing_html
+    run("http", lambda: fetch_listing_html(url), args.polls)
+
+    try:
+        from detecting import fetch_listing_with_driver
+        from webdriver import create_webdriver_with_display
+        driver = create_webdriver_with_display()
+    except Exception as e:
+        print(f"selenium   пропущено: {e}")
+    else:
+        try:
+            run("selenium", lambda: fetch_listing_with_driver(driver, url), args.selenium_polls)
+        finally:
+            driver.quit()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
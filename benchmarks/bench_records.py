@@ -0,0 +1,149 @@
+"""
+Память и скорость записей сообщения (records.Message) против прежних словарей на синтетической пачке сообщений.
+
+Страницы из fixtures/messages/ разбираются один раз, затем пачка из --messages сообщений готовится
+prepare_data_for_db (номера сообщений различаются). Сравниваются:
+  - память пачки: records.Message против словаря с теми же ключами (прежний вид prepare_data_for_db);
+  - параметры INSERT в messages: Message.params() против кортежа из 45 обращений к словарю;
+  - строки лотов: split.lot_rows против копии всех колонок сообщения на каждый лот;
+  - перенос в колонки таблицы лотов: format.transfer_and_order_data против прежнего поиска источника
+    для каждой ячейки.
+Результаты переноса сравниваются.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_records.py --messages 10000
+"""
+import argparse
+import gc
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DB_PASSWORD", "")
+
+from DBManager import prepare_data_for_db  # noqa: E402
+from format import lots_columns, mappings, transfer_and_order_data  # noqa: E402
+from parsing import parse_message_html  # noqa: E402
+from records import LOT_COLUMNS, MESSAGE_COLUMNS, ListingRow, Message  # noqa: E402
+from split import lot_rows  # noqa: E402
+
+
+def load_contents():
+    contents = []
+    for path in sorted(glob.glob(os.path.join(ROOT, "benchmarks", "fixtures", "messages", "*.html"))):
+        with open(path, encoding="utf-8") as file:
+            contents.append(parse_message_html(file.read(), path))
+    return contents
+
+
+def make_batch(contents, count):
+    batch = []
+    for i in range(count):
+        content = dict(contents[i % len(contents)])
+        content["№ сообщения"] = str(18000000 + i)
+        row = ListingRow("01.01.2024 10:00:00", "Объявление о проведении торгов", "ООО Должник", "", "АУ", "", f"u{i}")
+        batch.append(prepare_data_for_db(row, content))
+    return batch
+
+
+def as_legacy_dict(message):
+    result = message.as_dict()
+    result["лоты"] = message.лоты
+    return result
+
+
+def measure_memory(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(func, items):
+    started = time.perf_counter()
+    result = [func(item) for item in items]
+    return time.perf_counter() - started, result
+
+
+def legacy_params(data):
+    return tuple(data.get(col) for col in MESSAGE_COLUMNS)
+
+
+def legacy_lot_rows(data):
+    base = {col: value for col, value in data.items() if col != 'лоты'}
+    rows = []
+    for lot in data['лоты']:
+        new_row = dict(base)
+        for col, field in LOT_COLUMNS.items():
+            value = getattr(lot, field)
+            if value is not None:
+                new_row[col] = value
+        rows.append(new_row)
+    return rows
+
+
+def legacy_transfer(raw_data):
+    formatted_data = []
+    for row in raw_data:
+        formatted_row = {}
+        for col in lots_columns:
+            source_col = [key for key, value in mappings.items() if value == col]
+            if source_col:
+                if col == 'вид_торгов':
+                    if "объяв" in row.get("тип_сообщения", "").lower().strip():
+                        formatted_row[col] = row.get("вид_торгов", None)
+                    else:
+                        formatted_row[col] = row.get("тип_сообщения", None)
+                else:
+                    formatted_row[col] = row.get(source_col[0], None)
+            else:
+                formatted_row[col] = None
+        formatted_data.append(formatted_row)
+    return formatted_data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+
+    contents = load_contents()
+    started = time.perf_counter()
+    batch = make_batch(contents, args.messages)
+    prepare_time = time.perf_counter() - started
+    # Значения общие, сравнивается только сама запись: словарь или кортеж
+    dicts, dicts_size = measure_memory(lambda: [as_legacy_dict(message) for message in batch])
+    _, records_size = measure_memory(lambda: [Message._make(map(data.get, Message._fields)) for data in dicts])
+    lots = sum(len(message.лоты) for message in batch)
+    print(f"сообщений: {len(batch)}, лотов: {lots}, prepare_data_for_db: {len(batch) / prepare_time:.0f} в секунду")
+    print(f"память записей без значений: словари {dicts_size / 2 ** 20:.1f} МБ, Message {records_size / 2 ** 20:.1f} МБ")
+
+    print(f"\n{'':<28}{'словари, мс':>12}{'Message, мс':>12}")
+    old, old_params = timed(legacy_params, dicts)
+    new, new_params = timed(lambda message: message.params(), batch)
+    if old_params != new_params:
+        print("Параметры INSERT различаются")
+        return 1
+    print(f"{'параметры INSERT':<28}{old * 1000:>12.1f}{new * 1000:>12.1f}")
+
+    old, old_rows = timed(legacy_lot_rows, dicts)
+    new, new_rows = timed(lot_rows, batch)
+    print(f"{'строки лотов':<28}{old * 1000:>12.1f}{new * 1000:>12.1f}")
+
+    old, old_lots = timed(legacy_transfer, old_rows)
+    new, new_lots = timed(lambda rows: transfer_and_order_data(rows, lots_columns, mappings), new_rows)
+    if old_lots != new_lots:
+        print("Перенос в колонки таблицы лотов различается")
+        return 1
+    print(f"{'перенос в таблицу лотов':<28}{old * 1000:>12.1f}{new * 1000:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+from message_schema import SCHEMA, extract_message
+
+# Поток событий страницы сообщения, собранный в браузере за один вызов execute_script.
+# Формат тот же, что у html_backend.iter_events, но в ответ попадают только подписи секций
+# и таблицы, которые нужны схеме: остальное не передаётся по протоколу WebDriver.
+# Если нужен ещё и HTML страницы (архив), он возвращается тем же вызовом: [события, outerHTML].
+MESSAGE_EVENTS_SCRIPT = """
+var classAnchors = arguments[0], headingAnchors = arguments[1], headingParts = arguments[2], withHtml = arguments[3];
+var events = [], assigned = {}, seen = {}, waiting = false, titleSeen = false, spansSeen = false;
+
+function singleString(el) {
+    while (true) {
+        if (el.childNodes.length !== 1) return null;
+        var node = el.childNodes[0];
+        if (node.nodeType === 3 || node.nodeType === 8) return node.nodeValue;
+        if (node.nodeType !== 1) return null;
+        el = node;
+    }
+}
+
+function tableData(table) {
+    var rows = table.getElementsByTagName('tr'), header = [], data = [];
+    if (rows.length) {
+        var th = rows[0].getElementsByTagName('th');
+        for (var i = 0; i < th.length; i++) header.push(th[i].textContent);
+    }
+    for (var r = 0; r < rows.length; r++) {
+        var td = rows[r].getElementsByTagName('td'), cells = [];
+        for (var c = 0; c < td.length; c++) cells.push(td[c].textContent);
+        data.push(cells);
+    }
+    return [header, data];
+}
+
+var elements = document.querySelectorAll('h1, div, table');
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i], tag = el.tagName.toLowerCase();
+    var classes = (el.getAttribute('class') || '').split(/\\s+/).filter(Boolean);
+    if (tag === 'table') {
+        var needed = waiting;
+        for (var k = 0; k < classes.length; k++) {
+            if (classAnchors.indexOf(classes[k]) !== -1 && !assigned[classes[k]]) {
+                assigned[classes[k]] = true;
+                needed = true;
+            }
+        }
+        waiting = false;
+        if (needed) events.push(['table', classes, tableData(el)]);
+    } else if (tag === 'h1') {
+        if (!titleSeen && classes.indexOf('red_small') !== -1) {
+            titleSeen = true;
+            events.push(['title', el.textContent]);
+        }
+    } else {
+        if (classes.indexOf('msg') !== -1) events.push(['msg', el.textContent]);
+        if (!spansSeen && classes.indexOf('containerInfo') !== -1) {
+            spansSeen = true;
+            var spans = el.getElementsByTagName('span'), texts = [];
+            for (var s = 0; s < spans.length; s++) texts.push(spans[s].textContent);
+            events.push(['spans', texts]);
+        }
+        var heading = singleString(el), matched = false;
+        if (heading !== null) {
+            if (headingAnchors.indexOf(heading) !== -1 && !seen['=' + heading]) {
+                seen['=' + heading] = true;
+                matched = true;
+            }
+            for (var p = 0; p < headingParts.length; p++) {
+                if (heading.indexOf(headingParts[p]) !== -1 && !seen['~' + headingParts[p]]) {
+                    seen['~' + headingParts[p]] = true;
+                    matched = true;
+                }
+            }
+            if (matched) {
+                waiting = true;
+                events.push(['heading', heading]);
+            }
+        }
+    }
+}
+return withHtml ? [events, document.documentElement.outerHTML] : events;
+"""
+
+
+def _strip_all(values):
+    return [value.strip() for value in values]
+
+
+def to_events(raw_events):
+    """
+    Переводит JSON-ответ MESSAGE_EVENTS_SCRIPT в поток событий для message_schema.
+    Тексты обрезаются здесь, как при разборе HTML (.text.strip()).
+    """
+    for event in raw_events:
+        kind = event[0]
+        if kind == "table":
+            header, rows = event[2]
+            yield "table", event[1], (_strip_all(header), [_strip_all(cells) for cells in rows])
+        elif kind == "spans":
+            yield "spans", _strip_all(event[1]), None
+        elif kind == "heading":
+            yield "heading", event[1], None
+        else:
+            yield kind, event[1].strip(), None
+
+
+def _run_events_script(driver, schema, with_html):
+    return driver.execute_script(
+        MESSAGE_EVENTS_SCRIPT,
+        sorted(schema.classes),
+        sorted(schema.headings),
+        [anchor.value for anchor in schema.heading_parts],
+        with_html,
+    )
+
+
+def extract_message_in_browser(driver, schema=SCHEMA):
+    """
+    Разбирает открытую в браузере страницу сообщения одним вызовом execute_script,
+    без передачи page_source и повторного разбора HTML.
+    :return: словарь полей сообщения (как parse_message_html) или None.
+    """
+    raw_events = _run_events_script(driver, schema, False)
+    return extract_message(to_events(raw_events), schema)
+
+
+def extract_message_and_html(driver, schema=SCHEMA):
+    """
+    То же, что extract_message_in_browser, но тем же вызовом execute_script возвращает и HTML страницы
+    (document.documentElement.outerHTML) для архива: страница не запрашивается второй раз через page_source
+    и не разбирается в Python.
+    :return: (словарь полей сообщения или None, HTML страницы).
+    """
+    raw_events, html = _run_events_script(driver, schema, True)
+    return extract_message(to_events(raw_events), schema), html
@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from listing import listing_fragment
+
+# Сколько таблиц лотов (по торгам должника) помнить для сравнения с сообщениями об изменении
+LOT_FINGERPRINT_CACHE = int(os.getenv("LOT_FINGERPRINT_CACHE", "20000"))
+
+# Сообщение об изменении часто публикует заново уже полученную таблицу лотов
+CHANGE_NOTICE_TYPE = "Сообщение об изменении объявления о проведении торгов"
+# Сообщения, таблица лотов которых запоминается для сравнения с последующими изменениями
+FINGERPRINTED_TYPES = {"Объявление о проведении торгов", CHANGE_NOTICE_TYPE}
+
+# Поля подготовленного сообщения (records.Message), изменение которых существенно для торгов.
+# текст - описание лотов и условий в свободной форме: правка только в нём тоже считается изменением
+MATERIAL_FIELDS = (
+    "вид_торгов", "торговая_площадка", "номер_торгов", "дата_начала_подачи_заявок", "дата_окончания_подачи_заявок",
+    "правила_подачи_заявок", "дата_время_торгов", "форма_подачи_предложения_о_цене", "место_проведения", "текст",
+)
+
+
+class ChangeStats:
+    """
+    Сколько проверок на изменения дали совпадение (работа пропущена) по видам: список, сообщение.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._checks = {}
+
+    def record(self, kind, hit):
+        with self._lock:
+            self._checks[kind] = self._checks.get(kind, 0) + 1
+            if hit:
+                self._hits[kind] = self._hits.get(kind, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                kind: {"checks": checks, "hits": self._hits.get(kind, 0),
+                       "hit_rate": self._hits.get(kind, 0) / checks}
+                for kind, checks in self._checks.items()
+            }
+
+
+change_stats = ChangeStats()
+
+
+def listing_digest(html):
+    """
+    sha256 таблицы сообщений table.bank страницы списка или None, если таблицы нет.
+    """
+    fragment = listing_fragment(html)
+    if fragment is None:
+        return None
+    return hashlib.sha256(fragment.encode("utf-8")).hexdigest()
+
+
+class ListingSnapshot:
+    """
+    Хэш таблицы последней обработанной страницы списка. Если таблица не изменилась,
+    разбирать страницу не нужно: все её строки уже проверены.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.digest = None
+
+    def unchanged(self, digest):
+        with self._lock:
+            hit = digest is not None and digest == self.digest
+        change_stats.record("listing", hit)
+        return hit
+
+    def remember(self, digest):
+        """
+        Запоминает хэш после того, как строки страницы обработаны (помечены проверенными).
+        """
+        with self._lock:
+            self.digest = digest
+
+
+listing_snapshot = ListingSnapshot()
+
+
+def _digest(value):
+    return hashlib.blake2b(repr(value).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def lots_key(prepared_data):
+    """
+    Торги, к которым относится таблица лотов: должник (ИНН или ссылка) и состав лотов (номера и описания).
+    None - должник не определён, сообщение не сравнивается.
+    """
+    debtor = prepared_data.ИНН or prepared_data.должник_ссылка
+    if not debtor:
+        return None
+    return debtor, _digest([(lot.number, lot.description) for lot in prepared_data.лоты])
+
+
+def trading_terms(prepared_data):
+    """
+    Заполненные в сообщении поля торгов MATERIAL_FIELDS.
+    """
+    return {field: getattr(prepared_data, field) for field in MATERIAL_FIELDS if getattr(prepared_data, field)}
+
+
+class LotFingerprints:
+    """
+    Последние записанные лоты и условия торгов по торгам должника (LRU).
+    Сообщение об изменении, в котором лоты те же (все поля лотов) и заполненные поля торгов совпадают
+    с уже записанными, ничего существенного не меняет: само сообщение записывается в messages,
+    но его лоты не раскладываются и не сверяются с записанными.
+    """
+
+    def __init__(self, maxsize=LOT_FINGERPRINT_CACHE):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+
+    def unchanged(self, prepared_data):
+        """
+        True - сообщение об изменении ничего существенного не меняет.
+        """
+        if prepared_data.тип_сообщения != CHANGE_NOTICE_TYPE or not prepared_data.лоты:
+            return False
+        key = lots_key(prepared_data)
+        if key is None:
+            return False
+        lots = _digest(prepared_data.лоты)
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = (entry is not None and entry[0] == lots
+                   and all(entry[1].get(field) == value for field, value in trading_terms(prepared_data).items()))
+            if hit:
+                self._entries.move_to_end(key)
+        change_stats.record("message", hit)
+        return hit
+
+    def remember(self, prepared_data):
+        """
+        Запоминает лоты и условия торгов записанного сообщения. Сообщение об изменении дополняет
+        условия торгов тех же лотов, объявление заменяет их целиком.
+        """
+        message_type = prepared_data.тип_сообщения
+        if message_type not in FINGERPRINTED_TYPES or not prepared_data.лоты:
+            return
+        key = lots_key(prepared_data)
+        if key is None:
+            return
+        terms = trading_terms(prepared_data)
+        with self._lock:
+            entry = self._entries.get(key)
+            if message_type == CHANGE_NOTICE_TYPE and entry is not None:
+                terms = {**entry[1], **terms}
+            self._entries[key] = (_digest(prepared_data.лоты), terms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+lot_fingerprints = LotFingerprints()
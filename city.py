@@ -1,10 +1,9 @@
 import re
 import logging
-import psycopg2
 from transliterate import translit
 import pytz
 from datetime import datetime
-import os
+from db_pool import db_connection
 from logScript import logger
 
 
@@ -12,23 +11,13 @@ from logScript import logger
 def load_timezones_from_db():
     timezones_dict = []
     try:
-        connection = psycopg2.connect(
-            host=os.getenv('DB_HOST'),
-            port=os.getenv('DB_PORT'),
-            database=os.getenv('DB_NAME'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD')
-        )
-        cursor = connection.cursor()
-        cursor.execute("SELECT * FROM \"TimeZone\";")
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
+        with db_connection() as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT * FROM \"TimeZone\";")
+            rows = cursor.fetchall()
+            columns = [desc[0] for desc in cursor.description]
         timezones_dict = [dict(zip(columns, row)) for row in rows]
     except Exception as e:
         logger.error(f"Ошибка при подключении к базе данных: {e}")
-    finally:
-        if connection:
-            connection.close()
     return timezones_dict
 
 
@@ -3,13 +3,10 @@ import re
 import asyncio
 import asyncpg
 import requests
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+from webdriver import acquire_driver, get_driver_pool
 import pytz
 from datetime import datetime
 from dotenv import load_dotenv
@@ -46,12 +43,26 @@ async def fetch_arbitr_managers(pool):
 
 
 def create_webdriver():
-    options = Options()
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=options)
+    # Браузер из общего пула webdriver.py: запасной уже запущен, chromedriver не скачивается заново
+    return acquire_driver()
+
+
+# Поиск строки "Адрес для корреспонденции" во всех секциях headInfo за один вызов execute_script.
+# Возвращает null, если секций нет, [] - если строки нет, [адрес] - если строка найдена.
+ADDRESS_SCRIPT = """
+var sections = document.getElementsByClassName('headInfo');
+if (!sections.length) return null;
+for (var i = 0; i < sections.length; i++) {
+    var rows = sections[i].getElementsByTagName('tr');
+    for (var r = 0; r < rows.length; r++) {
+        var cells = rows[r].getElementsByTagName('td');
+        if (cells.length > 1 && cells[0].innerText.trim().indexOf(arguments[0]) !== -1) {
+            return [cells[1].innerText.trim()];
+        }
+    }
+}
+return [];
+"""
 
 
 def extract_address_from_message(driver):
@@ -59,27 +70,17 @@ def extract_address_from_message(driver):
     Извлекает адрес для корреспонденции из секций div.headInfo.
     """
     try:
-        # Получаем все div с классом headInfo
-        head_info_divs = driver.find_elements(By.CLASS_NAME, "headInfo")
-        if not head_info_divs:
+        result = driver.execute_script(ADDRESS_SCRIPT, ADDRESS_ROW_PATTERN)
+        if result is None:
             logging.warning("Секции headInfo не найдены")
             return None
-
-        for div in head_info_divs:
-            # Ищем строки tr внутри текущего div
-            rows = div.find_elements(By.TAG_NAME, "tr")
-            for row in rows:
-                cells = row.find_elements(By.TAG_NAME, "td")  # Получаем ячейки строки
-                if len(cells) > 1:  # Проверяем, что есть хотя бы две ячейки
-                    header = cells[0].text.strip()
-                    if "Адрес для корреспонденции" in header:  # Проверяем текст в первой ячейке
-                        address = cells[1].text.strip()
-                        if address:  # Если адрес найден, возвращаем его
-                            logging.info(f"Извлечен адрес для корреспонденции: {address}")
-                            return address
-                        else:
-                            logging.warning("Ячейка с адресом для корреспонденции пустая")
-                            return None
+        if result:
+            address = result[0]
+            if address:  # Если адрес найден, возвращаем его
+                logging.info(f"Извлечен адрес для корреспонденции: {address}")
+                return address
+            logging.warning("Ячейка с адресом для корреспонденции пустая")
+            return None
 
         logging.warning("Строка с адресом для корреспонденции не найдена")
     except Exception as e:
@@ -273,7 +274,7 @@ async def main():
 
     finally:
         await pool.close()
-        driver.quit()
+        get_driver_pool().release(driver)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,253 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import ThreadedConnectionPool
+
+from logScript import logger
+
+load_dotenv(dotenv_path='.env')
+
+# Размер пула соединений с PostgreSQL: сколько держать открытыми и сколько открывать максимум
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "8"))
+# Сколько ждать свободное соединение, прежде чем считать пул исчерпанным (в секундах)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "60"))
+# Соединение, простоявшее в пуле дольше этого, перед выдачей проверяется запросом SELECT 1
+DB_HEALTH_CHECK_IDLE = float(os.getenv("DB_HEALTH_CHECK_IDLE", "30"))
+# Предельное время выполнения запроса на сервере (в миллисекундах, 0 - без ограничения)
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# Попытки подключения к БД и пауза между ними (в секундах); пауза удваивается с каждой попыткой
+DB_CONNECT_ATTEMPTS = int(os.getenv("DB_CONNECT_ATTEMPTS", "5"))
+DB_CONNECT_RETRY_DELAY = float(os.getenv("DB_CONNECT_RETRY_DELAY", "2"))
+
+
+def connection_params():
+    """
+    Параметры подключения из переменных окружения (.env), общие для всех синхронных соединений.
+    """
+    params = {
+        "host": os.getenv("DB_HOST"),
+        "port": os.getenv("DB_PORT"),
+        "dbname": os.getenv("DB_NAME"),
+        "user": os.getenv("DB_USER"),
+        "password": os.getenv("DB_PASSWORD"),
+    }
+    if DB_STATEMENT_TIMEOUT_MS > 0:
+        params["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+    return params
+
+
+class PoolStats:
+    """
+    Ожидание свободного соединения, повторные попытки подключения и соединения, отбракованные проверкой.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.discarded = 0
+        self.in_use = 0
+
+    def record_checkout(self, wait):
+        with self._lock:
+            self._waits.append(wait)
+            self.checkouts += 1
+            self.in_use += 1
+
+    def record_checkin(self):
+        with self._lock:
+            self.in_use -= 1
+
+    def record(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def summary(self):
+        with self._lock:
+            ordered = sorted(self._waits) or [0.0]
+            return {
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "wait_mean": sum(ordered) / len(ordered),
+                "wait_p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "wait_max": ordered[-1],
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "discarded": self.discarded,
+            }
+
+
+class DBPool:
+    """
+    Пул соединений psycopg2 на процесс.
+
+    Число выданных соединений ограничено maxconn: checkout ждёт свободное до timeout секунд.
+    Соединение, которое простояло в пуле дольше health_check_idle или закрыто, перед выдачей проверяется
+    и при ошибке заменяется новым. Подключение повторяется не больше DB_CONNECT_ATTEMPTS раз.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 health_check_idle=DB_HEALTH_CHECK_IDLE, params=None):
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.health_check_idle = health_check_idle
+        self.stats = PoolStats()
+        self._params = params or connection_params()
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._returned = {}
+        self._lock = threading.Lock()
+        self._pool = self._retry(lambda: ThreadedConnectionPool(min(minconn, self.maxconn), self.maxconn,
+                                                                **self._params))
+
+    def _retry(self, connect):
+        delay = DB_CONNECT_RETRY_DELAY
+        for attempt in range(1, DB_CONNECT_ATTEMPTS + 1):
+            try:
+                return connect()
+            except OperationalError as e:
+                if attempt == DB_CONNECT_ATTEMPTS:
+                    raise
+                logger.error(f"Ошибка при подключении (попытка {attempt} из {DB_CONNECT_ATTEMPTS}): {e}")
+                self.stats.record("reconnects")
+                time.sleep(delay)
+                delay *= 2
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            returned = self._returned.pop(id(conn), None)
+        if returned is not None and time.monotonic() - returned < self.health_check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Соединение с БД не прошло проверку и будет заменено: {e}")
+            return False
+
+    def getconn(self):
+        """
+        Выдаёт проверенное соединение. Вернуть его нужно через putconn (или использовать connection()).
+        """
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            self.stats.record("timeouts")
+            raise TimeoutError(f"Нет свободного соединения с БД за {self.timeout:.0f} с (пул: {self.maxconn})")
+        try:
+            while True:
+                conn = self._retry(self._pool.getconn)
+                if self._healthy(conn):
+                    break
+                self.stats.record("discarded")
+                self._pool.putconn(conn, close=True)
+        except Exception:
+            self._slots.release()
+            raise
+        self.stats.record_checkout(time.monotonic() - started)
+        return conn
+
+    def putconn(self, conn):
+        """
+        Возвращает соединение в пул. Незавершённая транзакция откатывается, autocommit сбрасывается.
+        """
+        close = bool(conn.closed)
+        if not close:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+            except psycopg2.Error:
+                close = True
+        if not close:
+            with self._lock:
+                self._returned[id(conn)] = time.monotonic()
+        self._pool.putconn(conn, close=close)
+        self.stats.record_checkin()
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, autocommit=False):
+        """
+        Соединение из пула на время блока with. Коммит - на вызывающем коде; всё незакоммиченное
+        при выходе откатывается.
+        """
+        conn = self.getconn()
+        try:
+            conn.autocommit = autocommit
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def close(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """
+    Общий пул соединений процесса. Создаётся при первом обращении и закрывается при выходе.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DBPool()
+            atexit.register(_pool.close)
+        return _pool
+
+
+def db_connection(autocommit=False):
+    """
+    with db_connection() as conn: - соединение из общего пула (DBPool.connection).
+    """
+    return get_db_pool().connection(autocommit)
+
+
+# Есть ли уникальный индекс (или ограничение UNIQUE/PRIMARY KEY) ровно по одной колонке таблицы
+_UNIQUE_INDEX_QUERY = """
+    SELECT EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = to_regclass(%s) AND i.indisunique AND i.indnkeyatts = 1
+          AND i.indpred IS NULL AND a.attname = %s
+    )
+"""
+
+
+def require_unique_indexes(targets):
+    """
+    Проверяет, что для каждой пары (таблица, колонка) есть уникальный индекс - цель ON CONFLICT.
+    Без него запросы INSERT ... ON CONFLICT падают, поэтому при отсутствии - RuntimeError.
+    """
+    missing = []
+    with db_connection() as conn, conn.cursor() as cursor:
+        for table, column in targets:
+            cursor.execute(_UNIQUE_INDEX_QUERY, (table, column))
+            if not cursor.fetchone()[0]:
+                missing.append(f"{table}({column})")
+    if missing:
+        raise RuntimeError(f"Нет уникальных индексов для ON CONFLICT: {', '.join(missing)}. "
+                           f"Создайте их: migrations/001_unique_entity_inn.sql")
+
+
+def db_pool_summary():
+    """
+    Метрики общего пула (PoolStats.summary) или None, если пул ещё не создавался.
+    """
+    return _pool.stats.summary() if _pool is not None else None
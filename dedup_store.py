@@ -0,0 +1,270 @@
+import atexit
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from logScript import logger
+
+# Файл журнала проверенных сообщений (только дозапись)
+DEDUP_STORE_FILE = os.getenv("DEDUP_STORE_FILE", "checked_messages.log")
+# Сколько дней хранить идентификаторы проверенных сообщений
+DEDUP_RETENTION_DAYS = float(os.getenv("DEDUP_RETENTION_DAYS", "30"))
+# fsync выполняется не на каждую запись, а пачкой: по количеству записей или по времени
+DEDUP_FSYNC_BATCH = int(os.getenv("DEDUP_FSYNC_BATCH", "50"))
+DEDUP_FSYNC_INTERVAL = float(os.getenv("DEDUP_FSYNC_INTERVAL", "1"))
+# Как часто сжимать журнал (в секундах)
+DEDUP_COMPACT_INTERVAL = 24 * 60 * 60
+
+ADD = "A"
+DELETE = "D"
+
+# GUID сообщения в ссылке вида /MessageWindow.aspx?ID=0A1B...
+_guid_re = re.compile(r'[?&]ID=([0-9A-Fa-f]{8}-?[0-9A-Fa-f]{4}-?[0-9A-Fa-f]{4}-?[0-9A-Fa-f]{4}-?[0-9A-Fa-f]{12})')
+
+
+def legacy_message_id(date, message_type, debtor):
+    """
+    Прежний идентификатор сообщения: md5 от даты, типа сообщения и должника.
+    """
+    return hashlib.md5((date + message_type + debtor).encode()).hexdigest()
+
+
+def message_id_from_link(link):
+    """
+    Возвращает стабильный идентификатор сообщения - GUID из ссылки на сообщение, или None.
+    """
+    match = _guid_re.search(link or "")
+    return match.group(1).replace("-", "").upper() if match else None
+
+
+def publication_timestamp(date_text):
+    """
+    Переводит дату из колонки "дата" списка сообщений в unix-время. Неразобранная дата даёт 0.
+    """
+    try:
+        return datetime.strptime(date_text, "%d.%m.%Y %H:%M:%S").timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class BloomFilter:
+    """
+    Компактный вероятностный фильтр: "точно нет" или "возможно есть".
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(1024, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class CheckedMessagesStore:
+    """
+    Хранилище идентификаторов проверенных сообщений.
+
+    На диске - журнал с дозаписью строк "A<TAB>время<TAB>id<TAB>время публикации" / "D<TAB>время<TAB>id",
+    в памяти - словарь id -> (время добавления, время публикации) для проверки за O(1).
+    Журнал периодически сжимается: удаляются записи старше DEDUP_RETENTION_DAYS и удалённые id.
+
+    watermark - время публикации самого нового проверенного сообщения, bloom - фильтр по всем id
+    для дешёвой проверки строк не новее watermark. legacy_ids - сколько id без времени публикации
+    (перенесённых из прежнего файла); когда они устаревают и удаляются при сжатии, счётчик обнуляется.
+    """
+
+    def __init__(self, path=DEDUP_STORE_FILE, retention_days=DEDUP_RETENTION_DAYS,
+                 fsync_batch=DEDUP_FSYNC_BATCH, fsync_interval=DEDUP_FSYNC_INTERVAL, legacy_file=None):
+        self.path = path
+        self.retention = retention_days * 24 * 60 * 60
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._index = {}
+        self._log_lines = 0
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+        self._last_compact = time.time()
+        self.watermark = 0.0
+        self.legacy_ids = 0
+        self.bloom = None
+
+        if os.path.exists(self.path):
+            self._load()
+        elif legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+
+        self._compact()
+        self._rebuild_filters()
+        self._file = open(self.path, "a", encoding="utf-8")
+        atexit.register(self.close)
+
+    def __contains__(self, msg_id):
+        return msg_id in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def __bool__(self):
+        return bool(self._index)
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                self._log_lines += 1
+                # Недописанная при сбое последняя строка просто пропускается
+                if not line.endswith("\n"):
+                    logger.warning(f"Пропущена неполная строка в {self.path}")
+                    continue
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) not in (3, 4):
+                    continue
+                op, ts, msg_id = parts[:3]
+                published = float(parts[3]) if len(parts) == 4 else 0.0
+                if op == ADD:
+                    self._index.pop(msg_id, None)
+                    self._index[msg_id] = (float(ts), published)
+                elif op == DELETE:
+                    self._index.pop(msg_id, None)
+        logger.info(f"Файл {self.path} загружен, проверенных сообщений: {len(self._index)}.")
+
+    def _import_legacy(self, legacy_file):
+        try:
+            with open(legacy_file, "r") as file:
+                now = time.time()
+                for msg_id in json.load(file):
+                    self._index[msg_id] = (now, 0.0)
+            logger.info(f"Перенесено {len(self._index)} идентификаторов из {legacy_file}.")
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Ошибка при чтении {legacy_file}: {e}. Начинаем с пустого хранилища.")
+
+    def _rebuild_filters(self):
+        self.watermark = max((published for _, published in self._index.values()), default=0.0)
+        self.legacy_ids = sum(1 for _, published in self._index.values() if not published)
+        self.bloom = BloomFilter(capacity=max(10000, 2 * len(self._index)))
+        for msg_id in self._index:
+            self.bloom.add(msg_id)
+
+    def maybe_seen(self, msg_id):
+        """
+        Быстрая вероятностная проверка: False - id точно не встречался, True - нужно проверить по индексу.
+        """
+        return msg_id in self.bloom
+
+    def seen(self, msg_id):
+        """
+        Точная проверка: фильтр Блума отсекает новые id, его срабатывание подтверждается индексом.
+        """
+        return self.maybe_seen(msg_id) and msg_id in self._index
+
+    def _write(self, op, msg_id, published=None):
+        suffix = f"\t{published:.0f}" if published is not None else ""
+        self._file.write(f"{op}\t{time.time():.0f}\t{msg_id}{suffix}\n")
+        self._log_lines += 1
+        self._pending += 1
+        if self._pending >= self.fsync_batch or time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    def _fsync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+
+    def add(self, msg_id, published=0.0):
+        with self._lock:
+            if msg_id in self._index:
+                return
+            self._index[msg_id] = (time.time(), published)
+            # Сверх расчётной ёмкости доля ложных срабатываний фильтра растёт: пересоздаём его вдвое больше
+            if len(self._index) > self.bloom.capacity:
+                self._rebuild_filters()
+            else:
+                self.bloom.add(msg_id)
+            self.watermark = max(self.watermark, published)
+            if not published:
+                self.legacy_ids += 1
+            self._write(ADD, msg_id, published)
+            if self._needs_compaction():
+                self.compact()
+
+    # Совместимость с прежним deque
+    append = add
+
+    def pop(self):
+        """
+        Удаляет последний добавленный идентификатор.
+        """
+        with self._lock:
+            if not self._index:
+                raise IndexError("Очередь пуста, нечего удалять")
+            msg_id = next(reversed(self._index))
+            del self._index[msg_id]
+            self._write(DELETE, msg_id)
+            # Из фильтра Блума удалить нельзя, поэтому фильтр и watermark пересчитываются
+            self._rebuild_filters()
+            return msg_id
+
+    def flush(self):
+        """
+        Принудительно сбрасывает накопленные записи на диск.
+        """
+        with self._lock:
+            if self._pending and not self._file.closed:
+                self._fsync()
+
+    def _needs_compaction(self):
+        return (self._log_lines > 2 * len(self._index) + 1000
+                or time.time() - self._last_compact > DEDUP_COMPACT_INTERVAL)
+
+    def _compact(self):
+        cutoff = time.time() - self.retention
+        expired = [msg_id for msg_id, (ts, _) in self._index.items() if ts < cutoff]
+        for msg_id in expired:
+            del self._index[msg_id]
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            for msg_id, (ts, published) in self._index.items():
+                file.write(f"{ADD}\t{ts:.0f}\t{msg_id}\t{published:.0f}\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._log_lines = len(self._index)
+        self._last_compact = time.time()
+        logger.info(f"Журнал {self.path} сжат: удалено устаревших {len(expired)}, осталось {len(self._index)}.")
+
+    def compact(self):
+        """
+        Переписывает журнал, оставляя только актуальные идентификаторы.
+        """
+        with self._lock:
+            self._file.close()
+            self._compact()
+            self._rebuild_filters()
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self.flush()
+                self._file.close()
@@ -1,84 +1,85 @@
-import json
 import os
 from bs4 import BeautifulSoup
-import hashlib
+import threading
 import time
-from collections import deque
 from datetime import datetime, timedelta
 
 from selenium.webdriver.common.by import By
 from selenium.webdriver.ie.webdriver import WebDriver
-from selenium.webdriver.support import expected_conditions as EC
 
-from selenium.webdriver.support.wait import WebDriverWait
-
-from DBManager import prepare_data_for_db, insert_message_to_db
+from DBManager import prepare_data_for_db
+from message_buffer import get_message_buffer
+from change_detection import listing_digest, listing_snapshot, lot_fingerprints
+from dedup_store import CheckedMessagesStore, legacy_message_id, publication_timestamp
+from filter_rules import skip_lots
 from fioDETECTING import au_debtorsDetecting
+from html_archive import archive_listing
+from http_fetcher import fetch_listing_html, reset_session
+from listing import parse_listing_rows
 from logScript import logger
+from parse_pool import get_parse_pool
 from lots_integrator import lots_analyze
 from parsing import parse_message_page
 from split import split_columns
+from waits import click_and_wait_listing, wait_for_listing
 from webdriver import restart_driver
 
-# Допустимые типы сообщений
-valid_message_types = {
-    'Сведения о заключении договора купли-продажи',
-    'Сообщение о результатах торгов',
-    'Объявление о проведении торгов',
-    'Отчет оценщика об оценке имущества должника',
-    'Сообщение об изменении объявления о проведении торгов',
-    'Сообщение об отмене сообщения об объявлении торгов или сообщения о результатах торгов'
-}
-
-# Файл для сохранения идентификаторов проверенных сообщений
+# Прежний файл с идентификаторами проверенных сообщений, переносится в журнал при первом запуске
 CHECKED_MESSAGES_FILE = "checked_messages.json"
 
-def load_checked_messages():
-    """
-    Загружает очередь из файла JSON. Если файл не существует или повреждён, создаёт новый файл с пустой очередью.
-    """
-    if os.path.exists(CHECKED_MESSAGES_FILE):
-        try:
-            with open(CHECKED_MESSAGES_FILE, "r") as file:
-                data = json.load(file)
-                logger.info(f"Файл {CHECKED_MESSAGES_FILE} успешно загружен.")
-                return deque(data, maxlen=1000)
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Ошибка при чтении {CHECKED_MESSAGES_FILE}: {e}. Инициализируем пустую очередь.")
-            return initialize_checked_messages_file()
-    else:
-        logger.info(f"Файл {CHECKED_MESSAGES_FILE} не найден. Создаём новый.")
-        return initialize_checked_messages_file()
-
-def save_checked_messages(queue):
+# Режим опроса первой страницы: "http" - через HTTP-сессию с откатом на Selenium, "selenium" - только браузер
+POLL_MODE = os.getenv("POLL_MODE", "http").lower()
+
+def save_checked_messages(store):
     """
-    Сохраняет очередь в файл JSON.
+    Сбрасывает накопленные записи хранилища проверенных сообщений на диск.
     """
     try:
-        with open(CHECKED_MESSAGES_FILE, "w") as file:
-            json.dump(list(queue), file)
-            logger.info(f"Очередь успешно сохранена в файл {CHECKED_MESSAGES_FILE}.")
+        store.flush()
     except IOError as e:
-        logger.error(f"Ошибка при сохранении файла {CHECKED_MESSAGES_FILE}: {e}")
+        logger.error(f"Ошибка при сохранении хранилища проверенных сообщений: {e}")
+
+_checked_messages = None
+_checked_messages_lock = threading.Lock()
 
-def initialize_checked_messages_file():
+
+def get_checked_messages():
     """
-    Создаёт новый файл с пустой очередью.
+    Хранилище проверенных сообщений процесса, загружается при первом обращении.
+    Не создаётся при импорте модуля: процессы разбора (parse_pool) не должны открывать и сжимать журнал.
     """
-    empty_queue = deque(maxlen=1000)
-    save_checked_messages(empty_queue)
-    return empty_queue
-
-# Загружаем очередь из файла при старте программы
-checked_messages = load_checked_messages()
+    global _checked_messages
+    with _checked_messages_lock:
+        if _checked_messages is None:
+            _checked_messages = CheckedMessagesStore(legacy_file=CHECKED_MESSAGES_FILE)
+        return _checked_messages
 
 def pop_last_elem():
-    if checked_messages:
-        checked_messages.pop()
-        save_checked_messages(checked_messages)
-        return
-    else:
-        raise IndexError("Очередь пуста, нечего удалять")
+    checked_messages = get_checked_messages()
+    checked_messages.pop()
+    save_checked_messages(checked_messages)
+    # Сообщение снова непроверенное: первую страницу нужно разобрать, даже если она не изменилась
+    listing_snapshot.remember(None)
+
+def is_new_message(msg_id, message):
+    """
+    Проверяет, что сообщение ещё не обрабатывалось.
+    Строки новее watermark новые без поиска по id; для остальных фильтр Блума быстро отсекает
+    новые (опоздавшие публикации), а его срабатывание проверяется по точному индексу.
+    Прежний ключ (md5) считается, только пока в хранилище есть перенесённые id без времени публикации.
+    """
+    checked_messages = get_checked_messages()
+    published = publication_timestamp(message.дата)
+    if published <= checked_messages.watermark and checked_messages.seen(msg_id):
+        return False
+    if not checked_messages.legacy_ids:
+        return True
+    # Сообщения, проверенные до перехода на GUID, хранятся под прежним ключом
+    legacy_id = legacy_message_id(message.дата, message.тип_сообщения, message.должник)
+    return legacy_id not in checked_messages
+
+def mark_checked(msg_id, message):
+    get_checked_messages().add(msg_id, publication_timestamp(message.дата))
 
 
 # метод для периодичного перезапуска программы
@@ -117,75 +118,115 @@ def clear_form_periodically(target_hour=0, target_minute=2, restart_queue=None):
             logger.error(f"Ошибка в функции clear_form_periodically: {e}")
             return False
 
-# метод для мониторинга первой страницы
-def fetch_and_parse_first_page(driver):
-    url = "https://old.bankrot.fedresurs.ru/Messages.aspx?"
-    logger.info(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] Открытие основной страницы: {url}')
-
+# загрузка первой страницы через браузер
+def fetch_listing_with_driver(driver, url):
     try:
+        driver.get(url)
+    except Exception as e:
+        logger.error(f'не получилось зайти на страницу сообщений: {e}')
+        driver = restart_driver(driver)
+        driver.get(url)
+        logger.info(f'Повторная попытка открытия ссылки')
+    wait_for_listing(driver)  # Ждём таблицу сообщений, а не фиксированную паузу
+    html = driver.page_source
+    archive_listing(url, html)
+    return html
+
+# загрузка первой страницы: сначала HTTP, при ошибке - браузер
+def fetch_listing_page(driver, url):
+    if POLL_MODE == "http":
         try:
-            driver.get(url)
+            return fetch_listing_html(url)
         except Exception as e:
-            logger.error(f'не получилось зайти на страницу сообщений: {e}')
-            driver = restart_driver(driver)
-            driver.get(url)
-            logger.info(f'Повторная попытка открытия ссылки')
-        time.sleep(1)  # Ждем 1 секунду для загрузки контента
-
-        # Получаем HTML-код страницы
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-
-        table = soup.find('table', class_='bank')
+            logger.warning(f'HTTP-опрос страницы сообщений не удался, используем браузер: {e}')
+            reset_session()
+    return fetch_listing_with_driver(driver, url)
 
-        # Находим строки таблицы сообщений
-        table_rows = table.select("tr")
+# метод для получения всех новых сообщений первой страницы за один опрос
+def fetch_new_messages_batch(driver):
+    """
+    Возвращает все непроверенные релевантные сообщения первой страницы в порядке публикации (от старых к новым).
+    Просмотр строк останавливается на первом уже проверенном сообщении.
+    :return: список сообщений (пустой, если новых нет) или None при ошибке.
+    """
+    url = "https://old.bankrot.fedresurs.ru/Messages.aspx?"
+    logger.info(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] Открытие основной страницы: {url}')
 
-        for row in reversed(table_rows):
-            cells = row.find_all("td")
-            if len(cells) < 5:
-                continue
+    try:
+        html = fetch_listing_page(driver, url)
+        # Таблица сообщений не изменилась с прошлого опроса - все строки уже проверены
+        digest = listing_digest(html)
+        if listing_snapshot.unchanged(digest):
+            logger.debug('Таблица сообщений не изменилась, разбор пропущен')
+            return []
+        # Разбор в пуле процессов не занимает GIL, пока стадии конвейера загружают сообщения
+        listing = get_parse_pool().parse_listing(html).result()
+    except Exception as e:
+        logger.error(f'Ошибка при обработке страницы {url}: {e}')
+        return None
 
-            # Извлекаем данные из ячеек
-            date = cells[0].get_text(strip=True)
-            message_type = cells[1].get_text(strip=True)
-            debtor = cells[2].get_text(strip=True)
-            published_by = cells[4].get_text(strip=True)
-            link_messeges = cells[1].find("a")["href"] if cells[1].find("a") else None
-            link_arbitr = cells[4].find("a")["href"] if cells[4].find("a") else None
-            link_debtor = cells[2].find("a")["href"] if cells[2].find("a") else None
-
-
-            # Проверка типа сообщения
-            if message_type in valid_message_types:
-                # Создаем уникальный идентификатор для строки
-                msg_id = hashlib.md5((date + message_type + debtor).encode()).hexdigest()
-
-                new_messages = {
-                    "дата": date,
-                    "тип_сообщения": message_type,
-                    "должник": debtor,
-                    "должник_ссылка": f"https://old.bankrot.fedresurs.ru{link_debtor}" if link_debtor else "Нет ссылки",
-                    "арбитр": published_by,
-                    "арбитр_ссылка": f"https://old.bankrot.fedresurs.ru{link_arbitr}" if link_arbitr else "Нет ссылки",
-                    "сообщение_ссылка": f"https://old.bankrot.fedresurs.ru{link_messeges}" if link_messeges else "Нет ссылки",
-                }
-
-                # Проверяем, является ли сообщение новым
-                if msg_id not in checked_messages:
-                    checked_messages.append(msg_id)
-                    logger.info('Найдено новое релевантное сообщение')
-                    logger.debug(
-                        f'Дата: {date}, Тип сообщения: {message_type}, Должник: {debtor}, Кем опубликовано: {published_by}')
+    batch = []
+    for msg_id, new_message in listing:
+        if not is_new_message(msg_id, new_message):
+            break
+        batch.append((msg_id, new_message))
+
+    if not batch:
+        listing_snapshot.remember(digest)
+        return []
+
+    batch.reverse()
+    for msg_id, new_message in batch:
+        mark_checked(msg_id, new_message)
+        logger.debug(
+            f'Дата: {new_message.дата}, Тип сообщения: {new_message.тип_сообщения}, '
+            f'Должник: {new_message.должник}, Кем опубликовано: {new_message.арбитр}')
+    save_checked_messages(get_checked_messages())
+    listing_snapshot.remember(digest)
+
+    new_messages = [new_message for _, new_message in batch]
+    logger.info(f'Найдено новых сообщений: {len(new_messages)}')
+
+    return new_messages
+
+# обработка одного сообщения: страница сообщения, БД, лоты
+def process_message(new_message, driver):
+    link = new_message.сообщение_ссылка
+
+    # Парсим содержимое сообщения
+    message_content = parse_message_page(link, driver)
+    commit_message(new_message, message_content)
+
+# сохранение уже разобранного сообщения: БД, АУ и должники, лоты
+def commit_message(new_message, message_content):
+    # Подготовка данных перед вставкой в БД
+    prepared_data = prepare_data_for_db(new_message, message_content)
+    logger.info(f'Сырые сообщения: %s', str(prepared_data))
+
+    persist_message(prepared_data)
+
+# запись подготовленного сообщения: АУ и должники, таблица messages, лоты
+def persist_message(prepared_data):
+    # добавление новых АУ и должников (работает со словарём и дополняет его часовым поясом)
+    au_debtorsDetecting(prepared_data.as_dict())
+
+    # Ставим сообщение в очередь на запись в БД (пишется пачкой, см. message_buffer)
+    get_message_buffer().add(prepared_data)
+
+    # Сообщение об изменении повторяет уже записанные лоты и условия торгов - сверять лоты не нужно
+    if lot_fingerprints.unchanged(prepared_data):
+        logger.info(f"Сообщение {prepared_data.сообщение_ссылка} не меняет лоты и условия торгов, сверка лотов пропущена")
+        return
 
-                    # Сохраняем очередь
-                    save_checked_messages(checked_messages)
+    # Все лоты сообщения отбрасываются правилами по его полям (например, опубликовано не АУ) - не раскладываем
+    if not skip_lots(prepared_data):
+        # Форматируем данные
+        formatted_data = split_columns(prepared_data)
 
-                    return new_messages
+        # Проверяем отформатированные данные
+        lots_analyze(formatted_data)
 
-    except Exception as e:
-        logger.error(f'Ошибка при обработке страницы {url}: {e}')
-        return None
-    return "not yet"
+    lot_fingerprints.remember(prepared_data)
 
 # парсинг всех страниц снизу верх
 def parse_all_pages_reverse(driver):
@@ -198,12 +239,10 @@ def parse_all_pages_reverse(driver):
         visited_pages = set()  # Отслеживание уже обработанных страниц
         driver.get(url)
 
-        time.sleep(2)
+        wait_for_listing(driver)
         logger.info(f'[{time.strftime("%Y-%m-%d %H:%M:%S")}] Начало обхода всех страниц (снизу вверх): {url}')
         soup = BeautifulSoup(driver.page_source, 'html.parser')
 
-        time.sleep(5)
-
         brige_page = "..."
 
         # Находим все ссылки пагинации
@@ -212,13 +251,7 @@ def parse_all_pages_reverse(driver):
             logger.warning("Ссылки пагинации отсутствуют.")
             return
 
-        driver.find_element(By.LINK_TEXT, brige_page).click()
-
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.TAG_NAME, 'html'))
-        )
-
-        time.sleep(5)
+        click_and_wait_listing(driver, driver.find_element(By.LINK_TEXT, brige_page))
         page_numbers = ['20', '19', '18', '17', '16', '15', '14', '13', '12', '11',
                         '...', '9', '8', '7', '6', '5', '4', '3', '2', '1']
 
@@ -229,19 +262,16 @@ def parse_all_pages_reverse(driver):
 
             logger.info(f"Переход на страницу: {page_number}")
             try:
-                # Находим ссылку на нужную страницу
+                wait_for_listing(driver)
+                # Находим ссылку на нужную страницу и ждём, пока загрузится новая страница
                 page_link = driver.find_element(By.LINK_TEXT, page_number)
-                page_link.click()  # Эмулируем клик на элемент
+                click_and_wait_listing(driver, page_link)
                 logger.info(f"Успешный переход на страницу: {page_number}")
 
-                # Ожидание загрузки новой страницы
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.TAG_NAME, 'html'))
-                )
-                time.sleep(2)
-
                 # Обновляем HTML и выполняем парсинг
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
+                html = driver.page_source
+                archive_listing(urlll, html)
+                listing = parse_listing_rows(html)
 
             except Exception as e:
                 logger.error(f"Ошибка при переходе на страницу {page_number}: {e}")
@@ -252,74 +282,21 @@ def parse_all_pages_reverse(driver):
             # Помечаем страницу как обработанную
             visited_pages.add(str(page_number))
 
-            # Обновляем содержимое страницы
-            table = soup.find('table', class_='bank')
-            if not table:
-                logger.warning(f"Таблица сообщений не найдена на странице {page_number}")
-                continue
-
-            # Парсим строки
-            rows = table.find_all('tr')
-            for row in reversed(rows):  # Обрабатываем строки с конца
-                row_class = row.get('class', [])
-                if not row_class or 'row' in row_class:
-                    cells = row.find_all("td")
-                    if len(cells) < 5:
-                        continue
-
-                    # Извлекаем данные из ячеек
-                    date = cells[0].get_text(strip=True)
-                    message_type = cells[1].get_text(strip=True)
-                    debtor = cells[2].get_text(strip=True)
-                    published_by = cells[4].get_text(strip=True)
-                    link_messages = cells[1].find("a")["href"] if cells[1].find("a") else None
-                    link_arbitr = cells[4].find("a")["href"] if cells[4].find("a") else None
-                    link_debtor = cells[2].find("a")["href"] if cells[2].find("a") else None
-
-                    if message_type in valid_message_types:
-                        msg_id = hashlib.md5((date + message_type + debtor).encode()).hexdigest()
-                        new_message = {
-                            "дата": date,
-                            "тип_сообщения": message_type,
-                            "должник": debtor,
-                            "должник_ссылка": f"https://old.bankrot.fedresurs.ru{link_debtor}" if link_debtor else "Нет ссылки",
-                            "арбитр": published_by,
-                            "арбитр_ссылка": f"https://old.bankrot.fedresurs.ru{link_arbitr}" if link_arbitr else "Нет ссылки",
-                            "сообщение_ссылка": f"https://old.bankrot.fedresurs.ru{link_messages}" if link_messages else "Нет ссылки",
-                        }
-
-                        if msg_id not in checked_messages:
-                            checked_messages.append(msg_id)
-                            logger.info('Найдено новое релевантное сообщение')
-                            logger.debug(
-                                f'Дата: {date}, Тип сообщения: {message_type}, Должник: {debtor}, Кем опубликовано: {published_by}')
-                            save_checked_messages(checked_messages)
-                            if new_message:
-                                link = new_message["сообщение_ссылка"]
-                                try:
-                                    # Парсим содержимое сообщения
-                                    message_content = parse_message_page(link, driver)
-                                    new_message['message_content'] = message_content
-
-                                    # Подготовка данных перед вставкой в БД
-                                    prepared_data = prepare_data_for_db(new_message)
-                                    logger.info(f'Сырые сообщения: %s', str(prepared_data))
-
-                                    # добавление новых АУ и должников
-                                    au_debtorsDetecting(prepared_data)
-
-                                    # Вставляем данные в БД и получаем ID
-                                    insert_message_to_db(prepared_data)
-
-                                    # Форматируем данные
-                                    formatted_data = split_columns(prepared_data)
-
-                                    # Проверяем отформатированные данные
-                                    lots_analyze(formatted_data)
-
-                                except Exception as e:
-                                    logger.error(f"Ошибка при обработке сообщения: {e}")
-                                    return False
+            # Парсим строки, начиная с конца страницы
+            for msg_id, new_message in reversed(listing):
+                if is_new_message(msg_id, new_message):
+                    mark_checked(msg_id, new_message)
+                    logger.info('Найдено новое релевантное сообщение')
+                    logger.debug(
+                        f'Дата: {new_message.дата}, Тип сообщения: {new_message.тип_сообщения}, '
+                        f'Должник: {new_message.должник}, Кем опубликовано: {new_message.арбитр}')
+                    save_checked_messages(get_checked_messages())
+                    try:
+                        process_message(new_message, driver)
+
+                    except Exception as e:
+                        logger.error(f"Ошибка при обработке сообщения: {e}")
+                        return False
 
     except Exception as e:
         logger.error(f'Произошла ошибка при парсинге всех страниц: {e}')
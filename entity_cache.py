@@ -0,0 +1,180 @@
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+
+from db_pool import connection_params, db_connection
+from logScript import logger
+
+# Сколько ИНН каждого вида (АУ, должники) держать в памяти
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "100000"))
+# Загружать ли известные ИНН из БД при первом обращении к кэшу
+ENTITY_CACHE_PRELOAD = os.getenv("ENTITY_CACHE_PRELOAD", "0") == "1"
+# Слушать ли канал уведомлений, чтобы видеть изменения из других процессов
+ENTITY_CACHE_LISTEN = os.getenv("ENTITY_CACHE_LISTEN", "1") == "1"
+# Канал NOTIFY. Полезная нагрузка: "<вид> <+|-> <ИНН>" - ИНН добавлен или удалён, "*" - сбросить кэш
+ENTITY_NOTIFY_CHANNEL = os.getenv("ENTITY_NOTIFY_CHANNEL", "entity_changes")
+# Пауза перед переподключением слушателя уведомлений (в секундах)
+ENTITY_LISTEN_RETRY_DELAY = float(os.getenv("ENTITY_LISTEN_RETRY_DELAY", "5"))
+
+# Виды сущностей и таблицы, в которых они хранятся: вид -> (таблица, колонка ИНН)
+MANAGER = "manager"
+DEBTOR = "debtor"
+ENTITY_TABLES = {
+    MANAGER: ("arbitr_managers", "ИНН_АУ"),
+    DEBTOR: ("dolzhnik", "Инн_Должника"),
+}
+
+
+class KnownEntities:
+    """
+    ИНН АУ и должников, которые точно есть в БД (LRU по каждому виду). Кэш только положительный:
+    отсутствие ИНН в кэше ничего не значит, и его существование проверяется в БД.
+
+    Пополняется после записи и проверки в БД, а также уведомлениями других процессов
+    (канал ENTITY_NOTIFY_CHANNEL). Удалённый из таблицы ИНН нужно сообщить уведомлением "<вид> - <ИНН>",
+    например триггером на DELETE; при потере соединения со слушателем кэш сбрасывается.
+    """
+
+    def __init__(self, maxsize=ENTITY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = {kind: OrderedDict() for kind in ENTITY_TABLES}
+        self._hits = dict.fromkeys(ENTITY_TABLES, 0)
+        self._checks = dict.fromkeys(ENTITY_TABLES, 0)
+
+    def known(self, kind, inn):
+        with self._lock:
+            entries = self._entries[kind]
+            hit = inn in entries
+            if hit:
+                entries.move_to_end(inn)
+                self._hits[kind] += 1
+            self._checks[kind] += 1
+        return hit
+
+    def add(self, kind, inn):
+        if not inn:
+            return
+        with self._lock:
+            entries = self._entries[kind]
+            entries[inn] = True
+            entries.move_to_end(inn)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def discard(self, kind, inn):
+        with self._lock:
+            self._entries[kind].pop(inn, None)
+
+    def clear(self):
+        with self._lock:
+            for entries in self._entries.values():
+                entries.clear()
+
+    def preload(self):
+        """
+        Загружает известные ИНН из таблиц ENTITY_TABLES (не больше maxsize каждого вида).
+        """
+        with db_connection() as conn, conn.cursor() as cursor:
+            for kind, (table, column) in ENTITY_TABLES.items():
+                cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT %s", (self.maxsize,))
+                for (inn,) in cursor:
+                    self.add(kind, str(inn))
+        logger.info(f"Кэш сущностей загружен: {self.sizes()}")
+
+    def apply_notification(self, payload):
+        """
+        Применяет уведомление "<вид> <+|-> <ИНН>" или "*".
+        """
+        if payload == "*":
+            self.clear()
+            return
+        parts = payload.split(" ", 2)
+        if len(parts) != 3 or parts[0] not in ENTITY_TABLES:
+            logger.warning(f"Неизвестное уведомление кэша сущностей: {payload}")
+            return
+        kind, op, inn = parts
+        if op == "+":
+            self.add(kind, inn)
+        elif op == "-":
+            self.discard(kind, inn)
+
+    def sizes(self):
+        with self._lock:
+            return {kind: len(entries) for kind, entries in self._entries.items()}
+
+    def summary(self):
+        with self._lock:
+            return {
+                kind: {"size": len(self._entries[kind]), "checks": self._checks[kind], "hits": self._hits[kind],
+                       "hit_rate": self._hits[kind] / self._checks[kind] if self._checks[kind] else 0.0}
+                for kind in ENTITY_TABLES
+            }
+
+
+def notify_sql(kind, relation, column):
+    """
+    Подзапрос: рассылает "<вид> + <ИНН>" по каждой строке relation (например, RETURNING из CTE)
+    и возвращает их число.
+    """
+    return (f"SELECT count(*) FROM (SELECT pg_notify('{ENTITY_NOTIFY_CHANNEL}', '{kind} + ' || {column}) "
+            f"FROM {relation}) notified")
+
+
+def _listen(cache):
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**connection_params())
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {ENTITY_NOTIFY_CHANNEL}")
+            logger.info(f"Кэш сущностей слушает канал {ENTITY_NOTIFY_CHANNEL}")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    cache.apply_notification(conn.notifies.pop(0).payload)
+        except Exception as e:
+            # Пока слушателя нет, уведомления теряются: кэш может устареть, поэтому сбрасывается
+            logger.error(f"Слушатель уведомлений кэша сущностей отключился: {e}")
+            cache.clear()
+        finally:
+            if conn is not None:
+                conn.close()
+        time.sleep(ENTITY_LISTEN_RETRY_DELAY)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_entity_cache():
+    """
+    Общий кэш известных сущностей процесса. При первом обращении запускается слушатель уведомлений
+    (ENTITY_CACHE_LISTEN) и, если включено, загружаются известные ИНН (ENTITY_CACHE_PRELOAD).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = KnownEntities()
+            if ENTITY_CACHE_LISTEN:
+                threading.Thread(target=_listen, args=(_cache,), daemon=True, name="EntityCacheListenThread").start()
+            if ENTITY_CACHE_PRELOAD:
+                try:
+                    _cache.preload()
+                except Exception as e:
+                    logger.error(f"Не удалось загрузить кэш сущностей: {e}")
+        return _cache
+
+
+def entity_cache_summary():
+    """
+    Метрики общего кэша (KnownEntities.summary) или None, если кэш не создавался.
+    """
+    return _cache.summary() if _cache is not None else None
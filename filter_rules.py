@@ -0,0 +1,125 @@
+import re
+import threading
+from typing import Callable, NamedTuple
+
+from format import filter_lots_by_property_type, filter_results_before_transfer
+from logScript import logger
+from records import LOT_COLUMNS
+
+# Стадии, на которых становятся известны поля записи: страница сообщения -> лот.
+# Отбор по строке списка (до загрузки страницы) - только по типу сообщения, в listing.parse_listing_rows:
+# сообщения остальных правил всё равно записываются в messages, поэтому их страницы загружаются
+MESSAGE = 1
+LOT = 2
+STAGE_NAMES = {MESSAGE: "сообщение", LOT: "лот"}
+
+# Как в format.delete_org: регистр учитывается
+_not_manager_link_re = re.compile(r"PrsTOCard|OrgToCard")
+_cancelled_re = re.compile(r"аннулир|отмен", re.IGNORECASE)
+CANCEL_MESSAGE_TYPE = "Сообщение об отмене сообщения об объявлении торгов или сообщения о результатах торгов"
+
+
+class FilterRule(NamedTuple):
+    """
+    Правило отбора: rejects(запись) -> True, если запись отбрасывается. fields - поля, которые читает правило.
+    min_stage - не выполнять правило раньше этой стадии, даже если его поля уже известны.
+    """
+    name: str
+    fields: tuple
+    rejects: Callable
+    min_stage: int = MESSAGE
+
+    @property
+    def stage(self):
+        """
+        Самая ранняя стадия, на которой известны все поля правила. Поля лота (records.LOT_COLUMNS)
+        есть у сообщения только в виде строки по всем лотам, поэтому правило по ним выполняется на стадии LOT.
+        """
+        if any(field in LOT_COLUMNS for field in self.fields):
+            return LOT
+        return self.min_stage
+
+
+def publisher_not_manager(row):
+    # Сообщение опубликовано не арбитражным управляющим (карточка организации или физлица)
+    return bool(_not_manager_link_re.search(row.get("арбитр_ссылка") or ""))
+
+
+def _cancelled(row):
+    message_type = row.get("тип_сообщения") or ""
+    return bool(_cancelled_re.search(message_type)) and CANCEL_MESSAGE_TYPE not in message_type
+
+
+RULES = (
+    FilterRule("публикатор_не_АУ", ("арбитр_ссылка",), publisher_not_manager),
+    # Тип сообщения в шаблоне аннулирования проверялся только по лотам, как и раньше
+    FilterRule("аннулированное_сообщение", ("тип_сообщения",), _cancelled, min_stage=LOT),
+    FilterRule("должник_без_ИНН", ("ИНН",), lambda row: "не" in (row.get("ИНН") or "")),
+    FilterRule("несостоявшиеся_торги", ("тип_сообщения", "наименование_покупателя", "цена"),
+               lambda row: filter_results_before_transfer(row) is None),
+    FilterRule("тип_имущества", ("тип_сообщения", "классификация", "описание", "сведения_о_заключении_договора"),
+               lambda row: filter_lots_by_property_type(row) is None),
+)
+
+
+class FilterStats:
+    """
+    Сколько записей отброшено каждым правилом и у скольких сообщений лоты не раскладывались совсем.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rejected = {}
+        self.skipped_lot_messages = 0
+
+    def record(self, rule, stage):
+        with self._lock:
+            self.rejected[rule.name] = self.rejected.get(rule.name, 0) + 1
+            if stage < LOT:
+                self.skipped_lot_messages += 1
+
+    def summary(self):
+        with self._lock:
+            return {"rejected": dict(self.rejected), "skipped_lot_messages": self.skipped_lot_messages}
+
+
+filter_stats = FilterStats()
+
+
+def rejecting_rule(row, stage, rules=RULES):
+    """
+    Первое правило, выполнимое на стадии stage (его поля уже известны) и отбрасывающее запись, или None.
+    """
+    for rule in rules:
+        if rule.stage <= stage and rule.rejects(row):
+            return rule
+    return None
+
+
+def apply_rules(rows, stage, rules=RULES):
+    """
+    Оставляет записи, которые не отбрасывает ни одно правило, выполнимое на стадии stage.
+    """
+    kept = []
+    for row in rows:
+        rule = rejecting_rule(row, stage, rules)
+        if rule is None:
+            kept.append(row)
+            continue
+        filter_stats.record(rule, stage)
+        logger.debug(f"Запись отброшена правилом {rule.name} (стадия: {STAGE_NAMES[stage]})")
+    return kept
+
+
+def skip_lots(message):
+    """
+    Проверяет подготовленное сообщение правилами, поля которых известны без лотов (стадия MESSAGE).
+    True - все лоты сообщения отбросило бы split_columns, раскладывать и сверять их не нужно.
+    Само сообщение записывается в любом случае: правила отбирают только лоты.
+    """
+    rule = rejecting_rule(message, MESSAGE)
+    if rule is None:
+        return False
+    filter_stats.record(rule, MESSAGE)
+    logger.info(f"Лоты сообщения {message.get('сообщение_ссылка')} не обрабатываются: {rule.name}")
+    return True
@@ -1,7 +1,9 @@
 import re
-import os
-import psycopg2
-from dotenv import load_dotenv
+
+from psycopg2 import ProgrammingError
+
+from db_pool import db_connection
+from entity_cache import DEBTOR, MANAGER, get_entity_cache, notify_sql
 from logScript import logger
 from city import process_address
 
@@ -21,158 +23,149 @@ def extract_inn(text):
 def clean_fio(text):
     return re.sub(r'\s*\(ИНН[:\s]*\d+.*?\u0421НИЛС.*?\)', '', str(text)).strip()
 
-# Основная функция
-def au_debtorsDetecting(data):
-    # Проверка типа данных, если передан словарь, преобразуем его в список
-    if isinstance(data, dict):
-        data = [process_address(data)]
-
-    # Загрузка переменных окружения
-    load_dotenv(dotenv_path='.env')
-    logger.info(f"DB_HOST: {os.getenv('DB_HOST')}")
-    logger.info(f"DB_NAME: {os.getenv('DB_NAME')}")
-    logger.info(f"DB_USER: {os.getenv('DB_USER')}")
-    logger.info(f"DB_PASSWORD: {os.getenv('DB_PASSWORD')}")
-    logger.info(f"DB_PORT: {os.getenv('DB_PORT')}")
-
-    db_name = os.getenv("DB_NAME")
-    db_user = os.getenv("DB_USER")
-    db_password = os.getenv("DB_PASSWORD")
-    db_host = os.getenv("DB_HOST")
-    db_port = os.getenv("DB_PORT")
+# Цели ON CONFLICT: уникальные индексы из migrations/001_unique_entity_inn.sql, проверяются при старте
+UPSERT_TARGETS = (("arbitr_managers", "ИНН_АУ"), ("dolzhnik", "Инн_Должника"))
+
+# Новые АУ и должник сообщения одним запросом: вставка пропускается, если ИНН уже есть,
+# а в таблицы истории *_previos попадают только действительно вставленные строки
+_MANAGER_CTE = """
+    manager AS (
+        INSERT INTO arbitr_managers (ИНН_АУ, ФИО_АУ, ссылка_ЕФРСБ, город_АУ, СРО_АУ, почта_ау, часовой_пояс)
+        VALUES (%(inn_au)s, %(fio)s, %(arbiter_link)s, %(address)s, %(sro)s, %(email)s, %(timezone)s)
+        ON CONFLICT (ИНН_АУ) DO NOTHING
+        RETURNING ИНН_АУ, ФИО_АУ, ссылка_ЕФРСБ, город_АУ, СРО_АУ, почта_ау, часовой_пояс
+    ), manager_history AS (
+        INSERT INTO arbitr_previos (ИНН_АУ, ФИО_АУ, ссылка_ЕФРСБ, город_АУ, СРО_АУ, почта_ау, часовой_пояс)
+        SELECT * FROM manager
+    )"""
+_DEBTOR_CTE = """
+    debtor AS (
+        INSERT INTO dolzhnik (Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела,
+                              Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ)
+        VALUES (%(debtor_inn)s, %(debtor_name)s, %(debtor_link)s, '', %(case_number)s,
+                %(debtor_kind)s, 'ЕФРСБ', %(fio)s, %(inn_au)s)
+        ON CONFLICT (Инн_Должника) DO NOTHING
+        RETURNING Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела,
+                  Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ
+    ), debtor_history AS (
+        INSERT INTO debtors_previos (Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела,
+                                     Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ)
+        SELECT * FROM debtor
+    )"""
+
+
+def _upsert_query(manager, debtor):
+    """
+    Запрос для тех сущностей, которых нет в кэше. Результат: (добавлен ли АУ, добавлен ли должник);
+    о добавленных сообщается другим процессам (entity_cache).
+    """
+    ctes = [cte for cte, needed in ((_MANAGER_CTE, manager), (_DEBTOR_CTE, debtor)) if needed]
+    added = [f"({notify_sql(kind, kind, column)}) > 0" if needed else "false"
+             for kind, column, needed in ((MANAGER, "ИНН_АУ", manager), (DEBTOR, "Инн_Должника", debtor))]
+    return f"WITH {', '.join(ctes)}\n    SELECT {', '.join(added)};"
 
-    try:
-        connection = psycopg2.connect(
-            dbname=db_name,
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port
-        )
-        cursor = connection.cursor()
-
-        for message_row in data:
-            try:
-                raw_fio = message_row['ФИО_АУ']
-                arbiter_link = message_row['арбитр_ссылка']
-                address = message_row['адрес_корреспонденции']
-                timezoneCity = message_row['часовой_пояс']
-                sro = clean_sro(message_row['СРО_АУ'])
-                email = message_row['почта']
-                message_inn = message_row['ИНН']
-                debtor_name = message_row['наименование_должника']
-                debtor_link = message_row['должник_ссылка']
-                case_number = message_row['номер_дела']
-
-                # Пропускаем запись, если ссылка содержит OrgToCard или PrsToCard
-                if "OrgToCard" in arbiter_link or "PrsToCard" in arbiter_link:
-                    logger.info(
-                        f"Ссылка {arbiter_link} содержит OrgToCard или PrsToCard. Запись пропускается.")
-                    continue
-
-                inn_au = extract_inn(raw_fio)
-                if not inn_au:
-                    logger.info(f"ИНН не удалось извлечь из строки ФИО_АУ: {raw_fio}. Запись игнорируется.")
-                    continue
-
-                # Проверка наличия арбитражного управляющего в таблице arbitr_managers
-                cursor.execute(
-                    """
-                    SELECT ИНН_АУ FROM arbitr_managers WHERE ИНН_АУ = %s
-                    """,
-                    (inn_au,)
-                )
-                existing_manager = cursor.fetchone()
-                if existing_manager:
-                    logger.info(
-                        f"ИНН {inn_au} уже существует. Запись игнорируется в таблице 'arbitr_managers'. ФИО_АУ: {raw_fio}")
-                else:
-                    cursor.execute(
-                        """
-                        INSERT INTO arbitr_managers (ИНН_АУ, ФИО_АУ, ссылка_ЕФРСБ, город_АУ, СРО_АУ, почта_ау, часовой_пояс)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (inn_au, clean_fio(raw_fio), arbiter_link, address, sro, email, timezoneCity)
-                    )
-                    logger.info(f"Добавлена запись в 'arbitr_managers' с ИНН {inn_au}. ФИО_АУ: {raw_fio}")
-                    cursor.execute(
-                        """
-                        INSERT INTO arbitr_previos (ИНН_АУ, ФИО_АУ, ссылка_ЕФРСБ, город_АУ, СРО_АУ, почта_ау, часовой_пояс)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (inn_au, clean_fio(raw_fio), arbiter_link, address, sro, email, timezoneCity)
-                    )
-
-                # Проверка наличия должника в таблице dolzhnik
-                cursor.execute(
-                    """
-                    SELECT Инн_Должника, ИНН_АУ FROM dolzhnik WHERE Инн_Должника = %s
-                    """,
-                    (message_inn,)
-                )
-                existing_debtor = cursor.fetchone()
-                if existing_debtor:
-                    # # Проверяем, совпадает ли ИНН_АУ с тем, что уже есть в базе
-                    # existing_inn_au = existing_debtor[1]
-                    # if existing_inn_au != inn_au:
-                    #     # Если арбитражный управляющий новый, обновляем данные
-                    #     cursor.execute(
-                    #         """
-                    #         UPDATE dolzhnik
-                    #         SET ИНН_АУ = %s, Статус_АУ = 'Новый АУ'
-                    #         WHERE Инн_Должника = %s
-                    #         """,
-                    #         (inn_au, message_inn)
-                    #     )
-                    #     cursor.execute(
-                    #         """
-                    #         INSERT INTO debtors_previos (Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела, Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ, Статус_АУ)
-                    #         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    #         """,
-                    #         (message_inn, debtor_name, debtor_link, '', case_number,
-                    #          'ЮЛ' if len(message_inn) == 10 else 'ФЛ' if len(message_inn) == 12 else '',
-                    #          'ЕФРСБ', clean_fio(raw_fio), inn_au, 'Новый АУ')
-                    #     )
-                    #     logger.info(
-                    #         f"Для должника с ИНН {message_inn} обновлен арбитражный управляющий на ИНН {inn_au}. Статус АУ установлен как 'Новый АУ'.")
-                    # else:
-                    logger.info(f"ИНН должника {message_inn} уже существует в таблице 'dolzhnik'. Запись игнорируется. Наименование должника: {debtor_name}")
-                else:
-                    cursor.execute(
-                        """
-                        INSERT INTO dolzhnik (Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела, Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (message_inn, debtor_name, debtor_link, '', case_number,
-                         'ЮЛ' if len(message_inn) == 10 else 'ФЛ' if len(message_inn) == 12 else '',
-                         'ЕФРСБ', clean_fio(raw_fio), inn_au)
-                    )
-                    logger.info(
-                        f"Добавлена запись в 'dolzhnik' с ИНН должника {message_inn}. Наименование должника: {debtor_name}")
 
-                    cursor.execute(
-                        """
-                        INSERT INTO debtors_previos (Инн_Должника, Должник_текст, Должник_ссылка_ЕФРСБ, Должник_ссылка_ББ, Номер_дела, Фл_Юл, ЕФРСБ_ББ, АУ_текст, ИНН_АУ)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (message_inn, debtor_name, debtor_link, '', case_number,
-                         'ЮЛ' if len(message_inn) == 10 else 'ФЛ' if len(message_inn) == 12 else '',
-                         'ЕФРСБ', clean_fio(raw_fio), inn_au)
-                    )
-                    logger.info(f"Добавленна запись в 'debtors_previos' с ИНН должника {message_inn}. Наименование должника: {debtor_name}")
+# (нужно ли записать АУ, нужно ли записать должника) -> запрос
+UPSERT_QUERIES = {parts: _upsert_query(*parts) for parts in ((True, True), (True, False), (False, True))}
 
 
-                connection.commit()
-                logger.info("Изменения зафиксированы.")
+def debtor_kind(inn):
+    return 'ЮЛ' if len(inn) == 10 else 'ФЛ' if len(inn) == 12 else ''
 
-            except Exception as e:
-                logger.error(f"Ошибка при обработке: {e}")
-                connection.rollback()
 
+# Основная функция
+def au_debtorsDetecting(data):
+    # Если передан словарь (сообщение), часовой пояс АУ определяется по адресу - только если АУ нужно записать
+    locate = isinstance(data, dict)
+    if locate:
+        data = [data]
+
+    cache = get_entity_cache()
+    pending = []
+    for message_row in data:
+        raw_fio = message_row['ФИО_АУ']
+        arbiter_link = message_row['арбитр_ссылка']
+        message_inn = message_row['ИНН']
+
+        # Пропускаем запись, если ссылка содержит OrgToCard или PrsToCard
+        if "OrgToCard" in arbiter_link or "PrsToCard" in arbiter_link:
+            logger.info(
+                f"Ссылка {arbiter_link} содержит OrgToCard или PrsToCard. Запись пропускается.")
+            continue
+
+        inn_au = extract_inn(raw_fio)
+        if not inn_au:
+            logger.info(f"ИНН не удалось извлечь из строки ФИО_АУ: {raw_fio}. Запись игнорируется.")
+            continue
+
+        # Известные АУ и должники уже есть в БД: проверять их запросом не нужно
+        manager = not cache.known(MANAGER, inn_au)
+        debtor = bool(message_inn) and not cache.known(DEBTOR, message_inn)
+        if not manager and not debtor:
+            logger.info(f"АУ с ИНН {inn_au} и должник с ИНН {message_inn} уже известны. Запись игнорируется.")
+            continue
+        if manager and locate:
+            message_row = process_address(message_row)
+        pending.append((message_row, inn_au, manager, debtor))
+
+    if not pending:
+        return
+    try:
+        # Каждая строка - один запрос, поэтому autocommit: отдельная транзакция и COMMIT не нужны
+        with db_connection(autocommit=True) as connection, connection.cursor() as cursor:
+            _detect_rows(pending, cursor, cache)
+    except ProgrammingError:
+        # Ошибка запроса или схемы (например, нет уникального индекса для ON CONFLICT) не пропускается молча
+        raise
     except Exception as e:
         logger.error(f"Ошибка подключения к базе данных: {e}")
 
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
+
+def _detect_rows(pending, cursor, cache):
+    """
+    Добавляет новых АУ и должников (UPSERT_QUERIES, один запрос на строку) и запоминает их ИНН в кэше.
+    pending - [(строка сообщения, ИНН АУ, записать ли АУ, записать ли должника)].
+    """
+    for message_row, inn_au, manager, debtor in pending:
+        try:
+            raw_fio = message_row['ФИО_АУ']
+            message_inn = message_row['ИНН']
+            debtor_name = message_row['наименование_должника']
+
+            cursor.execute(UPSERT_QUERIES[manager, debtor], {
+                "inn_au": inn_au,
+                "fio": clean_fio(raw_fio),
+                "arbiter_link": message_row['арбитр_ссылка'],
+                "address": message_row['адрес_корреспонденции'],
+                "sro": clean_sro(message_row['СРО_АУ']),
+                "email": message_row['почта'],
+                "timezone": message_row.get('часовой_пояс'),
+                "debtor_inn": message_inn,
+                "debtor_name": debtor_name,
+                "debtor_link": message_row['должник_ссылка'],
+                "case_number": message_row['номер_дела'],
+                "debtor_kind": debtor_kind(message_inn or ''),
+            })
+            manager_added, debtor_added = cursor.fetchone()
+
+            if manager:
+                cache.add(MANAGER, inn_au)
+                if manager_added:
+                    logger.info(f"Добавлена запись в 'arbitr_managers' и 'arbitr_previos' с ИНН {inn_au}. ФИО_АУ: {raw_fio}")
+                else:
+                    logger.info(
+                        f"ИНН {inn_au} уже существует. Запись игнорируется в таблице 'arbitr_managers'. ФИО_АУ: {raw_fio}")
+            if debtor:
+                cache.add(DEBTOR, message_inn)
+                if debtor_added:
+                    logger.info(f"Добавлена запись в 'dolzhnik' и 'debtors_previos' с ИНН должника {message_inn}. "
+                                f"Наименование должника: {debtor_name}")
+                else:
+                    logger.info(f"ИНН должника {message_inn} уже существует в таблице 'dolzhnik'. Запись игнорируется. "
+                                f"Наименование должника: {debtor_name}")
+
+        except ProgrammingError as e:
+            logger.error(f"Ошибка запроса записи АУ и должника: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при обработке: {e}")
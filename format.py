@@ -95,13 +95,6 @@ def filter_lots_by_property_type(lot):
     logger.debug("Лот прошёл все проверки: %s", lot)
     return lot
 
-def delete_org(text):
-    logger.debug(f"Удаление ссылок на PrsTOCard/OrgToCard: {text}")
-    if text and isinstance(text, str) and ("PrsTOCard" in text or "OrgToCard" in text):
-        return None
-    return text
-
-
 def extract_number(text):
     if not text:
         return None
@@ -126,21 +119,6 @@ def clean_special_chars(text):
         return re.sub(' +', ' ', text)
     return text
 
-def remove_rows_with_cancelled_messages(data):
-    logger.debug("Удаление строк с аннулированными сообщениями")
-    pattern = r'аннулир|отмен'
-
-    result = [
-        row for row in data
-        if not (
-                re.search(pattern, row.get("тип_сообщения", ""), re.IGNORECASE) and
-                "Сообщение об отмене сообщения об объявлении торгов или сообщения о результатах торгов" not in row.get(
-            "тип_сообщения", "")
-        )
-    ]
-    logger.debug(f"Удалено {len(data) - len(result)} строк с аннулированными сообщениями")
-    return result
-
 lots_columns = [
     "ИНН_Должника", "Дата_публикации", "Дата_начала_торгов",  "Дата_окончания",
     "Номер_дела", "Действующий_номер_сообщения", "Номер_лота",
@@ -177,21 +155,25 @@ def transfer_and_order_data(raw_data, lots_columns, mappings):
     logger.debug("Перенос и упорядочивание данных")
     formatted_data = []
 
+    # Колонка таблицы лотов -> колонка строки сообщения, один раз на вызов, а не для каждой ячейки
+    sources = {}
+    for key, value in mappings.items():
+        sources.setdefault(value, key)
+    columns = [(col, sources.get(col)) for col in lots_columns]
+
     for row in raw_data:
         formatted_row = {}
-        for col in lots_columns:
-            source_col = [key for key, value in mappings.items() if value == col]
-            if source_col:
-                # Обработка для вид_торгов
-                if col == 'вид_торгов':
-                    if "объяв" in row.get("тип_сообщения", "").lower().strip():
-                        formatted_row[col] = row.get("вид_торгов", None)  # Берём из исходного 'вид_торгов'
-                    else:
-                        formatted_row[col] = row.get("тип_сообщения", None)  # По умолчанию берём 'тип_сообщения'
+        for col, source_col in columns:
+            if source_col is None:
+                formatted_row[col] = None
+            # Обработка для вид_торгов
+            elif col == 'вид_торгов':
+                if "объяв" in row.get("тип_сообщения", "").lower().strip():
+                    formatted_row[col] = row.get("вид_торгов", None)  # Берём из исходного 'вид_торгов'
                 else:
-                    formatted_row[col] = row.get(source_col[0], None)
+                    formatted_row[col] = row.get("тип_сообщения", None)  # По умолчанию берём 'тип_сообщения'
             else:
-                formatted_row[col] = None
+                formatted_row[col] = row.get(source_col, None)
         formatted_data.append(formatted_row)
 
     logger.debug(f"Обработано строк: {len(formatted_data)}")
@@ -200,20 +182,8 @@ def transfer_and_order_data(raw_data, lots_columns, mappings):
 def process_data(data):
     logger.info("Начало обработки данных")
 
-    # Удаление строк с аннулированными сообщениями
-    data = remove_rows_with_cancelled_messages(data)
-
-    # Отфильтровываем лоты с использованием filter_lots_by_property_type
-    filtered_data = []
-    for row in data:
-        filtered_lot = filter_lots_by_property_type(row)
-        if filtered_lot is None:
-            logger.debug(f"Пропущено: {row}")
-            continue  # Пропускаем этот лот, если функция вернула "Пропуск"
-        filtered_data.append(filtered_lot)
-
-    # Перенос и упорядочивание данных после фильтрации
-    formatted_data = transfer_and_order_data(filtered_data, lots_columns, mappings)
+    # Перенос и упорядочивание данных (строки уже отобраны правилами filter_rules)
+    formatted_data = transfer_and_order_data(data, lots_columns, mappings)
 
     # Преобразование и обработка данных после переноса
     processed_data = []
@@ -234,24 +204,3 @@ def process_data(data):
     logger.info(f"Обработка завершена. Отфильтровано лотов: {len(processed_data)}")
     print(tabulate(processed_data, headers="keys", tablefmt="grid"))
     return processed_data
-
-def get_massageLots(lots):
-    data = lots.copy()  # Создание копии данных, чтобы не изменять исходный список
-    cleaned_data = []  # Новый список для отфильтрованных данных
-
-    for record in data:
-        if "не" in record.get("ИНН"):
-            continue
-        if record.get('арбитр_ссылка'):
-            if delete_org(record['арбитр_ссылка']) is None:
-                # Если delete_org вернул None, значит ссылка содержит PrsTOCard или OrgToCard
-                logger.debug(f"Удаление записи с арбитром, ссылка на которого содержит PrsTOCard/OrgToCard: {record}")
-                continue  # Пропускаем добавление этой записи в cleaned_data
-        if filter_results_before_transfer(record) is None:
-            continue
-        cleaned_data.append(record)  # Добавляем запись в результирующий список, если условие не сработало
-
-    # Фильтрация и обработка данных
-    cleaned_data = process_data(cleaned_data)
-
-    return cleaned_data
@@ -0,0 +1,221 @@
+import atexit
+import gzip
+import hashlib
+import os
+import threading
+import time
+from typing import NamedTuple
+
+from dedup_store import message_id_from_link
+from listing import listing_fragment
+from logScript import logger
+
+try:
+    import zstandard
+except ImportError:  # zstandard не установлен - сжимаем gzip
+    zstandard = None
+
+# Сохранять ли загруженные страницы сообщений и списка в архив
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "1") == "1"
+# Каталог архива: objects/<2 символа>/<sha256>.<кодек> и журнал index.tsv
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+# Сжатие: "zst" (если установлен zstandard) или "gz"
+ARCHIVE_CODEC = os.getenv("ARCHIVE_CODEC", "zst" if zstandard is not None else "gz")
+
+MESSAGE = "M"
+LISTING = "L"
+
+
+def _zstd_compress(data):
+    return zstandard.ZstdCompressor(level=10).compress(data)
+
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+CODECS = {"gz": (lambda data: gzip.compress(data, compresslevel=6), gzip.decompress)}
+if zstandard is not None:
+    CODECS["zst"] = (_zstd_compress, _zstd_decompress)
+
+if ARCHIVE_CODEC not in CODECS:
+    logger.warning(f"Сжатие {ARCHIVE_CODEC} недоступно, архив пишется в gzip.")
+    ARCHIVE_CODEC = "gz"
+
+
+class ArchiveEntry(NamedTuple):
+    """
+    Строка журнала архива. key - GUID сообщения (для страниц списка - sha256 таблицы).
+    """
+    kind: str
+    fetched_at: float
+    key: str
+    sha: str
+    codec: str
+    url: str
+
+
+class HtmlArchive:
+    """
+    Архив загруженных страниц с адресацией по содержимому.
+
+    Каждый уникальный HTML хранится один раз в сжатом виде под своим sha256, журнал index.tsv
+    (только дозапись) связывает GUID сообщения с последней версией его страницы:
+    "M<TAB>время<TAB>GUID<TAB>sha256<TAB>кодек<TAB>url". Для страниц списка хранится только
+    таблица сообщений, и строка "L<TAB>..." пишется, лишь когда таблица изменилась.
+    """
+
+    def __init__(self, path=ARCHIVE_DIR, codec=ARCHIVE_CODEC):
+        self.path = path
+        self.codec = codec
+        self.index_path = os.path.join(path, "index.tsv")
+        self._lock = threading.Lock()
+        self._messages = {}
+        self._listings = []
+        self._file = None
+
+        if os.path.exists(self.index_path):
+            self._load()
+
+    def _load(self):
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            for line in file:
+                if not line.endswith("\n"):
+                    logger.warning(f"Пропущена неполная строка в {self.index_path}")
+                    continue
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 6:
+                    continue
+                entry = ArchiveEntry(parts[0], float(parts[1]), *parts[2:])
+                if entry.kind == MESSAGE:
+                    self._messages[entry.key] = entry
+                elif entry.kind == LISTING:
+                    self._listings.append(entry)
+        logger.info(f"Архив {self.path}: сообщений {len(self._messages)}, страниц списка {len(self._listings)}.")
+
+    def __len__(self):
+        return len(self._messages)
+
+    def blob_path(self, sha, codec):
+        return os.path.join(self.path, "objects", sha[:2], f"{sha}.{codec}")
+
+    def _put_blob(self, data):
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha, self.codec)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(CODECS[self.codec][0](data))
+            os.replace(tmp_path, path)
+        return sha
+
+    def _append(self, entry):
+        if self._file is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._file = open(self.index_path, "a", encoding="utf-8")
+            atexit.register(self.close)
+        self._file.write("\t".join((entry.kind, f"{entry.fetched_at:.0f}", entry.key, entry.sha,
+                                    entry.codec, entry.url)) + "\n")
+        self._file.flush()
+
+    def store_message(self, url, html):
+        """
+        Сохраняет страницу сообщения под GUID из ссылки. Страница без GUID не сохраняется.
+        """
+        guid = message_id_from_link(url)
+        if guid is None:
+            logger.debug(f"В ссылке нет GUID сообщения, страница не архивируется: {url}")
+            return None
+        sha = self._put_blob(html.encode("utf-8"))
+        with self._lock:
+            current = self._messages.get(guid)
+            if current is None or current.sha != sha:
+                entry = ArchiveEntry(MESSAGE, time.time(), guid, sha, self.codec, url)
+                self._messages[guid] = entry
+                self._append(entry)
+        return sha
+
+    def store_listing(self, url, html):
+        """
+        Сохраняет таблицу сообщений страницы списка, если она отличается от последней сохранённой.
+        """
+        fragment = listing_fragment(html)
+        if fragment is None:
+            return None
+        data = fragment.encode("utf-8")
+        sha = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if self._listings and self._listings[-1].sha == sha:
+                return sha
+        self._put_blob(data)
+        with self._lock:
+            entry = ArchiveEntry(LISTING, time.time(), sha, sha, self.codec, url)
+            self._listings.append(entry)
+            self._append(entry)
+        return sha
+
+    def read(self, entry):
+        """
+        Возвращает HTML записи архива.
+        """
+        with open(self.blob_path(entry.sha, entry.codec), "rb") as file:
+            return CODECS[entry.codec][1](file.read()).decode("utf-8")
+
+    def messages(self):
+        """
+        Последняя версия каждой страницы сообщения: {GUID: ArchiveEntry}.
+        """
+        with self._lock:
+            return dict(self._messages)
+
+    def listings(self):
+        """
+        Сохранённые таблицы списка сообщений в порядке загрузки.
+        """
+        with self._lock:
+            return list(self._listings)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """
+    Общий архив процесса (создаётся при первом обращении).
+    """
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = HtmlArchive()
+        return _archive
+
+
+def archive_message(url, html):
+    """
+    Сохраняет страницу сообщения в архив. Ошибка архива не прерывает обработку сообщения.
+    """
+    if not ARCHIVE_ENABLED:
+        return
+    try:
+        get_archive().store_message(url, html)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить страницу {url} в архив: {e}")
+
+
+def archive_listing(url, html):
+    """
+    Сохраняет таблицу страницы списка сообщений в архив.
+    """
+    if not ARCHIVE_ENABLED:
+        return
+    try:
+        get_archive().store_listing(url, html)
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить страницу списка {url} в архив: {e}")
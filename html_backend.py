@@ -0,0 +1,206 @@
+import os
+from functools import partial
+
+from bs4 import BeautifulSoup
+
+from logScript import logger
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml не установлен - работаем только через BeautifulSoup
+    lxml = None
+
+# Разборщик HTML: "lxml" (быстрый, на C) или "bs4" (BeautifulSoup с html.parser)
+HTML_PARSER = os.getenv("HTML_PARSER", "lxml")
+
+
+class SoupDocument:
+    """
+    Документ на BeautifulSoup (html.parser). Эталонная реализация: прежний разбор был написан на ней.
+    """
+    name = "bs4"
+
+    def __init__(self, html):
+        self.root = BeautifulSoup(html, 'html.parser')
+
+    def find(self, tag, cls=None, root=None):
+        root = self.root if root is None else root
+        return root.find(tag, class_=cls) if cls else root.find(tag)
+
+    def find_all(self, tag, cls=None, root=None):
+        root = self.root if root is None else root
+        return root.find_all(tag, class_=cls) if cls else root.find_all(tag)
+
+    def rows(self, table):
+        return table.find_all('tr')
+
+    def cells(self, row, tag='td'):
+        return row.find_all(tag)
+
+    def text(self, element):
+        return element.text
+
+    def stripped_text(self, element):
+        """
+        Аналог get_text(strip=True): каждый фрагмент текста обрезается, фрагменты склеиваются без пробела.
+        """
+        return element.get_text(strip=True)
+
+    def first_href(self, element):
+        link = element.find('a')
+        return link['href'] if link else None
+
+    def table_data(self, table):
+        """
+        (заголовки th первой строки, ячейки td каждой строки) - тексты без пробелов по краям.
+        """
+        rows = table.find_all('tr')
+        header = [th.text.strip() for th in rows[0].find_all('th')] if rows else []
+        return header, [[td.text.strip() for td in row.find_all('td')] for row in rows]
+
+    def events(self):
+        """
+        Один проход по документу в порядке следования элементов, см. iter_events.
+        """
+        return iter_events(self, self.root.find_all(['h1', 'div', 'table']))
+
+    def tag(self, element):
+        return element.name
+
+    def classes(self, element):
+        return element.get('class') or ()
+
+    def single_string(self, element):
+        string = element.string
+        return str(string) if string is not None else None
+
+    def spans(self, element):
+        return [span.text.strip() for span in element.find_all('span')]
+
+
+class LxmlDocument:
+    """
+    Документ на lxml. Повторяет поведение SoupDocument там, где оно важно для разбора:
+    поиск по классу как по одному из классов элемента, строка div как .string у BeautifulSoup,
+    текст элементов без комментариев.
+    """
+    name = "lxml"
+
+    _xpath_cache = {}
+
+    def __init__(self, html):
+        # lxml не принимает str с объявлением кодировки XML
+        if isinstance(html, str) and html.lstrip().startswith('<?xml'):
+            html = html.encode('utf-8')
+        self.root = lxml.html.document_fromstring(html)
+
+    @classmethod
+    def _xpath(cls, tag, css_class):
+        key = (tag, css_class)
+        xpath = cls._xpath_cache.get(key)
+        if xpath is None:
+            expr = f".//{tag}"
+            if css_class:
+                expr += f"[contains(concat(' ', normalize-space(@class), ' '), ' {css_class} ')]"
+            xpath = cls._xpath_cache[key] = etree.XPath(expr)
+        return xpath
+
+    def find(self, tag, cls=None, root=None):
+        found = self._xpath(tag, cls)(self.root if root is None else root)
+        return found[0] if found else None
+
+    def find_all(self, tag, cls=None, root=None):
+        return self._xpath(tag, cls)(self.root if root is None else root)
+
+    def rows(self, table):
+        return list(table.iter('tr'))
+
+    def cells(self, row, tag='td'):
+        return list(row.iterdescendants(tag))
+
+    def text(self, element):
+        return "".join(element.itertext())
+
+    def stripped_text(self, element):
+        return "".join(part.strip() for part in element.itertext() if part.strip())
+
+    def first_href(self, element):
+        for link in element.iterdescendants('a'):
+            return link.attrib['href']
+        return None
+
+    def table_data(self, table):
+        rows = list(table.iter('tr'))
+        header = ["".join(th.itertext()).strip() for th in rows[0].iterdescendants('th')] if rows else []
+        return header, [["".join(td.itertext()).strip() for td in row.iterdescendants('td')] for row in rows]
+
+    def events(self):
+        # Отбор по тегу выполняется в lxml, в Python попадают только h1, div и table
+        return iter_events(self, self.root.iter('h1', 'div', 'table'))
+
+    def tag(self, element):
+        return element.tag
+
+    def classes(self, element):
+        css_class = element.get('class')
+        return css_class.split() if css_class else ()
+
+    def single_string(self, element):
+        # У BeautifulSoup .string есть только у элемента с одним дочерним узлом (рекурсивно)
+        while True:
+            if len(element) == 0:
+                return element.text
+            if len(element) > 1 or element.text or element[0].tail:
+                return None
+            element = element[0]
+
+    def spans(self, element):
+        return ["".join(span.itertext()).strip() for span in element.iter('span')]
+
+
+def iter_events(doc, elements):
+    """
+    Поток событий документа для разбора по схеме (message_schema):
+        ("title", текст)            - первый h1.red_small;
+        ("heading", текст)          - div с единственным текстовым узлом (подпись секции);
+        ("table", классы, загрузка) - каждая таблица; загрузка() -> (заголовки, строки);
+        ("msg", текст)              - каждый div.msg;
+        ("spans", [тексты])         - span внутри первого div.containerInfo.
+    elements - элементы h1, div и table в порядке документа.
+    """
+    title_seen = spans_seen = False
+    for element in elements:
+        tag = doc.tag(element)
+        classes = doc.classes(element)
+        if tag == 'table':
+            yield "table", classes, partial(doc.table_data, element)
+        elif tag == 'h1':
+            if not title_seen and 'red_small' in classes:
+                title_seen = True
+                yield "title", doc.text(element).strip(), None
+        else:
+            if 'msg' in classes:
+                yield "msg", doc.text(element).strip(), None
+            if not spans_seen and 'containerInfo' in classes:
+                spans_seen = True
+                yield "spans", doc.spans(element), None
+            heading = doc.single_string(element)
+            if heading is not None:
+                yield "heading", heading, None
+
+
+BACKENDS = {"bs4": SoupDocument}
+if lxml is not None:
+    BACKENDS["lxml"] = LxmlDocument
+
+if HTML_PARSER not in BACKENDS:
+    logger.warning(f"Разборщик HTML {HTML_PARSER} недоступен, используется BeautifulSoup.")
+    HTML_PARSER = "bs4"
+
+
+def parse_document(html, backend=None):
+    """
+    Разбирает HTML выбранным разборщиком (по умолчанию - HTML_PARSER).
+    """
+    return BACKENDS[backend or HTML_PARSER](html)
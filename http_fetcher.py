@@ -0,0 +1,134 @@
+import os
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from html_archive import archive_listing, archive_message
+from logScript import logger
+
+load_dotenv(dotenv_path='.env')
+
+BASE_URL = "https://old.bankrot.fedresurs.ru"
+MESSAGES_URL = f"{BASE_URL}/Messages.aspx"
+
+# Таймаут HTTP-запросов в секундах
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/131.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+}
+
+# Скрытые поля ASP.NET, которые нужно возвращать серверу при postback
+FORM_STATE_FIELDS = ("__VIEWSTATE", "__VIEWSTATEGENERATOR", "__EVENTVALIDATION")
+
+_hidden_input_re = re.compile(
+    r'<input[^>]+name="(__[A-Z]+)"[^>]*value="([^"]*)"', re.IGNORECASE
+)
+
+# Сессия хранится в потоке: у каждого потока свои cookie и свой viewstate
+_local = threading.local()
+
+
+def get_session():
+    """
+    Возвращает постоянную HTTP-сессию текущего потока (keep-alive, cookie ASP.NET).
+    """
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=1)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _local.session = session
+        _local.form_state = {}
+        logger.info("Создана новая HTTP-сессия.")
+    return session
+
+
+def reset_session():
+    """
+    Закрывает сессию текущего потока. Следующий запрос начнёт новую сессию с чистыми cookie.
+    """
+    session = getattr(_local, "session", None)
+    if session is not None:
+        session.close()
+    _local.session = None
+    _local.form_state = {}
+
+
+def extract_form_state(html):
+    """
+    Извлекает скрытые поля ASP.NET (__VIEWSTATE, __EVENTVALIDATION и т.д.) из HTML страницы.
+    """
+    state = {}
+    for name, value in _hidden_input_re.findall(html):
+        if name in FORM_STATE_FIELDS:
+            state[name] = value.replace("&amp;", "&")
+    return state
+
+
+def _decode(response):
+    # Сервер не всегда указывает кодировку, requests тогда подставляет ISO-8859-1
+    if not response.encoding or response.encoding.lower() == "iso-8859-1":
+        response.encoding = response.apparent_encoding
+    return response.text
+
+
+def _check_listing(html, url):
+    if 'class="bank"' not in html:
+        raise ValueError(f"Таблица сообщений не найдена в ответе {url}")
+
+
+def fetch_listing_html(url=MESSAGES_URL):
+    """
+    Загружает страницу списка сообщений обычным GET-запросом и запоминает состояние формы.
+    """
+    session = get_session()
+    response = session.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    html = _decode(response)
+    _check_listing(html, url)
+    _local.form_state = extract_form_state(html)
+    archive_listing(url, html)
+    return html
+
+
+def post_back(event_target, event_argument="", url=MESSAGES_URL):
+    """
+    Выполняет ASP.NET postback (например, переход по пагинации) с текущим viewstate сессии.
+    """
+    session = get_session()
+    if not getattr(_local, "form_state", None):
+        fetch_listing_html(url)
+
+    payload = dict(_local.form_state)
+    payload["__EVENTTARGET"] = event_target
+    payload["__EVENTARGUMENT"] = event_argument
+    response = session.post(url, data=payload, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    html = _decode(response)
+    _check_listing(html, url)
+    _local.form_state = extract_form_state(html)
+    archive_listing(url, html)
+    return html
+
+
+def fetch_message_html(url):
+    """
+    Загружает страницу сообщения по HTTP. Бросает исключение, если страница не похожа на сообщение.
+    """
+    session = get_session()
+    response = session.get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+    html = _decode(response)
+    if "red_small" not in html:
+        raise ValueError(f"Заголовок сообщения не найден в ответе {url}")
+    archive_message(url, html)
+    return html
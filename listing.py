@@ -0,0 +1,85 @@
+from dedup_store import legacy_message_id, message_id_from_link
+from html_backend import parse_document
+from records import ListingRow
+
+# Допустимые типы сообщений
+valid_message_types = {
+    'Сведения о заключении договора купли-продажи',
+    'Сообщение о результатах торгов',
+    'Объявление о проведении торгов',
+    'Отчет оценщика об оценке имущества должника',
+    'Сообщение об изменении объявления о проведении торгов',
+    'Сообщение об отмене сообщения об объявлении торгов или сообщения о результатах торгов'
+}
+
+
+# разбор строк таблицы сообщений
+def parse_listing_rows(html, backend=None):
+    """
+    Возвращает релевантные строки таблицы сообщений в порядке страницы (сверху вниз, от новых к старым)
+    в виде списка пар (msg_id, records.ListingRow).
+    """
+    doc = parse_document(html, backend)
+    table = doc.find('table', 'bank')
+
+    listing = []
+    # Находим строки таблицы сообщений
+    for row in doc.rows(table):
+        cells = doc.cells(row)
+        if len(cells) < 5:
+            continue
+
+        # Извлекаем данные из ячеек
+        date = doc.stripped_text(cells[0])
+        message_type = doc.stripped_text(cells[1])
+        debtor = doc.stripped_text(cells[2])
+        published_by = doc.stripped_text(cells[4])
+        link_messeges = doc.first_href(cells[1])
+        link_arbitr = doc.first_href(cells[4])
+        link_debtor = doc.first_href(cells[2])
+
+        # Проверка типа сообщения
+        if message_type in valid_message_types:
+            # Стабильный идентификатор - GUID из ссылки на сообщение
+            msg_id = message_id_from_link(link_messeges) or legacy_message_id(date, message_type, debtor)
+
+            listing.append((msg_id, ListingRow(
+                дата=date,
+                тип_сообщения=message_type,
+                должник=debtor,
+                должник_ссылка=f"https://old.bankrot.fedresurs.ru{link_debtor}" if link_debtor else "Нет ссылки",
+                арбитр=published_by,
+                арбитр_ссылка=f"https://old.bankrot.fedresurs.ru{link_arbitr}" if link_arbitr else "Нет ссылки",
+                сообщение_ссылка=f"https://old.bankrot.fedresurs.ru{link_messeges}" if link_messeges else "Нет ссылки",
+            )))
+    return listing
+
+
+def listing_fragment(html):
+    """
+    Вырезает из страницы списка таблицу сообщений table.bank (вместе с вложенными таблицами пагинации).
+    Остальная страница (viewstate, счётчики) меняется при каждой загрузке и для разбора не нужна.
+    :return: HTML таблицы или None, если таблицы нет.
+    """
+    marker = html.find('class="bank"')
+    if marker == -1:
+        return None
+    start = html.rfind('<table', 0, marker)
+    if start == -1:
+        return None
+
+    depth = 0
+    pos = start
+    while True:
+        opening = html.find('<table', pos)
+        closing = html.find('</table>', pos)
+        if closing == -1:
+            return html[start:]
+        if opening != -1 and opening < closing:
+            depth += 1
+            pos = opening + len('<table')
+        else:
+            depth -= 1
+            pos = closing + len('</table>')
+            if depth == 0:
+                return html[start:pos]
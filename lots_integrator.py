@@ -1,8 +1,12 @@
 import asyncio
+import atexit
+import threading
+
 from logScript import logger
 import os
 
 from dotenv import load_dotenv
+from entity_cache import DEBTOR, get_entity_cache
 from sqlalchemy import MetaData, Table, exists
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -19,27 +23,55 @@ db_port = os.getenv("DB_PORT")
 
 db_url = f"postgresql+asyncpg://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
 
+# Размер пула соединений движка сервиса лотов (и сколько соединений можно открыть сверх него)
+LOTS_DB_POOL_SIZE = int(os.getenv("LOTS_DB_POOL_SIZE", "5"))
+LOTS_DB_MAX_OVERFLOW = int(os.getenv("LOTS_DB_MAX_OVERFLOW", "5"))
+
 def get_engine():
-    return create_async_engine(db_url, echo=False)
+    # pool_pre_ping: движок живёт всё время работы, соединения в его пуле могут устареть
+    return create_async_engine(db_url, echo=False, pool_size=LOTS_DB_POOL_SIZE,
+                               max_overflow=LOTS_DB_MAX_OVERFLOW, pool_pre_ping=True)
 
 def get_session_maker(engine):
     return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+
+class TableCache:
+    """
+    Таблицы, описание которых один раз получено из БД (reflection) и дальше берётся из памяти.
+    """
+
+    def __init__(self):
+        self.metadata = MetaData()
+        self._lock = asyncio.Lock()
+
+    async def get(self, session, name):
+        if name in self.metadata.tables:
+            return self.metadata.tables[name]
+        async with self._lock:
+            if name not in self.metadata.tables:
+                conn = await session.connection()
+                await conn.run_sync(lambda sync_conn: Table(name, self.metadata, autoload_with=sync_conn))
+            return self.metadata.tables[name]
+
+
 # Проверка должников и лотов
-async def check_debtor(lots_data, session_maker):
-    metadata = MetaData()
-    async with session_maker() as session:
-        async with session.begin():
-            conn = await session.connection()
-            await conn.run_sync(metadata.reflect)
-            dolzhnik = Table('dolzhnik', metadata, autoload_with=conn)
+async def check_debtor(lots_data, session_maker, tables):
+    debtor_inn = lots_data.get("ИНН_Должника")
 
+    if not debtor_inn:
+        logger.error(f"ИНН должника отсутствует в данных лота: {lots_data}")
+        return None
 
-            debtor_inn = lots_data.get("ИНН_Должника")
+    # Должник сообщения обычно уже записан au_debtorsDetecting и есть в кэше: запрос к БД не нужен
+    cache = get_entity_cache()
+    if cache.known(DEBTOR, debtor_inn):
+        logger.info(f"Должник с ИНН {debtor_inn} из лота найден в кэше.")
+        return lots_data
 
-            if not debtor_inn:
-                logger.error(f"ИНН должника отсутствует в данных лота: {lots_data}")
-                return None
+    async with session_maker() as session:
+        async with session.begin():
+            dolzhnik = await tables.get(session, 'dolzhnik')
 
             debtor_exists = await session.execute(
                 exists().where(dolzhnik.c.Инн_Должника == debtor_inn).select()
@@ -50,6 +82,7 @@ async def check_debtor(lots_data, session_maker):
                 logger.warning(f"Должник с ИНН {debtor_inn} из лота отсутствует в базе данных.")
                 return None
 
+            cache.add(DEBTOR, debtor_inn)
             logger.info(f"Должник с ИНН {debtor_inn} из лота найден в базе данных.")
             return lots_data
 
@@ -375,12 +408,9 @@ async def process_data_evaluation(data_list, session_maker):
                 await session.rollback()
 
 # Основная функция выбора логики обработки данных
-async def main(data_list):
-    engine = get_engine()
-    session_maker = get_session_maker(engine)
-
+async def main(data_list, session_maker, tables):
     for data in data_list:
-        ckecking_dolzhnic = await check_debtor(data, session_maker)
+        ckecking_dolzhnic = await check_debtor(data, session_maker, tables)
 
         if ckecking_dolzhnic is None:
             continue
@@ -401,7 +431,69 @@ async def main(data_list):
         else:
             logger.warning(f"Неизвестное значение 'вид_торгов': {massage_type}. Пропускаем запись.")
 
+
+class LotsService:
+    """
+    Сравнение лотов в отдельном потоке с постоянным циклом событий.
+
+    Движок (и его пул соединений asyncpg) и описания таблиц создаются один раз и живут до close().
+    submit можно вызывать из любого потока: работа передаётся в цикл через run_coroutine_threadsafe.
+    """
+
+    def __init__(self, engine_factory=get_engine):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="LotsServiceThread")
+        self._thread.start()
+        self._closed = False
+        self.engine = self._call(self._start(engine_factory))
+
+    async def _start(self, engine_factory):
+        engine = engine_factory()
+        self._session_maker = get_session_maker(engine)
+        self._tables = TableCache()
+        return engine
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def submit(self, data_list):
+        """
+        Ставит строки лотов сообщения в работу. Возвращает concurrent.futures.Future.
+        """
+        if self._closed:
+            raise RuntimeError("Сервис сравнения лотов остановлен")
+        return asyncio.run_coroutine_threadsafe(main(data_list, self._session_maker, self._tables), self._loop)
+
+    def close(self):
+        """
+        Закрывает соединения движка и останавливает цикл событий.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._call(self.engine.dispose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_lots_service():
+    """
+    Общий сервис сравнения лотов процесса. Создаётся при первом обращении и закрывается при выходе.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = LotsService()
+            atexit.register(_service.close)
+        return _service
+
+
 def lots_analyze(data):
    logger.info("Начинаем сравнение лотов.")
-   asyncio.run(main(data))
+   get_lots_service().submit(data).result()
    logger.info("Лоты сравнены.")
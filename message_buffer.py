@@ -0,0 +1,224 @@
+import atexit
+import os
+import signal
+import threading
+import time
+
+import psycopg2
+from psycopg2 import InterfaceError, OperationalError
+from psycopg2.extras import execute_values
+
+from DBManager import INSERT_MESSAGES_BATCH_QUERY
+from db_pool import db_connection, get_db_pool
+from logScript import logger
+from records import MESSAGE_COLUMNS
+
+# Сколько подготовленных сообщений копить перед записью в messages одним запросом (1 - писать сразу).
+# Сообщения в буфере уже помечены проверенными: при аварийном завершении (SIGKILL, сбой питания)
+# теряется не больше одной пачки, поэтому пачка небольшая и ограничена по времени
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "20"))
+# Сколько секунд сообщение может ждать в буфере, если пачка не набирается
+MESSAGE_BATCH_MAX_AGE = float(os.getenv("MESSAGE_BATCH_MAX_AGE", "2"))
+
+_MESSAGE_NUMBER = MESSAGE_COLUMNS.index("номер_сообщения")
+# Цель ON CONFLICT запроса записи (migrations/001_unique_entity_inn.sql), проверяется при старте
+UPSERT_TARGETS = (("messages", "номер_сообщения"),)
+
+
+def insert_rows(rows):
+    """
+    Записывает строки (Message.params) одним INSERT на несколько строк. Сообщения, номер которых
+    уже есть в таблице (или повторяется в пачке), пропускаются самим запросом. Возвращает число вставленных.
+    """
+    with db_connection() as conn, conn.cursor() as cursor:
+        inserted = execute_values(cursor, INSERT_MESSAGES_BATCH_QUERY, rows, page_size=len(rows), fetch=True)
+        conn.commit()
+    return len(inserted)
+
+
+class WriteStats:
+    """
+    Записи пачками в messages: сколько пачек и строк, сколько вставлено, пропущено как дубликаты,
+    не записано из-за ошибки и возвращено в буфер при недоступной БД.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.requeued = 0
+        self.flush_time = 0.0
+
+    def record_flush(self, rows, inserted, failed, elapsed):
+        with self._lock:
+            self.flushes += 1
+            self.rows += rows
+            self.inserted += inserted
+            self.failed += failed
+            self.flush_time += elapsed
+
+    def record_requeue(self, rows):
+        with self._lock:
+            self.requeued += rows
+
+    def summary(self):
+        with self._lock:
+            return {
+                "flushes": self.flushes,
+                "rows": self.rows,
+                "inserted": self.inserted,
+                "duplicates": self.rows - self.inserted - self.failed,
+                "failed": self.failed,
+                "requeued": self.requeued,
+                "rows_per_flush": self.rows / self.flushes if self.flushes else 0.0,
+                "flush_mean": self.flush_time / self.flushes if self.flushes else 0.0,
+            }
+
+
+class MessageWriteBuffer:
+    """
+    Отложенная запись сообщений в messages: подготовленные строки копятся и записываются одним запросом,
+    когда их набралось batch_size или самая старая ждёт дольше max_age секунд.
+
+    Пачки пишутся по одной и в порядке поступления. Если БД недоступна, пачка возвращается в начало буфера
+    и записывается при следующей попытке; если запрос отклонён из-за данных, строки пишутся по одной,
+    чтобы одна ошибочная строка не потянула за собой остальные. Остаток буфера записывается при выходе.
+    """
+
+    def __init__(self, batch_size=MESSAGE_BATCH_SIZE, max_age=MESSAGE_BATCH_MAX_AGE, insert=insert_rows):
+        self.batch_size = max(1, batch_size)
+        self.max_age = max_age
+        self.stats = WriteStats()
+        self._insert = insert
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._rows = []
+        self._oldest = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._flush_by_age, daemon=True, name="MessageWriteBufferThread")
+        self._thread.start()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._rows)
+
+    def add(self, message):
+        """
+        Ставит подготовленное сообщение (records.Message) в очередь на запись.
+        """
+        with self._cond:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._rows.append(message.params())
+            # После close (завершение процесса) записываем сразу: запись по времени уже остановлена
+            full = len(self._rows) >= self.batch_size or self._closed
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Записывает всё, что накопилось в буфере.
+        """
+        with self._flush_lock:
+            with self._cond:
+                rows, self._rows, self._oldest = self._rows, [], None
+            if rows:
+                self._write(rows)
+
+    def _flush_by_age(self):
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._oldest is not None:
+                        left = self.max_age - (time.monotonic() - self._oldest)
+                        if left <= 0:
+                            break
+                    else:
+                        left = None
+                    self._cond.wait(left)
+                if self._closed:
+                    return
+            self.flush()
+
+    def _write(self, rows):
+        started = time.perf_counter()
+        failed = 0
+        try:
+            inserted = self._insert(rows)
+        except (OperationalError, InterfaceError, TimeoutError) as e:
+            logger.error(f"Не удалось записать {len(rows)} сообщений, повторим позже: {e}")
+            self.stats.record_requeue(len(rows))
+            with self._cond:
+                self._rows[:0] = rows
+                self._oldest = time.monotonic()
+            return
+        except psycopg2.Error as e:
+            logger.warning(f"Пачка из {len(rows)} сообщений отклонена ({e}), записываем по одному")
+            inserted = 0
+            for row in rows:
+                try:
+                    inserted += self._insert([row])
+                except psycopg2.Error as row_error:
+                    failed += 1
+                    logger.error(f"Сообщение {row[_MESSAGE_NUMBER]} не записано: {row_error}")
+        self.stats.record_flush(len(rows), inserted, failed, time.perf_counter() - started)
+        logger.info(f"Записано сообщений: {inserted} из {len(rows)}")
+
+    def close(self):
+        """
+        Останавливает запись по времени и записывает остаток буфера.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+        left = len(self)
+        if left:
+            logger.error(f"При завершении не записано сообщений: {left}")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_message_buffer():
+    """
+    Общий буфер записи сообщений процесса. Остаток буфера записывается при выходе -
+    до закрытия пула соединений (пул создаётся раньше, поэтому закрывается позже).
+    """
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            get_db_pool()
+            _buffer = MessageWriteBuffer()
+            atexit.register(_buffer.close)
+        return _buffer
+
+
+def _exit_on_signal(signum, frame):
+    logger.info(f"Получен сигнал {signal.Signals(signum).name}: записываем буфер сообщений и завершаем работу")
+    raise SystemExit(128 + signum)
+
+
+def install_shutdown_handlers():
+    """
+    SIGTERM и SIGINT завершают процесс через SystemExit: стек главного потока сворачивается,
+    и обработчики atexit записывают остаток буфера до закрытия пула соединений.
+    Без этого при остановке сервиса (SIGTERM) atexit не выполняется и пачка теряется.
+    Вызывается из главного потока при старте.
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, _exit_on_signal)
+
+
+def message_buffer_summary():
+    """
+    Метрики общего буфера (WriteStats.summary) с числом ожидающих записи или None, если буфер не создавался.
+    """
+    if _buffer is None:
+        return None
+    return {**_buffer.stats.summary(), "pending": len(_buffer)}
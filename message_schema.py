@@ -0,0 +1,338 @@
+# Разбор страницы сообщения по декларативной схеме.
+# Каждый тип сообщения описывает свои секции: откуда взять таблицу (по классу или по подписи
+# секции перед ней) и как превратить её строки в поля. Схема компилируется один раз при импорте,
+# документ просматривается один раз (поток событий html_backend.iter_events), после чего
+# к найденным таблицам применяются правила типа сообщения.
+# Таблица лотов попадает в результат как records.LotTable под ключом 'лоты'.
+from typing import NamedTuple
+
+from logScript import logger
+from records import LOT_SEPARATOR, Lot, LotTable
+
+
+class Anchor(NamedTuple):
+    """
+    Где искать таблицу: kind = "class" (table с классом), "heading" (первая таблица после div
+    с точно такой подписью) или "heading_contains" (после div, подпись которого содержит value).
+    """
+    kind: str
+    value: str
+
+
+def by_class(css_class):
+    return Anchor("class", css_class)
+
+
+def after_heading(text):
+    return Anchor("heading", text)
+
+
+def after_heading_containing(text):
+    return Anchor("heading_contains", text)
+
+
+class FieldTable(NamedTuple):
+    """
+    Таблица "поле | значение": каждая строка из двух ячеек даёт поле словаря.
+    """
+    anchor: Anchor
+
+    def apply(self, data, page):
+        table = page.table(self.anchor)
+        if table is None:
+            return
+        for cells in table[1]:
+            if len(cells) == 2:
+                data[cells[0]] = cells[1]
+
+
+class FirstField(NamedTuple):
+    """
+    Значение первой строки таблицы с полем field записывается в поле target.
+    """
+    anchor: Anchor
+    field: str
+    target: str
+
+    def apply(self, data, page):
+        table = page.table(self.anchor)
+        if table is None:
+            logger.warning(f"Секция '{self.anchor.value}' не найдена.")
+            return
+        for cells in table[1]:
+            if len(cells) == 2 and cells[0] == self.field:
+                data[self.target] = cells[1]
+                break
+
+
+class ColumnTable(NamedTuple):
+    """
+    Таблица лотов с колонками по позиции: columns = ((поле лота, номер колонки), ...).
+    Первая строка - заголовок, строки короче min_cells пропускаются.
+    """
+    anchor: Anchor
+    columns: tuple
+    min_cells: int
+
+    def apply(self, data, page):
+        table = page.table(self.anchor)
+        if table is None:
+            return
+        lots = [Lot(**{field: cells[index] for field, index in self.columns})
+                for cells in table[1][1:] if len(cells) >= self.min_cells]
+        data['лоты'] = LotTable(tuple((field, LOT_SEPARATOR) for field, _ in self.columns), lots)
+
+
+class HeaderTable(NamedTuple):
+    """
+    Таблица лотов с колонками по заголовку: columns = ((поле лота, заголовок колонки), ...).
+    Номера колонок вычисляются по набору заголовков и кэшируются: у таблиц lotInfo
+    всего несколько вариантов шапки.
+    """
+    anchor: Anchor
+    columns: tuple
+    index_cache: dict
+
+    def _indexes(self, header):
+        signature = tuple(header)
+        indexes = self.index_cache.get(signature)
+        if indexes is None:
+            indexes = tuple((key, header.index(title) if title in header else None) for key, title in self.columns)
+            if len(self.index_cache) < 256:
+                self.index_cache[signature] = indexes
+        return indexes
+
+    def apply(self, data, page):
+        table = page.table(self.anchor)
+        if table is None:
+            return
+        header, rows = table
+        # Колонки без заголовка в таблице остаются у лотов пустыми (None)
+        indexes = [(field, index) for field, index in self._indexes(header) if index is not None]
+        lots = [Lot(**{field: cells[index] if index < len(cells) else "" for field, index in indexes})
+                for cells in rows[1:]]
+        data['лоты'] = LotTable(tuple((field, LOT_SEPARATOR) for field, _ in self.columns), lots)
+
+
+class RecordTable(NamedTuple):
+    """
+    Лоты, записанные строками "поле | значение" друг за другом (договоры купли-продажи).
+    Лот заканчивается, когда заполнено поле terminator.
+    outputs = ((поле лота, поле таблицы, разделитель в прежнем строковом виде), ...).
+    first_defaults - начальные значения полей первого лота.
+    """
+    anchor: Anchor
+    fields: tuple
+    terminator: str
+    outputs: tuple
+    first_defaults: tuple
+
+    def apply(self, data, page):
+        table = page.table(self.anchor)
+        if table is None:
+            logger.debug(f"Секция '{self.anchor.value}' не найдена")
+            return
+        lots = []
+        current = dict.fromkeys(self.fields, '')
+        current.update(self.first_defaults)
+
+        for cells in table[1]:
+            if len(cells) >= 2 and cells[0] in current:
+                current[cells[0]] = cells[1] if cells[1] else ' '
+
+            if current[self.terminator]:
+                lots.append(Lot(**{key: current[field] for key, field, _ in self.outputs}))
+                current = dict.fromkeys(self.fields, '')
+
+        # Последний лот без поля terminator
+        if any(value != '' for value in current.values()):
+            lots.append(Lot(**{key: current[field] if current[field].strip() else ' '
+                               for key, field, _ in self.outputs}))
+
+        data['лоты'] = LotTable(tuple((key, separator) for key, _, separator in self.outputs), lots)
+
+
+class MessageText(NamedTuple):
+    """
+    Текст сообщения из div.msg: все непустые блоки через "; " или только последний блок.
+    """
+    last_only: bool = False
+
+    def apply(self, data, page):
+        if self.last_only:
+            data['текст'] = page.messages[-1] if page.messages else ""
+        else:
+            data['текст'] = "; ".join(text for text in page.messages if text)
+
+
+class SpanGroups(NamedTuple):
+    """
+    Span первого div.containerInfo, разложенные по полям: groups = ((поле, подстрока), ...).
+    Span попадает в первую группу, подстрока которой в нём есть.
+    """
+    groups: tuple
+
+    def apply(self, data, page):
+        if page.spans is None:
+            return
+        values = {key: [] for key, _ in self.groups}
+        for text in page.spans:
+            for key, marker in self.groups:
+                if marker in text:
+                    values[key].append(text)
+                    break
+        data.update({key: LOT_SEPARATOR.join(items) for key, items in values.items()})
+
+
+# Секции, общие для всех сообщений
+COMMON_RULES = (
+    FieldTable(by_class("headInfo")),
+    FieldTable(after_heading("Должник")),
+    FieldTable(after_heading("Кем опубликовано")),
+)
+
+# Типы сообщений: (подстроки заголовка, правила). Проверяются по порядку, берётся первый подходящий.
+MESSAGE_TYPES = (
+    (("Сообщение об отмене сообщения об объявлении торгов или сообщения о результатах торгов",), (
+        FirstField(after_heading("Публикуемые сведения"), "Отмененное сообщение", "Объявление о проведении торгов"),
+    )),
+    (("Сведения о заключении договора",), (
+        FieldTable(after_heading("Публикуемые сведения")),
+        RecordTable(
+            after_heading_containing("Заключенные договоры"),
+            fields=("Номер лота", "Описание", "Сведения о заключении договора", "Номер договора",
+                    "Дата заключения договора", "Цена приобретения имущества, руб.", "Наименование покупателя"),
+            terminator="Наименование покупателя",
+            outputs=(
+                ("number", "Номер лота", LOT_SEPARATOR),
+                ("description", "Описание", LOT_SEPARATOR),
+                ("contract_info", "Сведения о заключении договора", LOT_SEPARATOR),
+                ("contract_number", "Номер договора", LOT_SEPARATOR),
+                ("contract_date", "Дата заключения договора", LOT_SEPARATOR),
+                ("price", "Цена приобретения имущества, руб.", LOT_SEPARATOR),
+                ("buyer", "Наименование покупателя", " "),
+            ),
+            first_defaults=(("Описание", ' '),),
+        ),
+        MessageText(last_only=True),
+    )),
+    (("Сообщение о результатах торгов",), (
+        MessageText(),
+        ColumnTable(by_class("lotInfo"), columns=(
+            ("number", 0), ("description", 1), ("buyer", 2), ("price", 3), ("classification", 4),
+        ), min_cells=5),
+    )),
+    (("Объявление о проведении торгов", "Сообщение об изменении"), (
+        FieldTable(after_heading("Публикуемые сведения")),
+        MessageText(),
+        HeaderTable(by_class("lotInfo"), columns=(
+            ("number", 'Номер лота'),
+            ("description", 'Описание'),
+            ("price", 'Начальная цена, руб'),
+            ("classification", 'Классификация имущества'),
+        ), index_cache={}),
+        SpanGroups(groups=(
+            ('Сведения о заключении договора купли-продажи', "Сведения о заключении договора купли-продажи"),
+            ('Сообщение о результатах торгов', "Сообщение о результатах торгов"),
+        )),
+    )),
+    (("Отчет оценщика об оценке",), (
+        ColumnTable(after_heading("Сведения об объектах оценки"), columns=(
+            ("classification", 0), ("description", 1), ("valuation_date", 2), ("price", 3),
+            ("book_value", 4),
+        ), min_cells=5),
+        MessageText(),
+    )),
+)
+
+
+class CompiledSchema:
+    """
+    Все якоря схемы, собранные в словари для поиска за один проход.
+    """
+
+    def __init__(self, common_rules, message_types):
+        self.common_rules = common_rules
+        self.message_types = message_types
+        anchors = {rule.anchor for rule in common_rules if hasattr(rule, "anchor")}
+        for _, rules in message_types:
+            anchors.update(rule.anchor for rule in rules if hasattr(rule, "anchor"))
+        self.classes = {a.value: a for a in anchors if a.kind == "class"}
+        self.headings = {a.value: a for a in anchors if a.kind == "heading"}
+        self.heading_parts = tuple(a for a in anchors if a.kind == "heading_contains")
+
+    def rules_for(self, title):
+        for markers, rules in self.message_types:
+            if any(marker in title for marker in markers):
+                return rules
+        return ()
+
+
+SCHEMA = CompiledSchema(COMMON_RULES, MESSAGE_TYPES)
+
+
+class Page:
+    """
+    Результат одного прохода по документу: заголовок, таблицы по якорям, тексты div.msg, span.
+    """
+
+    def __init__(self, events, schema=SCHEMA):
+        self.title = None
+        self.messages = []
+        self.spans = None
+        self._tables = {}
+        waiting = []
+        seen_headings = set()
+
+        for kind, value, extra in events:
+            if kind == "table":
+                # Таблица достаётся всем подписям, которые ждут "следующую таблицу"
+                for anchor in waiting:
+                    self._tables[anchor] = extra
+                waiting.clear()
+                for css_class in value:
+                    anchor = schema.classes.get(css_class)
+                    if anchor is not None and anchor not in self._tables:
+                        self._tables[anchor] = extra
+            elif kind == "heading":
+                # Как и при поиске find по строке, учитывается только первый div с подписью
+                anchor = schema.headings.get(value)
+                if anchor is not None and anchor not in seen_headings:
+                    seen_headings.add(anchor)
+                    waiting.append(anchor)
+                for anchor in schema.heading_parts:
+                    if anchor not in seen_headings and anchor.value in value:
+                        seen_headings.add(anchor)
+                        waiting.append(anchor)
+            elif kind == "msg":
+                self.messages.append(value)
+            elif kind == "title":
+                self.title = value
+            elif kind == "spans":
+                self.spans = value
+
+    def table(self, anchor):
+        """
+        (заголовки, строки) таблицы по якорю или None. Ячейки таблицы извлекаются при первом обращении.
+        """
+        table = self._tables.get(anchor)
+        if callable(table):
+            table = self._tables[anchor] = table()
+        return table
+
+
+def extract_message(events, schema=SCHEMA):
+    """
+    Заполняет словарь полей сообщения по схеме из потока событий страницы.
+    :return: словарь полей или None, если на странице нет заголовка сообщения.
+    """
+    page = Page(events, schema)
+    if page.title is None:
+        return None
+
+    data = {}
+    for rule in schema.common_rules:
+        rule.apply(data, page)
+    for rule in schema.rules_for(page.title):
+        rule.apply(data, page)
+    return data
@@ -0,0 +1,21 @@
+-- Уникальные индексы, на которые опираются запросы INSERT ... ON CONFLICT:
+--   arbitr_managers(ИНН_АУ), dolzhnik(Инн_Должника) - fioDETECTING.UPSERT_QUERIES;
+--   messages(номер_сообщения) - DBManager.INSERT_MESSAGES_BATCH_QUERY.
+-- Без них каждый такой запрос падает с ошибкой
+-- "there is no unique or exclusion constraint matching the ON CONFLICT specification",
+-- поэтому Main_parser проверяет их при старте (db_pool.require_unique_indexes) и не запускается.
+--
+-- Индекс не создастся, если в таблице уже есть повторы. Найти их:
+--   SELECT ИНН_АУ, count(*) FROM arbitr_managers GROUP BY ИНН_АУ HAVING count(*) > 1;
+--   SELECT Инн_Должника, count(*) FROM dolzhnik GROUP BY Инн_Должника HAVING count(*) > 1;
+--   SELECT номер_сообщения, count(*) FROM messages GROUP BY номер_сообщения HAVING count(*) > 1;
+-- Повторы нужно разобрать вручную (история изменений остаётся в arbitr_previos и debtors_previos).
+-- Оставить только самую раннюю строку каждого ИНН, например:
+--   DELETE FROM arbitr_managers a USING arbitr_managers b WHERE a.ИНН_АУ = b.ИНН_АУ AND a.ctid > b.ctid;
+--   DELETE FROM dolzhnik a USING dolzhnik b WHERE a.Инн_Должника = b.Инн_Должника AND a.ctid > b.ctid;
+--
+-- CONCURRENTLY не блокирует запись, но не выполняется внутри транзакции: запускать через psql без -1.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS arbitr_managers_inn_au_key ON arbitr_managers (ИНН_АУ);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS dolzhnik_inn_key ON dolzhnik (Инн_Должника);
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS messages_message_number_key ON messages (номер_сообщения);
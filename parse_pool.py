@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from logScript import logger
+
+# Количество процессов разбора HTML (0 - разбирать в вызывающем потоке)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Сколько страниц может ждать разбора одновременно: submit блокируется, пока не освободится место
+PARSE_MAX_IN_FLIGHT = int(os.getenv("PARSE_MAX_IN_FLIGHT", str(2 * max(1, PARSE_WORKERS))))
+# Способ запуска процессов. fork в процессе с потоками (браузеры, запись пачками, слушатель уведомлений)
+# копирует чужие захваченные блокировки, и процесс разбора может зависнуть - поэтому fork не используется.
+# forkserver порождает процессы из отдельного однопоточного сервера, который один раз импортирует
+# модули разбора (_FORKSERVER_PRELOAD); при "spawn" каждый процесс импортирует их заново
+PARSE_START_METHOD = os.getenv("PARSE_START_METHOD",
+                               "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+if PARSE_START_METHOD == "fork":
+    logger.warning("PARSE_START_METHOD=fork небезопасен в многопоточном процессе, используется forkserver/spawn.")
+    PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Главный модуль не загружается заранее: процессам разбора нужны только parsing и listing
+_FORKSERVER_PRELOAD = ["parsing", "listing"]
+
+# Небольшая страница для прогрева процесса: импорт модулей разбора, XPath и индексы схемы
+_WARM_UP_HTML = (
+    '<html><body><h1 class="red_small">Объявление о проведении торгов</h1>'
+    '<table class="headInfo"><tr><td>№ сообщения</td><td>1</td></tr></table>'
+    '<div class="msg">текст</div>'
+    '<table class="lotInfo"><tr><th>Номер лота</th><th>Описание</th></tr><tr><td>1</td><td>лот</td></tr></table>'
+    '<table class="bank"><tr><td>01.01.2024 00:00:00</td><td>тип</td><td>должник</td><td></td><td>АУ</td></tr>'
+    '</table></body></html>'
+)
+
+
+def _warm_up():
+    from listing import parse_listing_rows
+    from parsing import parse_message_html
+    parse_message_html(_WARM_UP_HTML)
+    parse_listing_rows(_WARM_UP_HTML)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _parse_message(data, url, backend):
+    from parsing import parse_message_html
+    return parse_message_html(data.decode("utf-8"), url, backend)
+
+
+def _parse_listing(data, backend):
+    from listing import parse_listing_rows
+    return parse_listing_rows(data.decode("utf-8"), backend)
+
+
+class ParsePool:
+    """
+    Разбор HTML в отдельных процессах: поток, управляющий браузером, отдаёт страницу (байты UTF-8)
+    и сразу переходит к следующей, а разбор идёт на других ядрах.
+
+    Число страниц в работе ограничено max_in_flight. Если процесс разбора упал, пул пересоздаётся.
+    """
+
+    def __init__(self, workers=PARSE_WORKERS, max_in_flight=PARSE_MAX_IN_FLIGHT, start_method=PARSE_START_METHOD):
+        self.workers = workers
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._executor = None
+        self.submitted = 0
+        self.failed = 0
+        self.restarts = 0
+        self.slot_wait = 0.0
+        if workers > 0:
+            self._executor = self._create_executor()
+            self.warm_up()
+
+    def _create_executor(self):
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            context.set_forkserver_preload(_FORKSERVER_PRELOAD)
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=_warm_up)
+
+    def warm_up(self):
+        """
+        Запускает все процессы заранее, чтобы первая страница не ждала импорта модулей.
+        """
+        started = time.monotonic()
+        pids = {future.result() for future in [self._executor.submit(_ping) for _ in range(self.workers)]}
+        logger.info(f"Пул разбора HTML: {len(pids)} процессов готовы за {time.monotonic() - started:.2f} с.")
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is not broken:
+                return
+            logger.error("Процесс разбора HTML завершился аварийно, пул разбора пересоздаётся.")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._create_executor()
+            self.restarts += 1
+
+    def _release(self, future):
+        self._slots.release()
+        if future.cancelled() or future.exception() is not None:
+            with self._lock:
+                self.failed += 1
+
+    def submit(self, fn, *args):
+        """
+        Отправляет задачу в пул. Ждёт, если в работе уже max_in_flight страниц.
+        """
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        started = time.monotonic()
+        self._slots.acquire()
+        waited = time.monotonic() - started
+        try:
+            for attempt in range(2):
+                executor = self._executor
+                try:
+                    future = executor.submit(fn, *args)
+                    break
+                except BrokenProcessPool:
+                    if attempt:
+                        raise
+                    self._restart(executor)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.submitted += 1
+            self.slot_wait += waited
+        future.add_done_callback(self._release)
+        return future
+
+    def parse_message(self, html, url='', backend=None):
+        """
+        Разбор страницы сообщения (parse_message_html). Возвращает Future со словарём полей.
+        """
+        return self.submit(_parse_message, html.encode("utf-8"), url, backend)
+
+    def parse_listing(self, html, backend=None):
+        """
+        Разбор страницы списка сообщений (parse_listing_rows). Возвращает Future со строками списка.
+        """
+        return self.submit(_parse_listing, html.encode("utf-8"), backend)
+
+    def metrics(self):
+        with self._lock:
+            return {"submitted": self.submitted, "failed": self.failed,
+                    "restarts": self.restarts, "slot_wait": self.slot_wait}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """
+    Общий пул разбора процесса. Создаётся и прогревается при первом обращении.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParsePool()
+        return _pool
@@ -0,0 +1,213 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from queue import Queue
+
+from DBManager import prepare_data_for_db
+from change_detection import change_stats
+from db_pool import db_pool_summary
+from entity_cache import entity_cache_summary
+from detecting import persist_message
+from filter_rules import filter_stats
+from http_fetcher import fetch_message_html
+from logScript import logger
+from message_buffer import message_buffer_summary
+from parse_pool import PARSE_MAX_IN_FLIGHT, get_parse_pool
+from parsing import load_message_html
+from waits import wait_stats
+from webdriver import acquire_driver, get_driver_pool
+
+# Размер очереди перед каждой стадией и количество потоков стадий
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "200"))
+PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "4"))
+# Сколько сообщений может быть в конвейере одновременно (от submit до записи): submit ждёт, пока
+# не освободится место. Так ограничен и буфер упорядоченной стадии, где ждут результаты после медленного номера
+PIPELINE_MAX_IN_FLIGHT = int(os.getenv("PIPELINE_MAX_IN_FLIGHT", str(PIPELINE_QUEUE_SIZE)))
+# Потоки стадии разбора только передают страницы в пул процессов (parse_pool) и ждут результат
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", str(PARSE_MAX_IN_FLIGHT)))
+# Как часто писать в лог состояние стадий (в секундах)
+PIPELINE_METRICS_INTERVAL = float(os.getenv("PIPELINE_METRICS_INTERVAL", "60"))
+
+
+class Stage:
+    """
+    Стадия конвейера: ограниченная очередь и свои потоки-обработчики.
+
+    Элементы идут с порядковым номером. Если обработка упала, дальше передаётся None,
+    чтобы упорядоченная стадия не ждала пропавший номер. Упорядоченная стадия (ordered=True)
+    работает в одном потоке и обрабатывает элементы строго по возрастанию номера.
+    done - вызывается после каждого элемента последней стадии (освобождает место в конвейере).
+    """
+
+    def __init__(self, name, handler, workers=1, maxsize=PIPELINE_QUEUE_SIZE, ordered=False):
+        self.name = name
+        self.handler = handler
+        self.workers = 1 if ordered else workers
+        self.ordered = ordered
+        self.queue = Queue(maxsize=maxsize)
+        self.next_stage = None
+        self.done = None
+        self.processed = 0
+        self.failed = 0
+        self._completed = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pending = []
+        self._next_seq = 0
+
+    def start(self):
+        for i in range(self.workers):
+            threading.Thread(target=self._run, daemon=True, name=f"Pipeline-{self.name}-{i}").start()
+
+    def put(self, seq, item):
+        self.queue.put((seq, item))
+
+    def _run(self):
+        while True:
+            seq, item = self.queue.get()
+            if not self.ordered:
+                self._handle(seq, item)
+                continue
+
+            heapq.heappush(self._pending, (seq, item))
+            while self._pending and self._pending[0][0] == self._next_seq:
+                seq, item = heapq.heappop(self._pending)
+                self._next_seq += 1
+                self._handle(seq, item)
+
+    def _handle(self, seq, item):
+        result = None
+        if item is not None:
+            try:
+                result = self.handler(item, self._local)
+                with self._lock:
+                    self.processed += 1
+                    self._completed.append(time.monotonic())
+            except Exception as e:
+                logger.error(f"Ошибка на стадии {self.name}: {e}")
+                with self._lock:
+                    self.failed += 1
+        if self.next_stage is not None:
+            self.next_stage.put(seq, result)
+        elif self.done is not None:
+            self.done()
+
+    def metrics(self, window=60.0):
+        with self._lock:
+            since = time.monotonic() - window
+            recent = sum(1 for ts in self._completed if ts >= since)
+            return {
+                "stage": self.name,
+                "queue": self.queue.qsize() + len(self._pending),
+                "processed": self.processed,
+                "failed": self.failed,
+                "per_minute": recent * 60.0 / window,
+            }
+
+
+def fetch_stage(new_message, local):
+    """
+    Загружает HTML страницы сообщения: по HTTP, а при ошибке - браузером своего потока.
+    """
+    link = new_message.сообщение_ссылка
+    try:
+        return new_message, fetch_message_html(link)
+    except Exception as e:
+        logger.warning(f"HTTP-загрузка сообщения не удалась, используем браузер: {e}")
+
+    if getattr(local, "driver", None) is None:
+        local.driver = acquire_driver()
+    try:
+        return new_message, load_message_html(link, local.driver)
+    except Exception:
+        get_driver_pool().release(local.driver)
+        local.driver = None
+        raise
+
+
+def parse_stage(item, local):
+    """
+    Разбирает страницу сообщения в пуле процессов и готовит данные для БД.
+    """
+    new_message, html = item
+    message_content = get_parse_pool().parse_message(html, new_message.сообщение_ссылка).result()
+    if message_content is None:
+        raise ValueError(f"Не удалось разобрать сообщение {new_message.сообщение_ссылка}")
+    prepared_data = prepare_data_for_db(new_message, message_content)
+    logger.info('Сырые сообщения: %s', str(prepared_data))
+    return prepared_data
+
+
+def persist_stage(prepared_data, local):
+    persist_message(prepared_data)
+
+
+class MessagePipeline:
+    """
+    Конвейер обработки новых сообщений: загрузка страницы -> разбор -> запись в БД.
+    Поток опроса списка только ставит сообщения в очередь и не ждёт медленных стадий.
+    """
+
+    def __init__(self):
+        self.stages = [
+            Stage("fetch", fetch_stage, workers=PIPELINE_FETCH_WORKERS),
+            Stage("parse", parse_stage, workers=PIPELINE_PARSE_WORKERS),
+            # Запись идёт в порядке публикации: от этого зависит сверка лотов
+            Stage("persist", persist_stage, ordered=True),
+        ]
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next_stage = next_stage
+        self._slots = threading.BoundedSemaphore(max(1, PIPELINE_MAX_IN_FLIGHT))
+        self.stages[-1].done = self._slots.release
+        self._seq = itertools.count()
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        threading.Thread(target=self._report_metrics, daemon=True, name="PipelineMetricsThread").start()
+        return self
+
+    def submit(self, new_message):
+        """
+        Ставит сообщение в конвейер. Ждёт, если в работе уже PIPELINE_MAX_IN_FLIGHT сообщений.
+        """
+        self._slots.acquire()
+        self.stages[0].put(next(self._seq), new_message)
+
+    def metrics(self):
+        return [stage.metrics() for stage in self.stages]
+
+    def _report_metrics(self):
+        while True:
+            time.sleep(PIPELINE_METRICS_INTERVAL)
+            for m in self.metrics():
+                logger.info(f"Стадия {m['stage']}: в очереди {m['queue']}, обработано {m['processed']}, "
+                            f"ошибок {m['failed']}, {m['per_minute']:.1f} в минуту")
+            for kind, s in wait_stats.summary().items():
+                logger.info(f"Ожидание страниц ({kind}): {s['count']} раз, среднее {s['mean']:.2f} с, "
+                            f"p95 {s['p95']:.2f} с, максимум {s['max']:.2f} с, таймаутов {s['timeouts']}")
+            p = get_parse_pool().metrics()
+            logger.info(f"Пул разбора: отправлено {p['submitted']}, ошибок {p['failed']}, "
+                        f"перезапусков {p['restarts']}, ожидание свободного места {p['slot_wait']:.1f} с")
+            f = filter_stats.summary()
+            logger.info(f"Правила отбора: отброшено {f['rejected']}, "
+                        f"сообщений без разбора лотов {f['skipped_lot_messages']}")
+            for kind, c in change_stats.summary().items():
+                logger.info(f"Без изменений ({kind}): {c['hits']} из {c['checks']} ({c['hit_rate']:.0%})")
+            d = db_pool_summary()
+            if d is not None:
+                logger.info(f"Пул соединений с БД: выдано {d['checkouts']}, занято {d['in_use']}, "
+                            f"ожидание среднее {d['wait_mean']:.3f} с, p95 {d['wait_p95']:.3f} с, "
+                            f"максимум {d['wait_max']:.3f} с, таймаутов {d['timeouts']}, "
+                            f"переподключений {d['reconnects']}, отбраковано {d['discarded']}")
+            for kind, e in (entity_cache_summary() or {}).items():
+                logger.info(f"Кэш сущностей ({kind}): {e['size']} ИНН, найдено {e['hits']} из {e['checks']} "
+                            f"({e['hit_rate']:.0%})")
+            w = message_buffer_summary()
+            if w is not None:
+                logger.info(f"Запись сообщений: пачек {w['flushes']}, строк {w['rows']} "
+                            f"({w['rows_per_flush']:.1f} на пачку, {w['flush_mean']:.3f} с), вставлено {w['inserted']}, "
+                            f"дубликатов {w['duplicates']}, ошибок {w['failed']}, в буфере {w['pending']}")
@@ -0,0 +1,134 @@
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+from dedup_store import publication_timestamp
+from logScript import logger
+
+MSK = timezone(timedelta(hours=3))
+
+# Границы интервала опроса в секундах
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "0.5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "30"))
+
+# Базовый интервал опроса по часам (МСК): пик публикаций 9-11, ночью сайт почти не обновляется
+DEFAULT_PROFILE = {
+    **{hour: 15.0 for hour in range(0, 7)},
+    7: 5.0, 8: 2.0,
+    9: 0.5, 10: 0.5, 11: 0.5,
+    **{hour: 1.5 for hour in range(12, 19)},
+    19: 3.0, 20: 5.0, 21: 8.0, 22: 10.0, 23: 15.0,
+}
+
+
+class PollScheduler:
+    """
+    Подбирает интервал опроса первой страницы.
+
+    Интервал берётся из профиля по времени суток и уменьшается, если по колонке "дата"
+    видно, что сообщения публикуются чаще. При ошибках интервал растёт экспоненциально,
+    при медленных ответах сайта - не меньше удвоенного времени ответа.
+    Часы, текущее время и генератор случайных чисел передаются снаружи, чтобы планировщик
+    можно было прогонять на смоделированных часах.
+    """
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL, max_interval=POLL_MAX_INTERVAL, profile=None,
+                 target_per_poll=1.0, jitter=0.1, slow_response=3.0, max_backoff=60.0,
+                 clock=time.monotonic, now=lambda: datetime.now(MSK), sleep=time.sleep, rng=random.random):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.profile = profile or DEFAULT_PROFILE
+        self.target_per_poll = target_per_poll
+        self.jitter = jitter
+        self.slow_response = slow_response
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.now = now
+        self.sleep = sleep
+        self.rng = rng
+
+        self._arrivals = deque(maxlen=30)
+        self._last_arrival = None
+        self._errors = 0
+        self._response_time = 0.0
+        self._polls = 0
+        self._hits = 0
+        self.interval = self._base_interval()
+
+    def _base_interval(self):
+        return self.profile.get(self.now().hour, self.max_interval)
+
+    @property
+    def hit_rate(self):
+        """
+        Доля опросов, на которых нашлись новые сообщения.
+        """
+        return self._hits / self._polls if self._polls else 0.0
+
+    @property
+    def arrival_rate(self):
+        """
+        Оценка частоты публикаций (сообщений в секунду) по датам последних новых сообщений.
+        """
+        if len(self._arrivals) < 2:
+            return 0.0
+        span = max(self._arrivals) - min(self._arrivals)
+        rate = (len(self._arrivals) - 1) / span if span > 0 else 0.0
+        # Если новых сообщений давно не было, старая оценка не должна ускорять опрос
+        idle = self.clock() - self._last_arrival
+        if idle > 0:
+            rate = min(rate, 1 / idle)
+        return rate
+
+    def record_poll(self, dates=(), duration=0.0, error=False):
+        """
+        Учитывает результат опроса.
+        :param dates: значения колонки "дата" новых сообщений.
+        :param duration: время ответа сайта в секундах.
+        :param error: опрос завершился ошибкой.
+        """
+        self._polls += 1
+        if error:
+            self._errors += 1
+        else:
+            self._errors = 0
+            self._response_time = duration if not self._response_time else 0.7 * self._response_time + 0.3 * duration
+            if dates:
+                self._hits += 1
+                self._last_arrival = self.clock()
+                for date in dates:
+                    published = publication_timestamp(date)
+                    if published:
+                        self._arrivals.append(published)
+
+        self.interval = self._compute_interval()
+        return self.interval
+
+    def _compute_interval(self):
+        interval = self._base_interval()
+
+        rate = self.arrival_rate
+        if rate > 0:
+            interval = min(interval, self.target_per_poll / rate)
+
+        if self._response_time > self.slow_response:
+            interval = max(interval, 2 * self._response_time)
+
+        if self._errors:
+            interval = max(interval, min(self.max_backoff, self.min_interval * 2 ** self._errors))
+            return min(interval, self.max_backoff)
+
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def next_delay(self):
+        """
+        Интервал до следующего опроса со случайным разбросом.
+        """
+        return self.interval * (1 + self.jitter * (2 * self.rng() - 1))
+
+    def wait(self):
+        delay = self.next_delay()
+        logger.info(f"Ожидание {delay:.2f} с до следующего опроса (доля опросов с новыми сообщениями: {self.hit_rate:.2f}).")
+        self.sleep(delay)
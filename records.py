@@ -0,0 +1,171 @@
+from typing import NamedTuple
+
+# Разделитель значений по лотам в прежнем строковом виде (колонки таблицы messages)
+LOT_SEPARATOR = "&&& "
+
+
+class Lot(NamedTuple):
+    """
+    Лот сообщения. None - такой колонки нет в таблице лотов этого сообщения.
+    """
+    number: str = None
+    description: str = None
+    price: str = None
+    classification: str = None
+    buyer: str = None
+    contract_info: str = None
+    contract_number: str = None
+    contract_date: str = None
+    valuation_date: str = None
+    book_value: str = None
+
+
+# Поле лота -> ключ в результате разбора страницы (и в прежнем строковом виде)
+LOT_KEYS = {
+    "number": "Номер лота",
+    "description": "Описание",
+    "price": "Цена",
+    "classification": "Классификация",
+    "buyer": "Наименование покупателя",
+    "contract_info": "Сведения о заключении договора",
+    "contract_number": "Номер договора",
+    "contract_date": "Дата заключения договора",
+    "valuation_date": "Дата определения стоимости",
+    "book_value": "Балансовая стоимость",
+}
+
+
+# Колонка строки лота (split_columns) -> поле лота
+LOT_COLUMNS = {
+    "номер_лота": "number",
+    "описание": "description",
+    "цена": "price",
+    "классификация": "classification",
+    "наименование_покупателя": "buyer",
+    "сведения_о_заключении_договора": "contract_info",
+    "номер_договора": "contract_number",
+    "дата_заключения_договора": "contract_date",
+    "дата_определения_стоимости": "valuation_date",
+    "балансовая_стоимость": "book_value",
+}
+
+
+class LotTable(NamedTuple):
+    """
+    Лоты сообщения в порядке таблицы.
+    columns - заполняемые таблицей поля лота и разделитель, через который поле хранится
+    в прежнем строковом виде: ((поле, разделитель), ...).
+    """
+    columns: tuple
+    lots: list
+
+    def legacy_columns(self):
+        """
+        Прежний вид лотов: {ключ: значения всех лотов через разделитель}, как их хранит таблица messages.
+        """
+        result = {}
+        for field, separator in self.columns:
+            values = [getattr(lot, field) for lot in self.lots]
+            result[LOT_KEYS[field]] = separator.join(value for value in values if value is not None)
+        return result
+
+
+class ListingRow(NamedTuple):
+    """
+    Строка таблицы списка сообщений (listing.parse_listing_rows).
+    """
+    дата: str
+    тип_сообщения: str
+    должник: str
+    должник_ссылка: str
+    арбитр: str
+    арбитр_ссылка: str
+    сообщение_ссылка: str
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+
+class Message(NamedTuple):
+    """
+    Сообщение, подготовленное для БД (DBManager.prepare_data_for_db).
+    Первые поля идут в порядке колонок таблицы messages (MESSAGE_COLUMNS),
+    поэтому параметры INSERT - просто срез кортежа (params).
+    """
+    дата: object = None
+    тип_сообщения: str = None
+    должник: str = None
+    должник_ссылка: str = None
+    арбитр: str = None
+    арбитр_ссылка: str = None
+    сообщение_ссылка: str = None
+
+    номер_сообщения: str = None
+    дата_публикации: object = None
+    наименование_должника: str = None
+    адрес: str = None
+    ОГРН: str = None
+    ИНН: str = None
+    номер_дела: str = None
+    дата_рождения: str = None
+    место_рождения: str = None
+    место_жительства: str = None
+    СНИЛС: str = None
+
+    ФИО_АУ: str = None
+    адрес_корреспонденции: str = None
+    почта: str = None
+    СРО_АУ: str = None
+    адрес_СРО_АУ: str = None
+    объявление_о_проведении_торгов: str = None
+
+    торговая_площадка: str = None
+    номер_торгов: str = None
+
+    номер_лота: str = None
+    описание: str = None
+    сведения_о_заключении_договора: str = None
+    номер_договора: str = None
+    дата_заключения_договора: str = None
+    цена: str = None
+    наименование_покупателя: str = None
+    текст: str = None
+
+    классификация: str = None
+
+    ДКП: str = None
+    вид_торгов: str = None
+    дата_начала_подачи_заявок: str = None
+    дата_окончания_подачи_заявок: str = None
+    правила_подачи_заявок: str = None
+    дата_время_торгов: str = None
+    форма_подачи_предложения_о_цене: str = None
+    место_проведения: str = None
+
+    дата_определения_стоимости: str = None
+    балансовая_стоимость: str = None
+
+    # Дальше - поля, которых нет в таблице messages
+    результат: str = None
+    # Лоты по отдельности (records.Lot): split_columns раскладывает их по строкам без разбора строк с "&&&"
+    лоты: list = ()
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def params(self):
+        """
+        Параметры INSERT в таблицу messages в порядке MESSAGE_COLUMNS.
+        """
+        return self[:_MESSAGE_COLUMN_COUNT]
+
+    def as_dict(self):
+        """
+        Поля сообщения (кроме лотов) словарём - для кода, который работает со строками БД как со словарями.
+        """
+        return dict(zip(self._fields[:-1], self))
+
+
+# Колонки таблицы messages в порядке полей Message
+MESSAGE_COLUMNS = Message._fields[:Message._fields.index("результат")]
+_MESSAGE_COLUMN_COUNT = len(MESSAGE_COLUMNS)
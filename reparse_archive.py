@@ -0,0 +1,112 @@
+"""
+Повторный разбор архива страниц (html_archive) без обращения к сайту.
+
+Для каждого сообщения архива выполняется parse_message_html -> prepare_data_for_db -> split_columns
+в пуле процессов (по процессу на ядро), результат пишется в JSONL: одна строка на сообщение.
+Данные строки списка (дата, должник, ссылки) берутся из сохранённых таблиц списка сообщений.
+
+Запуск:
+    python reparse_archive.py --output reparsed.jsonl
+    python reparse_archive.py --guid 6513270E269E0D37F2A74DE452E6B438
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from html_archive import ARCHIVE_DIR, HtmlArchive
+
+_worker_archive = None
+_worker_backend = None
+
+
+def _init_worker(path, backend):
+    """
+    Подготовка процесса: свой экземпляр архива и тихий вывод.
+    """
+    global _worker_archive, _worker_backend
+    _worker_backend = backend
+    from logScript import console_handler, logger
+    logger.setLevel(logging.WARNING)
+    console_handler.setLevel(logging.ERROR)
+    # format.process_data печатает таблицу лотов на каждое сообщение
+    sys.stdout = open(os.devnull, "w")
+    _worker_archive = HtmlArchive(path)
+
+
+def _listing_rows(entry):
+    from listing import parse_listing_rows
+    return parse_listing_rows(_worker_archive.read(entry), _worker_backend)
+
+
+def _reparse(task):
+    from DBManager import prepare_data_for_db
+    from parsing import parse_message_html
+    from split import split_columns
+
+    guid, entry, new_message = task
+    try:
+        message_content = parse_message_html(_worker_archive.read(entry), entry.url, _worker_backend)
+        if message_content is None:
+            return guid, None, "страница не разобрана"
+        prepared_data = prepare_data_for_db(new_message, message_content)
+        lots = split_columns(prepared_data)
+        message = prepared_data.as_dict()
+        message['лоты'] = [lot._asdict() for lot in prepared_data.лоты]
+        return guid, {"guid": guid, "url": entry.url, "message": message, "lots": lots}, None
+    except Exception as e:
+        return guid, None, f"{type(e).__name__}: {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Повторный разбор архива страниц без загрузки с сайта")
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--output", default="reparsed.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backend", choices=("lxml", "bs4"), default=None, help="разборщик HTML")
+    parser.add_argument("--guid", action="append", help="разобрать только эти сообщения")
+    parser.add_argument("--chunksize", type=int, default=16)
+    args = parser.parse_args()
+
+    archive = HtmlArchive(args.archive)
+    messages = archive.messages()
+    if args.guid:
+        wanted = {guid.replace("-", "").upper() for guid in args.guid}
+        messages = {guid: entry for guid, entry in messages.items() if guid in wanted}
+    if not messages:
+        print(f"В архиве {args.archive} нет сообщений для разбора.")
+        return 1
+
+    started = time.monotonic()
+    done = failed = lots = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.archive, args.backend)) as pool:
+        # Более поздняя таблица списка перекрывает данные строки из более ранней
+        rows = {}
+        for listing in pool.map(_listing_rows, archive.listings(), chunksize=args.chunksize):
+            rows.update(listing)
+
+        tasks = [(guid, entry, rows.get(guid, {"сообщение_ссылка": entry.url}))
+                 for guid, entry in messages.items()]
+        with open(args.output, "w", encoding="utf-8") as output:
+            for guid, result, error in pool.map(_reparse, tasks, chunksize=args.chunksize):
+                if error is not None:
+                    failed += 1
+                    print(f"{guid}: {error}", file=sys.stderr)
+                    continue
+                done += 1
+                lots += len(result["lots"])
+                output.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+
+    elapsed = time.monotonic() - started
+    print(f"Разобрано сообщений: {done}, лотов: {lots}, ошибок: {failed}, без строки списка: "
+          f"{sum(1 for guid in messages if guid not in rows)}. "
+          f"{elapsed:.1f} с, {done / elapsed if elapsed else 0:.1f} сообщений/с -> {args.output}")
+    return 0 if not failed else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
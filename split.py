@@ -1,4 +1,17 @@
-from format import get_massageLots
+from operator import itemgetter
+
+from filter_rules import LOT, RULES, apply_rules
+from format import mappings, process_data
+from records import LOT_COLUMNS, Lot, Message
+
+# Колонки сообщения, которые нужны строке лота дальше: правила отбора (filter_rules)
+# и перенос в таблицу лотов (format.mappings, вид_торгов)
+LOT_ROW_COLUMNS = tuple(dict.fromkeys([*mappings, "тип_сообщения", "вид_торгов",
+                                       *(field for rule in RULES for field in rule.fields), *LOT_COLUMNS]))
+_lot_row_values = itemgetter(*(Message._fields.index(col) for col in LOT_ROW_COLUMNS))
+# Колонки строки лота в порядке полей records.Lot
+_lot_columns = tuple(col for field in Lot._fields for col, lot_field in LOT_COLUMNS.items() if lot_field == field)
+
 
 def ensure_list(data):
     """
@@ -19,12 +32,34 @@ def normalize_separator(value, separator="&&&"):
         return value.replace("&&& ", "&&&")  # Убираем пробел после &&&
     return value
 
+def lot_rows(message):
+    """
+    Строка на каждый лот (records.Message.лоты): колонки сообщения LOT_ROW_COLUMNS плюс поля лота.
+    Поле, которого нет в таблице лотов (None), берётся из сообщения.
+    """
+    base = dict(zip(LOT_ROW_COLUMNS, _lot_row_values(message)))
+    rows = []
+    for lot in message.лоты:
+        new_row = dict(base)
+        for col, value in zip(_lot_columns, lot):
+            if value is not None:
+                new_row[col] = value
+        rows.append(new_row)
+    return rows
+
 def split_columns(SplitDB):
     """
-    Разделяет выбранные столбцы таблицы по заданному разделителю, оставляя остальные столбцы в каждой строке.
+    Раскладывает сообщение на строки по лотам, оставляя остальные столбцы в каждой строке.
+    Лоты берутся из records.Message.лоты (prepare_data_for_db); сообщение без них и словари
+    разделяются по "&&&" в выбранных столбцах, как раньше.
 
-    :param SplitDB: Входные данные в виде словаря или списка словарей.
+    :param SplitDB: records.Message, словарь или список словарей.
     """
+    if isinstance(SplitDB, Message):
+        if SplitDB.лоты:
+            return process_data(apply_rules(lot_rows(SplitDB), LOT))
+        SplitDB = SplitDB.as_dict()
+
     table = [SplitDB] if isinstance(SplitDB, dict) else SplitDB
 
     if not isinstance(SplitDB, (dict, list)):
@@ -46,20 +81,19 @@ def split_columns(SplitDB):
             if col in row and row[col]:
                 row[col] = normalize_separator(row[col])
 
-        max_len = max(
-            len(str(row.get(col, "")).split(separator)) if col in columns_to_split and row.get(col) else 1
-            for col in columns_to_split
-        )
+        # Каждый столбец разделяется один раз, а не для каждой строки результата
+        parts = {col: str(row[col]).split(separator) for col in columns_to_split if row.get(col)}
+        max_len = max((len(values) for values in parts.values()), default=1)
         for i in range(max_len):
             new_row = {}
             for col in row:
-                if col in columns_to_split and row.get(col):  # Проверяем, что столбец не пустой
-                    parts = str(row[col]).split(separator)
-                    new_row[col] = parts[i] if i < len(parts) else None
+                if col in parts:  # Столбец не пустой
+                    new_row[col] = parts[col][i] if i < len(parts[col]) else None
                 else:
                     # Сохраняем данные в каждой строке
                     new_row[col] = row[col]
             split_data.append(new_row)
 
-    data = get_massageLots(split_data)
+    # Правила отбора (filter_rules), затем перенос в колонки таблицы лотов
+    data = process_data(apply_rules(split_data, LOT))
     return data
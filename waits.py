@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+from logScript import logger
+
+# Предельное время ожидания готовности страницы (в секундах)
+WAIT_TIMEOUT = float(os.getenv("WAIT_TIMEOUT", "10"))
+# Страница готова, если DOM не менялся столько секунд
+WAIT_QUIET_PERIOD = float(os.getenv("WAIT_QUIET_PERIOD", "0.15"))
+# Сколько ждать необязательные элементы (таблицу лотов), если DOM уже не меняется
+WAIT_EXPECTED_GRACE = float(os.getenv("WAIT_EXPECTED_GRACE", "0.5"))
+WAIT_POLL_INTERVAL = 0.05
+
+# Условия готовности страницы сообщения по типу (подстрока заголовка h1.red_small).
+# required - без этих элементов страница не готова; expected - элементы, которые обычно есть,
+# но могут отсутствовать (сообщение без лотов): их ждём не дольше WAIT_EXPECTED_GRACE тишины DOM.
+MESSAGE_READINESS = [
+    ("Объявление о проведении торгов", {"required": ["div.msg"], "expected": ["table.lotInfo"]}),
+    ("Сообщение об изменении", {"required": ["div.msg"], "expected": ["table.lotInfo"]}),
+    ("Сообщение о результатах торгов", {"required": ["div.msg"], "expected": ["table.lotInfo"]}),
+    ("Сведения о заключении договора", {"required": ["div.msg"], "expected": []}),
+    ("Отчет оценщика об оценке", {"required": ["div.msg"], "expected": []}),
+    ("Сообщение об отмене", {"required": ["table.headInfo"], "expected": []}),
+]
+MESSAGE_DEFAULT = {"required": ["h1.red_small"], "expected": []}
+LISTING_READINESS = {"required": ["table.bank"], "expected": []}
+
+# Один вызов execute_script на итерацию: наблюдатель мутаций ставится при первом вызове на странице,
+# затем возвращается состояние страницы и время с последнего изменения DOM
+_READINESS_SCRIPT = """
+if (!window.__readyObserver) {
+    window.__lastMutation = performance.now();
+    window.__readyObserver = new MutationObserver(function () { window.__lastMutation = performance.now(); });
+    window.__readyObserver.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+var rules = arguments[0], rule = arguments[1];
+var title = document.querySelector('h1.red_small');
+if (title) {
+    for (var i = 0; i < rules.length; i++) {
+        if (title.textContent.indexOf(rules[i][0]) !== -1) { rule = rules[i][1]; break; }
+    }
+}
+var missing = function (selectors) {
+    return selectors.filter(function (s) { return !document.querySelector(s); });
+};
+return {
+    state: document.readyState,
+    title: title !== null,
+    required: missing(rule.required),
+    expected: missing(rule.expected),
+    quiet: (performance.now() - window.__lastMutation) / 1000
+};
+"""
+
+
+class WaitStats:
+    """
+    Фактическая длительность ожиданий по видам страниц.
+    """
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._timeouts = {}
+        self.window = window
+
+    def record(self, kind, duration, timed_out=False):
+        with self._lock:
+            self._samples.setdefault(kind, deque(maxlen=self.window)).append(duration)
+            if timed_out:
+                self._timeouts[kind] = self._timeouts.get(kind, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for kind, samples in self._samples.items():
+                ordered = sorted(samples)
+                result[kind] = {
+                    "count": len(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": ordered[-1],
+                    "timeouts": self._timeouts.get(kind, 0),
+                }
+            return result
+
+
+wait_stats = WaitStats()
+
+
+def wait_until_ready(driver, kind, rules=(), default=MESSAGE_DEFAULT, timeout=WAIT_TIMEOUT,
+                     quiet_period=WAIT_QUIET_PERIOD, grace=WAIT_EXPECTED_GRACE):
+    """
+    Ждёт, пока страница не станет готовой к разбору:
+    документ разобран, обязательные элементы на месте, DOM не меняется quiet_period секунд,
+    а ожидаемые элементы появились (или DOM не меняется уже grace секунд).
+    :param kind: вид страницы для статистики ожиданий.
+    :return: время ожидания в секундах. Если обязательных элементов нет за timeout - TimeoutException.
+    """
+    started = time.monotonic()
+    deadline = started + timeout
+    rules = [list(rule) for rule in rules]
+    state = None
+    while True:
+        try:
+            state = driver.execute_script(_READINESS_SCRIPT, rules, default)
+        except Exception as e:
+            # Во время перехода страница может смениться между командами
+            logger.debug(f"Проверка готовности страницы не удалась: {e}")
+            state = None
+
+        if state and state["state"] != "loading" and not state["required"]:
+            quiet = state["quiet"]
+            if quiet >= quiet_period and (not state["expected"] or quiet >= grace):
+                elapsed = time.monotonic() - started
+                wait_stats.record(kind, elapsed)
+                if state["expected"]:
+                    logger.debug(f"На странице ({kind}) нет элементов {state['expected']}")
+                return elapsed
+
+        if time.monotonic() >= deadline:
+            elapsed = time.monotonic() - started
+            missing = state["required"] if state else "состояние страницы неизвестно"
+            if state and not state["required"]:
+                # Страница продолжает меняться, но всё нужное уже есть - разбираем как есть
+                wait_stats.record(kind, elapsed)
+                logger.warning(f"DOM страницы ({kind}) не успокоился за {timeout} с, продолжаем.")
+                return elapsed
+            wait_stats.record(kind, elapsed, timed_out=True)
+            raise TimeoutException(f"Страница ({kind}) не готова за {timeout} с: нет {missing}")
+        time.sleep(WAIT_POLL_INTERVAL)
+
+
+def wait_for_message(driver, timeout=WAIT_TIMEOUT):
+    """
+    Ждёт готовности страницы сообщения по условиям его типа (MESSAGE_READINESS).
+    """
+    return wait_until_ready(driver, "message", MESSAGE_READINESS, MESSAGE_DEFAULT, timeout)
+
+
+def wait_for_listing(driver, timeout=WAIT_TIMEOUT):
+    """
+    Ждёт готовности страницы списка сообщений (таблица table.bank).
+    """
+    return wait_until_ready(driver, "listing", default=LISTING_READINESS, timeout=timeout)
+
+
+def click_and_wait_listing(driver, element, timeout=WAIT_TIMEOUT):
+    """
+    Нажимает ссылку postback (пагинация) и ждёт, пока загрузится новая страница списка.
+    Старая страница остаётся в DOM до ответа сервера, поэтому сначала ждём, пока она пропадёт.
+    """
+    started = time.monotonic()
+    old_page = driver.find_element(By.TAG_NAME, "html")
+    element.click()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=WAIT_POLL_INTERVAL).until(EC.staleness_of(old_page))
+    except TimeoutException:
+        wait_stats.record("navigation", time.monotonic() - started, timed_out=True)
+        raise
+    wait_stats.record("navigation", time.monotonic() - started)
+    return wait_for_listing(driver, timeout)
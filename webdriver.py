@@ -2,10 +2,39 @@ from selenium import webdriver
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.remote.command import Command
+import atexit
 import os
 import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+from queue import Queue
 from logScript import logger
 
+# Сколько запасных браузеров держать запущенными
+DRIVER_POOL_SPARES = int(os.getenv("DRIVER_POOL_SPARES", "1"))
+# Сессия пересоздаётся после стольких секунд работы или стольких команд WebDriver
+DRIVER_MAX_AGE = float(os.getenv("DRIVER_MAX_AGE", str(6 * 60 * 60)))
+DRIVER_MAX_COMMANDS = int(os.getenv("DRIVER_MAX_COMMANDS", "20000"))
+# Как часто проверять запасные браузеры (в секундах)
+DRIVER_HEALTH_INTERVAL = float(os.getenv("DRIVER_HEALTH_INTERVAL", "30"))
+# Сколько секунд ждать ответа сессии при фоновой проверке запасных браузеров
+DRIVER_HEALTH_TIMEOUT = float(os.getenv("DRIVER_HEALTH_TIMEOUT", "5"))
+
+# Облегчённый профиль браузера: без окна, без картинок, шрифтов и стилей
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "1") == "1"
+BROWSER_LEAN = os.getenv("BROWSER_LEAN", "1") == "1"
+# Каталог профилей Chrome: cookie сохраняются между перезапусками браузера
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR", os.path.abspath("chrome_profiles"))
+# Ресурсы, которые не нужны для разбора страниц
+BLOCKED_RESOURCES = [
+    "*.css", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+]
+
 # создание виртуального дисплея
 def setup_virtual_display():
     """
@@ -22,10 +51,85 @@ def setup_virtual_display():
         logger.error(f"Ошибка при настройке виртуального дисплея: {e}")
         return None
 
+# Chrome блокирует каталог профиля, поэтому одновременно работающие браузеры получают разные слоты
+_profile_slots = set()
+_profile_lock = threading.Lock()
+
+
+def _acquire_profile_slot():
+    with _profile_lock:
+        slot = 0
+        while slot in _profile_slots:
+            slot += 1
+        _profile_slots.add(slot)
+        return slot
+
+
+def _release_profile_slot(slot):
+    with _profile_lock:
+        _profile_slots.discard(slot)
+
+
+def lean_chrome_options(profile_dir=None, headless=BROWSER_HEADLESS):
+    """
+    Облегчённый профиль Chrome для парсинга: без окна, без картинок, шрифтов и стилей,
+    страница считается загруженной после DOMContentLoaded (page_load_strategy="eager").
+    :param profile_dir: постоянный каталог профиля (cookie переживают перезапуск браузера).
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    chrome_options.add_argument("--disable-remote-fonts")
+    chrome_options.add_argument("--no-first-run")
+    chrome_options.add_argument("--no-default-browser-check")
+    chrome_options.add_argument("--disable-background-networking")
+    chrome_options.add_argument("--disable-component-update")
+    chrome_options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.managed_default_content_settings.stylesheets": 2,
+        "profile.managed_default_content_settings.fonts": 2,
+    })
+    chrome_options.page_load_strategy = "eager"
+    if profile_dir:
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+    return chrome_options
+
+
+def default_chrome_options():
+    """
+    Прежний профиль Chrome: окно на виртуальном дисплее, все ресурсы страницы загружаются.
+    """
+    chrome_options = Options()
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--disable-extensions")
+    return chrome_options
+
+
+def block_resources(driver, patterns=BLOCKED_RESOURCES):
+    """
+    Запрещает браузеру загружать ресурсы по маскам URL (через DevTools).
+    Настройки профиля не отключают стили и шрифты в новых версиях Chrome, поэтому блокируем запросы.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logger.warning(f"Не удалось заблокировать загрузку ресурсов: {e}")
+
+
 # создание веб драйвера с виртуальным дисплем
-def create_webdriver_with_display():
+def create_webdriver_with_display(lean=BROWSER_LEAN):
     """
-    Создает WebDriver с виртуальным дисплеем.
+    Создает WebDriver. По умолчанию - с облегчённым профилем (lean_chrome_options)
+    и постоянным каталогом профиля из BROWSER_PROFILE_DIR.
     """
     # Настройка виртуального дисплея
     # xvfb_process = setup_virtual_display()
@@ -33,14 +137,19 @@ def create_webdriver_with_display():
     #     raise RuntimeError("Не удалось настроить виртуальный дисплей.")
 
     # Настройка WebDriver
-    chrome_options = Options()
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--disable-extensions")
-    chrome_service = Service(ChromeDriverManager().install())
+    chrome_service = Service(chromedriver_path())
+    if not lean:
+        return webdriver.Chrome(service=chrome_service, options=default_chrome_options())
 
-    driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
+    slot = _acquire_profile_slot()
+    try:
+        profile_dir = os.path.join(BROWSER_PROFILE_DIR, f"slot-{slot}")
+        driver = webdriver.Chrome(service=chrome_service, options=lean_chrome_options(profile_dir))
+    except Exception:
+        _release_profile_slot(slot)
+        raise
+    driver.profile_slot = slot
+    block_resources(driver)
     # driver.xvfb_process = xvfb_process  # Сохраняем процесс для последующего завершения
     return driver
 
@@ -53,25 +162,238 @@ def cleanup_virtual_display(driver):
         driver.xvfb_process.terminate()
         logger.info("Процесс Xvfb завершен.")
 
-# Функция для перезапуска драйвера
-def restart_driver(driver):
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """
+    Путь к chromedriver. ChromeDriverManager ходит в сеть, поэтому вызывается один раз на процесс.
+    """
+    return ChromeDriverManager().install()
+
+
+def track_commands(driver):
+    """
+    Подсчитывает команды WebDriver и запоминает время запуска сессии.
+    """
+    driver.started_at = time.monotonic()
+    driver.command_count = 0
+    execute = driver.execute
+    # Для служебных команд (проверка сессии), которые не должны приближать пересоздание сессии
+    driver.untracked_execute = execute
+
+    def counting_execute(*args, **kwargs):
+        driver.command_count += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return driver
+
+
+_health_requests = Queue()
+_health_lock = threading.Lock()
+_health_worker = None
+_health_busy = None
+
+
+def _answer_health_requests():
+    while True:
+        driver, future = _health_requests.get()
+        try:
+            execute = getattr(driver, "untracked_execute", driver.execute)
+            future.set_result(execute(Command.W3C_EXECUTE_SCRIPT, {"script": "return 1", "args": []})["value"] == 1)
+        except Exception as e:
+            future.set_exception(e)
+
+
+def session_responds(driver, timeout=DRIVER_HEALTH_TIMEOUT):
+    """
+    Отвечает ли сессия браузера на execute_script("return 1") не дольше timeout секунд (в счётчик
+    команд track_commands не входит). Команды выполняет один фоновый поток: зависшая сессия не отвечает
+    до таймаута HTTP-клиента WebDriver, и ждать её здесь дольше timeout не нужно.
+    :return: True/False или None, если поток ещё ждёт ответа от предыдущей (зависшей) сессии.
+    """
+    global _health_worker, _health_busy
+    with _health_lock:
+        if _health_busy is not None and not _health_busy.done():
+            return None
+        if _health_worker is None:
+            _health_worker = threading.Thread(target=_answer_health_requests, daemon=True, name="DriverHealthThread")
+            _health_worker.start()
+        _health_busy = future = Future()
+        _health_requests.put((driver, future))
+    try:
+        return future.result(timeout)
+    except Exception:
+        # Таймаут (TimeoutError) или ошибка команды: сессия не отвечает
+        return False
+
+
+def is_driver_healthy(driver):
+    """
+    Дешёвая проверка без обращения к странице: процесс chromedriver жив и принимает соединения.
+    Упавший или зависший Chrome при живом chromedriver так не обнаруживается: для запасных браузеров
+    это делает фоновая проверка пула (session_responds), для рабочего - ошибка первой же команды.
+    """
+    try:
+        service = driver.service
+        return service.process is not None and service.process.poll() is None and service.is_connectable()
+    except Exception:
+        return False
+
+
+def quit_driver(driver):
     try:
         cleanup_virtual_display(driver)
-        driver.quit()  # Завершаем текущую сессию
+        driver.quit()
     except Exception as e:
         logger.error(f"Ошибка при завершении WebDriver: {e}")
-    return create_webdriver_with_display()
+    finally:
+        # Каталог профиля освобождается только после выхода Chrome
+        if getattr(driver, "profile_slot", None) is not None:
+            _release_profile_slot(driver.profile_slot)
+
+
+class DriverPool:
+    """
+    Пул заранее запущенных браузеров.
+
+    acquire() сразу отдаёт запасной браузер, а фоновый поток запускает новый на его место,
+    проверяет запасные браузеры и заменяет упавшие. Старые сессии закрываются в фоне.
+    """
+
+    def __init__(self, factory=None, spares=DRIVER_POOL_SPARES, max_age=DRIVER_MAX_AGE,
+                 max_commands=DRIVER_MAX_COMMANDS, health_interval=DRIVER_HEALTH_INTERVAL):
+        self.factory = factory or create_webdriver_with_display
+        self.spares = spares
+        self.max_age = max_age
+        self.max_commands = max_commands
+        self.health_interval = health_interval
+        self._spares = deque()
+        self._retired = Queue()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self.swaps = 0
+        self.cold_starts = 0
+        threading.Thread(target=self._maintain, daemon=True, name="DriverPoolThread").start()
+        threading.Thread(target=self._reap, daemon=True, name="DriverReaperThread").start()
+        atexit.register(self.close)
+
+    def _launch(self):
+        return track_commands(self.factory())
+
+    def acquire(self):
+        """
+        Возвращает рабочий браузер: запасной, если он готов, иначе запускает новый.
+        """
+        while True:
+            with self._lock:
+                driver = self._spares.popleft() if self._spares else None
+            if driver is None:
+                break
+            if is_driver_healthy(driver):
+                self.swaps += 1
+                self._wakeup.set()
+                return driver
+            self._retired.put(driver)
+        self._wakeup.set()
+        self.cold_starts += 1
+        logger.warning("Запасного браузера нет, запускаем новый.")
+        return self._launch()
+
+    def release(self, driver):
+        """
+        Закрывает браузер в фоновом потоке.
+        """
+        if driver is not None:
+            self._retired.put(driver)
+
+    def replace(self, driver):
+        """
+        Отдаёт старый браузер на закрытие и сразу возвращает запасной.
+        """
+        self.release(driver)
+        return self.acquire()
+
+    def should_recycle(self, driver):
+        """
+        True, если сессия отработала DRIVER_MAX_AGE секунд или DRIVER_MAX_COMMANDS команд.
+        """
+        age = time.monotonic() - getattr(driver, "started_at", time.monotonic())
+        return age > self.max_age or getattr(driver, "command_count", 0) > self.max_commands
+
+    def _maintain(self):
+        while True:
+            with self._lock:
+                spares = list(self._spares)
+            for driver in spares:
+                # Запасной браузер не занят, поэтому его сессию можно проверить командой
+                if (not is_driver_healthy(driver) or self.should_recycle(driver)
+                        or session_responds(driver) is False):
+                    with self._lock:
+                        if driver in self._spares:
+                            self._spares.remove(driver)
+                    logger.warning("Запасной браузер не отвечает или устарел, заменяем.")
+                    self._retired.put(driver)
+
+            while len(self._spares) < self.spares:
+                try:
+                    driver = self._launch()
+                except Exception as e:
+                    logger.error(f"Не удалось запустить запасной браузер: {e}")
+                    break
+                with self._lock:
+                    self._spares.append(driver)
+                logger.info(f"Запасной браузер готов, в пуле {len(self._spares)}.")
+
+            self._wakeup.wait(self.health_interval)
+            self._wakeup.clear()
+
+    def _reap(self):
+        while True:
+            quit_driver(self._retired.get())
+
+    def close(self):
+        with self._lock:
+            spares, self._spares = list(self._spares), deque()
+        # Браузеры, которые фоновый поток ещё не успел закрыть, закрываются здесь
+        while not self._retired.empty():
+            spares.append(self._retired.get_nowait())
+        for driver in spares:
+            quit_driver(driver)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """
+    Общий для процесса пул браузеров, создаётся при первом обращении.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+        return _pool
+
+
+def acquire_driver():
+    return get_driver_pool().acquire()
+
+
+# Функция для перезапуска драйвера: старый браузер закрывается в фоне, сразу берётся запасной
+def restart_driver(driver):
+    return get_driver_pool().replace(driver)
 
 # Функция проверки состояния браузера
 def is_browser_alive(driver):
     """
-    Проверяет, жив ли браузер.
+    Проверяет, жив ли браузер. Не обращается к странице, поэтому не тормозит цикл опроса.
+    Если браузер упал при живом chromedriver, ошибку вернёт первая же команда.
     :param driver: WebDriver instance.
     :return: True, если браузер работает, иначе False.
     """
-    try:
-        driver.title  # Пробуем получить заголовок текущей страницы
+    if is_driver_healthy(driver):
         return True
-    except Exception as e:
-        logger.warning(f"Браузер не отвечает: {e}")
-        return False
+    logger.warning("Браузер не отвечает: процесс chromedriver недоступен.")
+    return False